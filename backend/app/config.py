@@ -1,6 +1,7 @@
 """
 Configuration settings for the Citi Bike API backend
 """
+from pathlib import Path
 
 # Columbia University station IDs
 COLUMBIA_STATION_IDS = [
@@ -13,13 +14,105 @@ COLUMBIA_STATION_IDS = [
 	"7713.01",  # W 113 St & Broadway
 ]
 
+# Named station groups (short_names) served by /api/stations/group/{name}
+STATION_GROUPS = {
+	"columbia": COLUMBIA_STATION_IDS,
+}
+
 # Citi Bike GBFS API endpoints
 GBFS_BASE_URL = "https://gbfs.citibikenyc.com/gbfs/en"
 STATION_INFORMATION_URL = f"{GBFS_BASE_URL}/station_information.json"
 STATION_STATUS_URL = f"{GBFS_BASE_URL}/station_status.json"
 
+# Bikeshare systems served by this backend. Each gets its own client, cache
+# namespace and refresh schedule; /api/stations/* serves DEFAULT_SYSTEM.
+# Another system (or regional feed) is one more entry with its own base_url.
+DEFAULT_SYSTEM = "citibike"
+GBFS_SYSTEMS = {
+	"citibike": {
+		"base_url": GBFS_BASE_URL,
+		"station_groups": STATION_GROUPS,
+		"default_group": "columbia",
+	},
+}
+SYSTEM_MAX_CONCURRENT_FETCHES = 2  # Upstream requests in flight per system
+
+# Recent snapshot versions kept per system for /status?since= deltas
+SNAPSHOT_DELTA_VERSIONS = 120
+
+# Decode only the configured stations from the system-wide status feed
+STATUS_SELECTIVE_PARSE = True
+STATUS_SELECTIVE_MAX_STATIONS = 200  # Beyond this many tracked stations a full parse is cheaper
+STATUS_TRACKED_IDLE_SECONDS = 600  # Stations only nearby/group queries asked for leave the subset after this long unqueried
+
+# Nearby-station queries
+SPATIAL_GRID_CELL_DEGREES = 0.005  # ~550 m north-south per grid cell
+NEARBY_DEFAULT_RADIUS_METERS = 500
+NEARBY_MAX_RADIUS_METERS = 5000
+NEARBY_MAX_RESULTS = 100
+
 # Cache settings
-CACHE_TTL_SECONDS = 180  # 3 minutes
+CACHE_TTL_SECONDS = 180  # 3 minutes (fallback when a feed has no ttl/last_updated)
+CACHE_MAX_ENTRIES = 1024  # LRU entry cap
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # Approximate LRU byte budget
+CACHE_SWEEP_INTERVAL_SECONDS = 60  # How often expired entries are dropped
+
+# Background refresh (stale-while-revalidate) settings
+REFRESH_MIN_INTERVAL_SECONDS = 15  # Floor applied to the feed's own ttl
+REFRESH_LEAD_SECONDS = 2  # Refresh this long before a feed expires
+REFRESH_MAX_BACKOFF_SECONDS = 120  # Retry ceiling while upstream is failing
+STALE_GRACE_SECONDS = 600  # Keep serving expired data this long if upstream is slow
+
+# Upstream circuit breaker (per system)
+CIRCUIT_FAILURE_THRESHOLD = 3  # Consecutive failed fetches before failing fast
+CIRCUIT_RESET_SECONDS = 30  # Cool-down before the first probe request
+CIRCUIT_MAX_RESET_SECONDS = 300  # Cool-down ceiling while probes keep failing
+
+# Last-good snapshot on disk, restored at startup
+SNAPSHOT_DIR = Path(__file__).resolve().parent.parent / "data" / "snapshots"
+SNAPSHOT_SAVE_INTERVAL_SECONDS = 60  # Written at most this often (and on shutdown)
+SNAPSHOT_MAX_AGE_SECONDS = 24 * 60 * 60  # Older files are ignored at startup
+
+# Feeds shared between the workers on one host: the worker holding a file
+# lock fetches upstream and publishes each feed; the others only read it
+SHARED_STATE_ENABLED = True
+SHARED_STATE_DIR = (
+	Path("/dev/shm/citibike-backend") if Path("/dev/shm").is_dir()
+	else Path(__file__).resolve().parent.parent / "data" / "shared"
+)
+SHARED_POLL_INTERVAL_SECONDS = 1.0  # Publish/read check interval (and leader takeover delay)
+
+# Startup: each system's snapshot is built (and its status body rendered)
+# before the server accepts connections, waiting at most this long
+STARTUP_WARM_TIMEOUT_SECONDS = 5.0
+
+# Station status history (see app/services/history.py for the memory budget)
+HISTORY_RING_SIZE = 6 * 60 * 24  # Samples kept in memory per station (24 h at one per 10 s)
+HISTORY_MAX_STATIONS = 200  # Stations sampled per snapshot
+HISTORY_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "station_history.sqlite"
+HISTORY_FLUSH_INTERVAL_SECONDS = 60  # How often new samples are spilled to SQLite
+HISTORY_DEFAULT_WINDOW_SECONDS = 24 * 60 * 60
+HISTORY_DEFAULT_POINTS = 96
+HISTORY_MAX_POINTS = 2000
+
+# Departure forecasts (model artifact written by scripts/export_forecasting.py)
+FORECAST_MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "departures_xgb.ubj"
+FORECAST_METADATA_PATH = Path(__file__).resolve().parent.parent / "models" / "departures_xgb.meta.json"
+FORECAST_TIMEZONE = "America/New_York"  # Trip data (and model features) use local time
+FORECAST_DEFAULT_HOURS = 6
+FORECAST_MAX_HOURS = 24  # Horizons predicted (and cached) per hour
+FORECAST_MIN_COVERAGE_SECONDS = 45 * 60  # History span needed to use an hour's live counts
+
+# Server-Sent Events push channel
+SSE_KEEPALIVE_SECONDS = 25  # Comment line interval so idle proxies keep the stream open
+
+# Upstream HTTP client settings (one pooled client is shared per process)
+HTTP_TIMEOUT_SECONDS = 10.0
+HTTP_CONNECT_TIMEOUT_SECONDS = 5.0
+HTTP_MAX_CONNECTIONS = 10
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 5
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 120.0
+HTTP2_ENABLED = True  # Falls back to HTTP/1.1 if the h2 package is missing
 
 # CORS settings
 ALLOWED_ORIGINS = [
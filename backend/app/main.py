@@ -1,16 +1,62 @@
 """
 FastAPI application for Citi Bike analysis backend
 """
-from fastapi import FastAPI
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 from app.config import ALLOWED_ORIGINS
-from app.routers import stations
+from app.routers import forecast, stations, systems as systems_router
+from app.services.cache import cache
+from app.services.gbfs_client import gbfs_client
+from app.services.singleflight import singleflight
+from app.services.refresher import station_refresher
+from app.services.systems import systems
+from app.services.broadcast import status_broadcaster
+from app.services.history import history_store
+from app.services.forecast import forecaster
+from app.services.metrics import LiveDataCollector, MetricsMiddleware
+from app.services.startup import startup
+
+startup.timings["import"] = round(time.perf_counter() - _import_started, 4)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	"""Open shared upstream resources on startup and release them on shutdown"""
+	gbfs_client.snapshot_listeners.append(status_broadcaster.publish_snapshot)
+	gbfs_client.snapshot_listeners.append(history_store.record_snapshot)
+	with startup.phase("history"):
+		await history_store.start()
+	# Not needed to serve station data, so it loads while the server runs
+	forecaster.start()
+	cache.start_sweeper()
+	# Open every system's client and keep its live data warm so requests never wait on upstream
+	with startup.phase("systems"):
+		await systems.start()
+	# Build snapshots and rendered bodies before the first request arrives
+	with startup.phase("warm"):
+		await startup.warm(systems.clients)
+	try:
+		yield
+	finally:
+		await systems.stop()
+		await cache.stop_sweeper()
+		gbfs_client.snapshot_listeners.remove(status_broadcaster.publish_snapshot)
+		gbfs_client.snapshot_listeners.remove(history_store.record_snapshot)
+		await history_store.stop()
+
 
 # Create FastAPI app
 app = FastAPI(
 	title="Citi Bike Analysis API",
 	description="Backend API for Columbia Citi Bike analysis dashboard",
-	version="1.0.0"
+	version="1.0.0",
+	lifespan=lifespan
 )
 
 # Configure CORS
@@ -22,8 +68,23 @@ app.add_middleware(
 	allow_headers=["*"],
 )
 
+# Measure per-route latency (outermost, so it also covers CORS handling)
+app.add_middleware(MetricsMiddleware)
+
+# Cache counters and data age are read from live state on every scrape
+REGISTRY.register(LiveDataCollector(
+	cache.stats,
+	lambda: {
+		(system, feed): systems.get(system).data_age(feed)
+		for system in systems
+		for feed in systems.get(system).feeds
+	},
+))
+
 # Include routers
 app.include_router(stations.router)
+app.include_router(systems_router.router)
+app.include_router(forecast.router)
 
 
 @app.get("/health")
@@ -35,6 +96,49 @@ async def health_check():
 	}
 
 
+@app.get("/ready")
+async def readiness_check():
+	"""Readiness probe: 200 once station data is warm in memory, 503 until then
+
+	Unlike /health, which only says the process is up, this is what load
+	balancers and autoscalers should wait for before sending traffic.
+	"""
+	body = startup.readiness(systems.clients)
+	forecast_status = forecaster.status()
+	# Reported but not required: forecasts are optional and load in the background
+	body["forecast"] = {"available": forecast_status["available"], "loading": forecast_status["loading"]}
+	return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.get("/health/upstream")
+async def upstream_health():
+	"""Upstream fetch timings, feed freshness, skipped refreshes and coalescing counters"""
+	return {
+		**gbfs_client.freshness(),
+		"circuit": gbfs_client.breaker.snapshot(),
+		"persistence": systems.persisters[gbfs_client.system].stats,
+		"shared": systems.shared[gbfs_client.system].stats if systems.shared else None,
+		"fetches": gbfs_client.fetch_timings,
+		"changes": gbfs_client.change_stats,
+		"feeds": {
+			feed: {**state, "age_seconds": round(gbfs_client.data_age(feed), 1)}
+			for feed, state in gbfs_client.feed_state.items()
+		},
+		"refresher": {"running": station_refresher.running, **station_refresher.stats},
+		"cache": cache.stats(),
+		"singleflight": singleflight.stats,
+		"stream": status_broadcaster.stats,
+		"history": history_store.stats(),
+		"forecast": forecaster.status()
+	}
+
+
+@app.get("/metrics")
+async def metrics():
+	"""Prometheus metrics in text exposition format"""
+	return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 async def root():
 	"""Root endpoint"""
@@ -0,0 +1,47 @@
+"""
+Departure forecast endpoints
+"""
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List, Optional
+from app.config import FORECAST_DEFAULT_HOURS, FORECAST_MAX_HOURS
+from app.services.forecast import forecaster
+
+router = APIRouter(prefix="/api/forecast", tags=["forecast"])
+
+
+@router.get("")
+async def get_forecast(
+	station: Optional[List[str]] = Query(None),
+	hours: int = Query(FORECAST_DEFAULT_HOURS, ge=1, le=FORECAST_MAX_HOURS),
+) -> Dict:
+	"""Predicted departures per hour, starting with the current hour
+
+	`station` takes short_names (e.g. 7783.18) or station UUIDs and defaults
+	to every station the model was trained on. Forecasts are computed once
+	per hour for all stations.
+	"""
+	if not forecaster.available:
+		raise HTTPException(status_code=503, detail=f"Forecast model unavailable: {forecaster.error}")
+	try:
+		forecast = await forecaster.forecast()
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+	stations = forecast["stations"]
+	if station:
+		short_names = [forecast["by_station_id"].get(name, name) for name in station]
+		unknown = [name for name, short_name in zip(station, short_names) if short_name not in stations]
+		if unknown:
+			raise HTTPException(status_code=404, detail=f"No forecast for station(s): {', '.join(unknown)}")
+	else:
+		short_names = list(stations)
+
+	return {
+		"generated_at": forecast["generated_at"],
+		"hours": forecast["hours"][:hours],
+		"stations": [
+			{**stations[short_name], "departures": stations[short_name]["departures"][:hours]}
+			for short_name in short_names
+		],
+		"live_hours_fraction": forecast["live_hours_fraction"],
+	}
@@ -1,9 +1,28 @@
 """
 Station endpoints
 """
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Optional
+import time
 from app.services.gbfs_client import gbfs_client
+from app.services.responses import (
+	delta_payload,
+	negotiate_format,
+	negotiated_response,
+	render_status,
+	status_payload,
+)
+from app.services.broadcast import status_broadcaster
+from app.services.history import history_store
+from app.config import (
+	NEARBY_DEFAULT_RADIUS_METERS,
+	NEARBY_MAX_RADIUS_METERS,
+	NEARBY_MAX_RESULTS,
+	HISTORY_DEFAULT_WINDOW_SECONDS,
+	HISTORY_DEFAULT_POINTS,
+	HISTORY_MAX_POINTS,
+)
 import httpx
 
 router = APIRouter(prefix="/api/stations", tags=["stations"])
@@ -16,7 +35,8 @@ async def get_columbia_stations() -> Dict:
 		stations = await gbfs_client.fetch_station_information()
 		return {
 			"stations": stations,
-			"count": len(stations)
+			"count": len(stations),
+			"freshness": gbfs_client.freshness()
 		}
 	except httpx.HTTPError as e:
 		raise HTTPException(status_code=503, detail=f"Error fetching station data: {str(e)}")
@@ -25,28 +45,115 @@ async def get_columbia_stations() -> Dict:
 
 
 @router.get("/status")
-async def get_station_status() -> Dict:
-	"""Get current availability status for Columbia stations"""
+async def get_station_status(request: Request, since: Optional[int] = Query(None, ge=0)) -> Response:
+	"""Get current availability status for Columbia stations
+
+	The body is rendered and compressed once per snapshot version and carries
+	a strong ETag, so polling clients get 304 Not Modified until data changes.
+
+	With `since` set to the "version" of an earlier response, only stations
+	whose counts changed are returned (plus "removed" UUIDs and the full
+	summary). If that version is no longer kept, the full body is returned;
+	delta bodies are the ones that carry "since".
+
+	The Accept header can ask for a columnar and/or MessagePack body (see
+	app/services/responses.py).
+	"""
 	try:
-		stations = await gbfs_client.get_combined_station_data()
+		snapshot = await gbfs_client.get_snapshot()
+		freshness = gbfs_client.freshness()
+		changes = gbfs_client.changes_since(snapshot, since) if since is not None else None
+		if changes is not None:
+			return negotiated_response(request, delta_payload(snapshot, since, *changes, freshness))
+		rendered = render_status("status", snapshot, freshness, negotiate_format(request))
+		return rendered.to_response(request)
+	except httpx.HTTPError as e:
+		raise HTTPException(status_code=503, detail=f"Error fetching station data: {str(e)}")
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-		# Calculate summary stats
-		total_bikes = sum(s["num_bikes_available"] for s in stations)
-		total_docks = sum(s["num_docks_available"] for s in stations)
-		total_capacity = sum(s["capacity"] for s in stations)
 
+@router.get("/nearby")
+async def get_nearby_stations(
+	request: Request,
+	lat: float = Query(..., ge=-90, le=90),
+	lon: float = Query(..., ge=-180, le=180),
+	radius: float = Query(NEARBY_DEFAULT_RADIUS_METERS, gt=0, le=NEARBY_MAX_RADIUS_METERS),
+	limit: int = Query(NEARBY_MAX_RESULTS, ge=1, le=NEARBY_MAX_RESULTS),
+) -> Response:
+	"""Get live status for any stations within `radius` meters of a point"""
+	try:
+		stations = await gbfs_client.get_nearby_station_data(lat, lon, radius, limit)
+		return negotiated_response(request, {
+			**status_payload(stations, gbfs_client.freshness()),
+			"query": {"lat": lat, "lon": lon, "radius": radius, "limit": limit}
+		})
+	except httpx.HTTPError as e:
+		raise HTTPException(status_code=503, detail=f"Error fetching station data: {str(e)}")
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/group/{name}")
+async def get_station_group(name: str) -> Dict:
+	"""Get live status for a named station group (see STATION_GROUPS)"""
+	if name not in gbfs_client.station_groups:
+		raise HTTPException(status_code=404, detail=f"Unknown station group: {name}")
+	try:
+		stations = await gbfs_client.get_group_station_data(name)
 		return {
-			"stations": stations,
-			"summary": {
-				"total_stations": len(stations),
-				"total_bikes_available": total_bikes,
-				"total_docks_available": total_docks,
-				"total_capacity": total_capacity,
-				"overall_percent_full": round((total_bikes / total_capacity * 100), 1) if total_capacity > 0 else 0
-			},
-			"last_updated": max((s["last_reported"] for s in stations), default=0)
+			**status_payload(stations, gbfs_client.freshness()),
+			"group": name
 		}
 	except httpx.HTTPError as e:
 		raise HTTPException(status_code=503, detail=f"Error fetching station data: {str(e)}")
 	except Exception as e:
 		raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/history")
+async def get_station_history(
+	request: Request,
+	station_id: Optional[List[str]] = Query(None),
+	start: Optional[int] = Query(None, ge=0),
+	end: Optional[int] = Query(None, ge=0),
+	points: int = Query(HISTORY_DEFAULT_POINTS, ge=1, le=HISTORY_MAX_POINTS),
+) -> Response:
+	"""Get downsampled availability history (min/max/mean per bucket)
+
+	Defaults to the Columbia stations over the last 24 hours. Times are unix
+	seconds; at most `points` buckets are returned per station.
+	"""
+	end = end if end is not None else int(time.time())
+	start = start if start is not None else end - HISTORY_DEFAULT_WINDOW_SECONDS
+	if start > end:
+		raise HTTPException(status_code=422, detail="start must not be after end")
+	try:
+		if not station_id:
+			snapshot = await gbfs_client.get_snapshot()
+			station_id = list(snapshot.station_ids)
+		return negotiated_response(request, await history_store.query(station_id, start, end, points))
+	except httpx.HTTPError as e:
+		raise HTTPException(status_code=503, detail=f"Error fetching station data: {str(e)}")
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/stream")
+async def stream_station_status() -> StreamingResponse:
+	"""Server-Sent Events stream of the /status body, pushed only when it changes"""
+	try:
+		# Make sure a first message exists before the stream opens
+		await gbfs_client.get_snapshot()
+	except httpx.HTTPError as e:
+		raise HTTPException(status_code=503, detail=f"Error fetching station data: {str(e)}")
+
+	return StreamingResponse(
+		status_broadcaster.subscribe(),
+		media_type="text/event-stream",
+		headers={
+			"Cache-Control": "no-cache",
+			# Stop nginx-style proxies from buffering the stream
+			"X-Accel-Buffering": "no",
+		},
+	)
@@ -0,0 +1,91 @@
+"""
+Multi-system endpoints
+"""
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import Dict, Optional
+from app.config import NEARBY_DEFAULT_RADIUS_METERS, NEARBY_MAX_RADIUS_METERS, NEARBY_MAX_RESULTS
+from app.services.gbfs_client import GBFSClient
+from app.services.responses import (
+	delta_payload,
+	negotiate_format,
+	negotiated_response,
+	render_status,
+	status_payload,
+)
+from app.services.systems import systems
+import httpx
+
+router = APIRouter(prefix="/api/systems", tags=["systems"])
+
+
+def _client(system: str) -> GBFSClient:
+	if system not in systems:
+		raise HTTPException(status_code=404, detail=f"Unknown system: {system}")
+	return systems.get(system)
+
+
+@router.get("")
+async def list_systems() -> Dict:
+	"""List configured bikeshare systems with their groups and feed freshness"""
+	return {
+		"systems": {
+			system: {
+				"station_groups": list(systems.get(system).station_groups),
+				"feeds": {
+					feed: {
+						"last_updated": state["last_updated"],
+						"age_seconds": round(systems.get(system).data_age(feed), 1),
+					}
+					for feed, state in systems.get(system).feed_state.items()
+				},
+				"refresher_running": systems.refreshers[system].running,
+				"circuit": systems.get(system).breaker.state,
+				**systems.get(system).freshness(),
+			}
+			for system in systems
+		}
+	}
+
+
+@router.get("/{system}/status")
+async def get_system_status(system: str, request: Request, since: Optional[int] = Query(None, ge=0)) -> Response:
+	"""Get current availability for a system's default station group
+
+	Supports ?since=<version> deltas and Accept formats like /api/stations/status.
+	"""
+	client = _client(system)
+	try:
+		snapshot = await client.get_snapshot()
+		freshness = client.freshness()
+		changes = client.changes_since(snapshot, since) if since is not None else None
+		if changes is not None:
+			return negotiated_response(request, delta_payload(snapshot, since, *changes, freshness))
+		rendered = render_status(f"{system}:status", snapshot, freshness, negotiate_format(request))
+		return rendered.to_response(request)
+	except httpx.HTTPError as e:
+		raise HTTPException(status_code=503, detail=f"Error fetching station data: {str(e)}")
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/{system}/nearby")
+async def get_system_nearby(
+	system: str,
+	request: Request,
+	lat: float = Query(..., ge=-90, le=90),
+	lon: float = Query(..., ge=-180, le=180),
+	radius: float = Query(NEARBY_DEFAULT_RADIUS_METERS, gt=0, le=NEARBY_MAX_RADIUS_METERS),
+	limit: int = Query(NEARBY_MAX_RESULTS, ge=1, le=NEARBY_MAX_RESULTS),
+) -> Response:
+	"""Get live status for a system's stations within `radius` meters of a point"""
+	client = _client(system)
+	try:
+		stations = await client.get_nearby_station_data(lat, lon, radius, limit)
+		return negotiated_response(request, {
+			**status_payload(stations, client.freshness()),
+			"query": {"system": system, "lat": lat, "lon": lon, "radius": radius, "limit": limit}
+		})
+	except httpx.HTTPError as e:
+		raise HTTPException(status_code=503, detail=f"Error fetching station data: {str(e)}")
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
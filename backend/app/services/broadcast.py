@@ -0,0 +1,71 @@
+"""
+Server-Sent Events fan-out of live station updates
+"""
+import asyncio
+from typing import AsyncIterator, Dict, Optional, Tuple
+from app.config import SSE_KEEPALIVE_SECONDS
+from app.services.gbfs_client import GBFSClient, gbfs_client
+from app.services.responses import render_status
+from app.services.snapshot import StationSnapshot
+
+
+class StatusBroadcaster:
+	"""Pushes the rendered status body to every subscriber when the station data changes
+
+	There is no per-connection queue: all subscribers wait on one shared
+	asyncio.Event that is swapped out on every publish, and each wakes up to
+	read the single pre-encoded message. An idle connection therefore costs
+	one suspended generator, and a slow client simply skips to the latest
+	message instead of buffering old ones.
+	"""
+
+	def __init__(self, client: GBFSClient):
+		self.client = client
+		self._changed = asyncio.Event()
+		self._message: Optional[bytes] = None
+		# (snapshot version, stale) of the last message
+		self._pushed: Optional[Tuple[int, bool]] = None
+		self.stats: Dict[str, int] = {"subscribers": 0, "broadcasts": 0}
+
+	def publish_snapshot(self, snapshot: StationSnapshot):
+		"""Snapshot listener: broadcast only on new station data or a stale flip
+
+		A newer upstream "as_of" alone re-renders the GET body (and its ETag)
+		but is not pushed; it rides along with the next message.
+		"""
+		freshness = self.client.freshness()
+		pushed = (snapshot.version, freshness["stale"])
+		if pushed == self._pushed:
+			return
+
+		rendered = render_status("status", snapshot, freshness)
+		self._pushed = pushed
+		self._message = b"event: status\nid: %d\ndata: %s\n\n" % (snapshot.version, rendered.body)
+		self.stats["broadcasts"] += 1
+
+		# Wake everyone waiting on the old event; later waits use the new one
+		changed, self._changed = self._changed, asyncio.Event()
+		changed.set()
+
+	async def subscribe(self) -> AsyncIterator[bytes]:
+		"""Yield the current message, then each new one; comments keep proxies open"""
+		self.stats["subscribers"] += 1
+		sent = None
+		try:
+			while True:
+				# A publish while the last chunk was still being sent swapped the
+				# event already: send the newer message instead of waiting
+				if self._message is not None and self._message is not sent:
+					sent = self._message
+					yield sent
+					continue
+				try:
+					await asyncio.wait_for(self._changed.wait(), SSE_KEEPALIVE_SECONDS)
+				except asyncio.TimeoutError:
+					yield b": keep-alive\n\n"
+		finally:
+			self.stats["subscribers"] -= 1
+
+
+# Global broadcaster for /api/stations/stream
+status_broadcaster = StatusBroadcaster(gbfs_client)
@@ -1,36 +1,192 @@
 """
-Simple in-memory cache with TTL
+Bounded in-memory LRU cache with TTL
 """
+import asyncio
+import itertools
+import sys
 import time
-from typing import Optional, Any
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from types import MappingProxyType
+from typing import Optional, Any, Dict
+from app.config import CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_SWEEP_INTERVAL_SECONDS
 
 
-class SimpleCache:
-	"""Simple in-memory cache with time-to-live"""
+# Containers larger than this are sized from an evenly spaced sample of their items
+SIZE_SAMPLE_ITEMS = 64
 
-	def __init__(self):
-		self._cache = {}
+
+def _sampled(items, count: int):
+	"""(items to measure, factor to scale their total by)"""
+	if count <= SIZE_SAMPLE_ITEMS:
+		return items, 1.0
+	step = count // SIZE_SAMPLE_ITEMS
+	return itertools.islice(items, 0, step * SIZE_SAMPLE_ITEMS, step), count / SIZE_SAMPLE_ITEMS
+
+
+def approximate_size(value: Any, _depth: int = 0, _seen: Optional[set] = None) -> int:
+	"""Rough deep size of a value in bytes (containers and dataclasses, 4 levels deep)
+
+	Large containers are extrapolated from a sample, so sizing a whole feed
+	index (thousands of station dicts) costs about as much as sizing a few
+	dozen.
+	"""
+	if _seen is None:
+		_seen = set()
+	if id(value) in _seen:
+		return 0
+	_seen.add(id(value))
+
+	size = sys.getsizeof(value)
+	if _depth >= 4:
+		return size
+	if isinstance(value, (dict, MappingProxyType)):
+		items, scale = _sampled(value.items(), len(value))
+		size += int(scale * sum(
+			approximate_size(key, _depth + 1, _seen) + approximate_size(item, _depth + 1, _seen)
+			for key, item in items
+		))
+	elif isinstance(value, (list, tuple, set, frozenset)):
+		items, scale = _sampled(value, len(value))
+		size += int(scale * sum(approximate_size(item, _depth + 1, _seen) for item in items))
+	elif is_dataclass(value) and not isinstance(value, type):
+		for field in fields(value):
+			size += approximate_size(getattr(value, field.name), _depth + 1, _seen)
+	return size
+
+
+class LRUCache:
+	"""In-memory cache with time-to-live, an entry cap and an approximate byte budget
+
+	The least recently used entries are evicted once either limit is exceeded,
+	and expired entries are dropped by a periodic sweep as well as on read.
+	Hit/miss/eviction counters are kept per namespace, the part of the key
+	before the first ':' (e.g. "nearby:citibike:40.81,-73.96,500" -> "nearby").
+
+	Every method is synchronous and never awaits, so calls from concurrent
+	asyncio tasks on one event loop cannot interleave.
+	"""
+
+	def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		# key -> (value, expiry, size in bytes), least recently used first
+		self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+		self._bytes = 0
+		self._stats: Dict[str, Dict[str, int]] = {}
+		self._sweeper: Optional[asyncio.Task] = None
+
+	@staticmethod
+	def _namespace(key: str) -> str:
+		return key.split(":", 1)[0]
+
+	def _count(self, key: str, counter: str):
+		stats = self._stats.setdefault(self._namespace(key), {
+			"hits": 0,
+			"misses": 0,
+			"evictions": 0,
+			"expirations": 0,
+		})
+		stats[counter] += 1
+
+	def _remove(self, key: str):
+		_, _, size = self._cache.pop(key)
+		self._bytes -= size
 
 	def get(self, key: str) -> Optional[Any]:
 		"""Get value from cache if not expired"""
 		if key in self._cache:
-			value, expiry = self._cache[key]
+			value, expiry, _ = self._cache[key]
 			if time.time() < expiry:
+				self._cache.move_to_end(key)
+				self._count(key, "hits")
 				return value
 			else:
 				# Expired, remove from cache
-				del self._cache[key]
+				self._remove(key)
+				self._count(key, "expirations")
+		self._count(key, "misses")
 		return None
 
-	def set(self, key: str, value: Any, ttl_seconds: int):
-		"""Set value in cache with TTL"""
+	def set(self, key: str, value: Any, ttl_seconds: float, size_bytes: Optional[int] = None):
+		"""Set value in cache with TTL
+
+		size_bytes defaults to approximate_size(value); pass it when known.
+		"""
+		size = size_bytes
+		if key in self._cache:
+			previous, _, previous_size = self._cache[key]
+			if size is None and previous is value:
+				# Re-stored with a new TTL (e.g. unchanged feed): skip re-measuring
+				size = previous_size
+			self._remove(key)
+		if size is None:
+			size = approximate_size(value)
 		expiry = time.time() + ttl_seconds
-		self._cache[key] = (value, expiry)
+		self._cache[key] = (value, expiry, size)
+		self._bytes += size
+
+		# Evict least recently used entries, but never the one just stored
+		while len(self._cache) > 1 and (len(self._cache) > self.max_entries or self._bytes > self.max_bytes):
+			oldest = next(iter(self._cache))
+			self._remove(oldest)
+			self._count(oldest, "evictions")
+
+	def delete(self, key: str):
+		"""Remove one entry if present"""
+		if key in self._cache:
+			self._remove(key)
+
+	def sweep(self) -> int:
+		"""Drop every expired entry; returns how many were removed"""
+		now = time.time()
+		expired = [key for key, (_, expiry, _) in self._cache.items() if expiry <= now]
+		for key in expired:
+			self._remove(key)
+			self._count(key, "expirations")
+		return len(expired)
 
 	def clear(self):
 		"""Clear all cache entries"""
 		self._cache.clear()
+		self._bytes = 0
+
+	def stats(self) -> Dict:
+		"""Size, limits and per-namespace counters (with hit ratio)"""
+		namespaces = {}
+		for namespace, counters in self._stats.items():
+			lookups = counters["hits"] + counters["misses"]
+			namespaces[namespace] = {
+				**counters,
+				"hit_ratio": round(counters["hits"] / lookups, 3) if lookups else None,
+			}
+		return {
+			"entries": len(self._cache),
+			"bytes": self._bytes,
+			"max_entries": self.max_entries,
+			"max_bytes": self.max_bytes,
+			"namespaces": namespaces,
+		}
+
+	def start_sweeper(self, interval_seconds: float = CACHE_SWEEP_INTERVAL_SECONDS):
+		"""Start the periodic expiry sweep on the running event loop"""
+		if self._sweeper is None or self._sweeper.done():
+			self._sweeper = asyncio.create_task(self._sweep_forever(interval_seconds))
+
+	async def stop_sweeper(self):
+		if self._sweeper is not None:
+			self._sweeper.cancel()
+			try:
+				await self._sweeper
+			except asyncio.CancelledError:
+				pass
+			self._sweeper = None
+
+	async def _sweep_forever(self, interval_seconds: float):
+		while True:
+			await asyncio.sleep(interval_seconds)
+			self.sweep()
 
 
 # Global cache instance
-cache = SimpleCache()
+cache = LRUCache()
@@ -0,0 +1,115 @@
+"""
+Circuit breaker for upstream GBFS requests
+"""
+import time
+from typing import Dict, Optional
+import httpx
+from app.config import (
+	CIRCUIT_FAILURE_THRESHOLD,
+	CIRCUIT_RESET_SECONDS,
+	CIRCUIT_MAX_RESET_SECONDS,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(httpx.HTTPError):
+	"""Raised instead of calling upstream while the circuit is open
+
+	Subclasses httpx.HTTPError so callers that already map upstream errors
+	to 503 (or fall back to last-good data) handle it the same way.
+	"""
+
+
+class CircuitBreaker:
+	"""Stops calling a failing upstream and probes it again after a cool-down
+
+	closed: requests go through; CIRCUIT_FAILURE_THRESHOLD consecutive
+	failures open the circuit.
+	open: requests fail immediately with CircuitOpenError until the
+	cool-down has passed.
+	half_open: one probe request goes through; success closes the circuit,
+	failure re-opens it with the cool-down doubled (up to
+	CIRCUIT_MAX_RESET_SECONDS).
+	"""
+
+	def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+			reset_seconds: float = CIRCUIT_RESET_SECONDS,
+			max_reset_seconds: float = CIRCUIT_MAX_RESET_SECONDS):
+		self.name = name
+		self.failure_threshold = failure_threshold
+		self.reset_seconds = reset_seconds
+		self.max_reset_seconds = max_reset_seconds
+		self._state = CLOSED
+		self._failures = 0
+		self._cooldown = reset_seconds
+		self._retry_at: Optional[float] = None
+		self._probing = False
+		self.stats: Dict = {"opened": 0, "rejected": 0, "last_failure": None}
+
+	@property
+	def state(self) -> str:
+		if self._state == OPEN and time.time() >= self._retry_at:
+			return HALF_OPEN
+		return self._state
+
+	@property
+	def retry_in(self) -> Optional[float]:
+		"""Seconds until a probe may go upstream, or None while the circuit is closed"""
+		if self._state == CLOSED:
+			return None
+		return max(self._retry_at - time.time(), 0)
+
+	def before_request(self):
+		"""Raise CircuitOpenError unless a request may go upstream now"""
+		state = self.state
+		if state == CLOSED:
+			return
+		if state == HALF_OPEN and not self._probing:
+			# Let exactly one request find out whether upstream is back
+			self._state = HALF_OPEN
+			self._probing = True
+			return
+		self.stats["rejected"] += 1
+		raise CircuitOpenError(f"{self.name} upstream unavailable, retrying in {self.retry_in:.0f}s")
+
+	def record_success(self):
+		self._state = CLOSED
+		self._failures = 0
+		self._cooldown = self.reset_seconds
+		self._retry_at = None
+		self._probing = False
+
+	def record_failure(self, error: Exception):
+		self.stats["last_failure"] = str(error)
+		self._failures += 1
+		if self._state == HALF_OPEN:
+			# The probe failed: back off further before the next one
+			self._cooldown = min(self._cooldown * 2, self.max_reset_seconds)
+			self._open()
+		elif self._state == CLOSED and self._failures >= self.failure_threshold:
+			self._open()
+
+	def release(self):
+		"""A request ended without an upstream verdict (e.g. it was cancelled)"""
+		self._probing = False
+		if self._state == HALF_OPEN:
+			# Let the next request probe instead
+			self._state = OPEN
+
+	def _open(self):
+		self._state = OPEN
+		self._retry_at = time.time() + self._cooldown
+		self._probing = False
+		self.stats["opened"] += 1
+
+	def snapshot(self) -> Dict:
+		"""Current state and counters, for health endpoints"""
+		return {
+			"state": self.state,
+			"consecutive_failures": self._failures,
+			"retry_in": round(self.retry_in, 1) if self.retry_in is not None else None,
+			**self.stats,
+		}
@@ -0,0 +1,331 @@
+"""
+Hourly departure forecasts from the XGBoost model trained by
+scripts/export_forecasting.py
+
+Once per hour every modelled station and horizon is predicted in one batched
+call and cached until the next hour boundary; requests only slice that
+result. Features are built with numpy from:
+
+- the local calendar (hour/day/month encodings, semester, holidays, finals)
+- departures/arrivals per hour estimated from the status history (a drop in
+  bikes available counts as departures, a rise as arrivals)
+- the per-station hourly profile stored with the model, used for hours the
+  history does not cover and for lags that fall in the future
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import httpx
+import numpy as np
+from app.config import (
+	FORECAST_MODEL_PATH,
+	FORECAST_METADATA_PATH,
+	FORECAST_TIMEZONE,
+	FORECAST_MAX_HOURS,
+	FORECAST_MIN_COVERAGE_SECONDS,
+)
+from app.services.cache import cache
+from app.services.gbfs_client import GBFSClient, gbfs_client
+from app.services.history import HISTORY_FIELDS, HistoryStore, history_store
+from app.services.singleflight import singleflight
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+# Hours of departures the lag and rolling features look back over
+LOOKBACK_HOURS = 168
+
+FEATURES = {
+	"hour_sin", "hour_cos", "day_sin", "day_cos", "month_sin", "month_cos",
+	"is_weekend", "is_rush_hour",
+	"is_semester", "is_holiday", "is_finals", "is_study_day", "is_break",
+	"days_since_semester_start",
+	"departures_lag_1h", "departures_lag_24h", "departures_lag_168h",
+	"arrivals_lag_1h", "total_trips_lag_1h",
+	"departures_rolling_avg_24h", "departures_rolling_avg_7d",
+	"system_departures_lag_1h", "system_total_trips_lag_1h",
+	"historical_avg_departures",
+	"semester_weekday", "hour_weekend_interaction",
+	"station_id_encoded",
+}
+
+
+def hourly_flows(timestamps: np.ndarray, bikes: np.ndarray, window_start: int,
+		hours: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""(departures, arrivals, covered) per hour from samples of bikes available
+
+	Changes between consecutive samples are attributed to the hour of the
+	later sample. An hour counts as covered when its samples span at least
+	FORECAST_MIN_COVERAGE_SECONDS. Departures and returns between two samples
+	cancel out, so counts are a lower bound.
+	"""
+	departures = np.zeros(hours)
+	arrivals = np.zeros(hours)
+	covered = np.zeros(hours, dtype=bool)
+	if len(timestamps) < 2:
+		return departures, arrivals, covered
+
+	t = timestamps.astype(np.int64)
+	slot = (t - window_start) // HOUR
+	in_window = (slot >= 0) & (slot < hours)
+	change = np.diff(bikes.astype(np.int32))
+	later = in_window[1:]
+	departures = np.bincount(slot[1:][later], weights=np.maximum(-change[later], 0), minlength=hours)
+	arrivals = np.bincount(slot[1:][later], weights=np.maximum(change[later], 0), minlength=hours)
+
+	first = np.full(hours, np.iinfo(np.int64).max)
+	last = np.full(hours, np.iinfo(np.int64).min)
+	np.minimum.at(first, slot[in_window], t[in_window])
+	np.maximum.at(last, slot[in_window], t[in_window])
+	covered = last - first >= FORECAST_MIN_COVERAGE_SECONDS
+	return departures, arrivals, covered
+
+
+class AcademicCalendar:
+	"""Calendar features for one day, as computed in scripts/export_forecasting.py"""
+
+	def __init__(self, calendar: Dict):
+		def dates(key):
+			return {date.fromisoformat(day) for day in calendar.get(key, [])}
+
+		self.semester_periods = [
+			(date.fromisoformat(start), date.fromisoformat(end))
+			for start, end in calendar.get("semester_periods", [])
+		]
+		self.semester_starts = sorted(dates("semester_starts"))
+		self.holidays = dates("holidays")
+		self.finals = dates("finals")
+		self.study_days = dates("study_days")
+		self.breaks = dates("breaks")
+
+	def features(self, day: date) -> Dict[str, int]:
+		past_starts = [start for start in self.semester_starts if start <= day]
+		return {
+			"is_semester": int(any(start <= day <= end for start, end in self.semester_periods)),
+			"is_holiday": int(day in self.holidays),
+			"is_finals": int(day in self.finals),
+			"is_study_day": int(day in self.study_days),
+			"is_break": int(day in self.breaks),
+			"days_since_semester_start": (day - past_starts[-1]).days if past_starts else 999,
+		}
+
+
+class DemandForecaster:
+	"""Serves the departure model for the stations it was trained on"""
+
+	def __init__(self, client: GBFSClient, history: HistoryStore,
+			model_path: Path = FORECAST_MODEL_PATH, metadata_path: Path = FORECAST_METADATA_PATH):
+		self.client = client
+		self.history = history
+		self.model_path = Path(model_path)
+		self.metadata_path = Path(metadata_path)
+		self.timezone = ZoneInfo(FORECAST_TIMEZONE)
+		self._booster = None
+		self._loading: Optional[asyncio.Task] = None
+		self.metadata: Optional[Dict] = None
+		# Why the model is unavailable, if it is
+		self.error: Optional[str] = "not loaded"
+		self.stats: Dict = {"computations": 0, "last_compute_ms": None, "live_hours_fraction": None}
+
+	@property
+	def available(self) -> bool:
+		return self._booster is not None
+
+	def _load(self):
+		# Imported here, not at module level: xgboost (and the scipy it pulls in)
+		# is most of the app's import time and only this background load needs it
+		try:
+			import xgboost
+		except ImportError:
+			raise ValueError("xgboost is not installed")
+		metadata = json.loads(self.metadata_path.read_text())
+		unknown = set(metadata["feature_cols"]) - FEATURES
+		if unknown:
+			raise ValueError(f"model uses unsupported features: {sorted(unknown)}")
+		booster = xgboost.Booster(model_file=str(self.model_path))
+		if booster.feature_names and list(booster.feature_names) != metadata["feature_cols"]:
+			raise ValueError("model features do not match its metadata")
+		# Batches are tiny (stations x horizons); threads would only add overhead
+		booster.set_param({"nthread": 1})
+
+		self.metadata = metadata
+		self._stations: List[str] = metadata["stations"]
+		self._profile_departures = np.array(metadata["profile_departures"], dtype=np.float64)
+		self._profile_arrivals = np.array(metadata["profile_arrivals"], dtype=np.float64)
+		self._calendar = AcademicCalendar(metadata.get("calendar", {}))
+		self._booster = booster
+		self.error = None
+
+	def start(self):
+		"""Load the model in the background so startup does not wait for it"""
+		if self._loading is None:
+			self.error = "loading"
+			self._loading = asyncio.create_task(self.load())
+
+	async def load(self):
+		"""Load the model artifact off the event loop; the endpoint reports why if it fails"""
+		try:
+			await asyncio.to_thread(self._load)
+		except Exception as e:
+			# Missing artifact, bad metadata, or XGBoostError for an incompatible model file
+			self.error = str(e)
+			logger.warning("Forecast model unavailable: %s", e)
+
+	async def forecast(self) -> Dict:
+		"""All stations x FORECAST_MAX_HOURS from the current hour, cached until the next hour"""
+		current_hour = int(time.time()) // HOUR * HOUR
+		key = f"forecast:{current_hour}"
+		cached = cache.get(key)
+		if cached is not None:
+			return cached
+
+		async def compute():
+			result = await self._compute(current_hour)
+			cache.set(key, result, max(current_hour + HOUR - time.time(), 1))
+			return result
+
+		return await singleflight.do(key, compute)
+
+	async def _live_flows(self, station_ids: List[Optional[str]], window_start: int) -> Tuple[np.ndarray, ...]:
+		"""Hourly departures, arrivals and coverage per station over the lookback window"""
+		shape = (len(station_ids), LOOKBACK_HOURS)
+		departures, arrivals, covered = np.zeros(shape), np.zeros(shape), np.zeros(shape, dtype=bool)
+		bikes_column = HISTORY_FIELDS.index("bikes")
+		for i, station_id in enumerate(station_ids):
+			if station_id is None:
+				continue
+			timestamps, values = await self.history.samples(station_id, window_start - HOUR, window_start + LOOKBACK_HOURS * HOUR - 1)
+			departures[i], arrivals[i], covered[i] = hourly_flows(
+				timestamps, values[bikes_column], window_start, LOOKBACK_HOURS
+			)
+		return departures, arrivals, covered
+
+	async def _compute(self, current_hour: int) -> Dict:
+		started = time.perf_counter()
+		try:
+			snapshot = await self.client.get_snapshot()
+			by_short_name = snapshot.info.by_short_name
+		except httpx.HTTPError:
+			# No station metadata: forecasts still work from the stored profile
+			by_short_name = {}
+		records = [by_short_name.get(short_name, {}) for short_name in self._stations]
+		station_ids = [record.get("station_id") for record in records]
+
+		horizons = FORECAST_MAX_HOURS
+		window_start = current_hour - LOOKBACK_HOURS * HOUR
+		window = [
+			datetime.fromtimestamp(window_start + i * HOUR, self.timezone)
+			for i in range(LOOKBACK_HOURS + horizons)
+		]
+		window_hour = np.array([moment.hour for moment in window])
+		window_weekend = np.array([int(moment.weekday() >= 5) for moment in window])
+
+		# Profile everywhere, then live counts for past hours the history covers
+		departures = self._profile_departures[:, window_weekend, window_hour]
+		arrivals = self._profile_arrivals[:, window_weekend, window_hour]
+		live_departures, live_arrivals, covered = await self._live_flows(station_ids, window_start)
+		departures[:, :LOOKBACK_HOURS] = np.where(covered, live_departures, departures[:, :LOOKBACK_HOURS])
+		arrivals[:, :LOOKBACK_HOURS] = np.where(covered, live_arrivals, arrivals[:, :LOOKBACK_HOURS])
+
+		X = self._features(window[LOOKBACK_HOURS:], departures, arrivals)
+		predictions = await asyncio.to_thread(self._booster.inplace_predict, X)
+		predictions = np.clip(predictions.reshape(len(self._stations), horizons).astype(np.float64), 0, None)
+
+		elapsed_ms = (time.perf_counter() - started) * 1000
+		self.stats["computations"] += 1
+		self.stats["last_compute_ms"] = round(elapsed_ms, 2)
+		self.stats["live_hours_fraction"] = round(float(covered.mean()), 3)
+		return {
+			"generated_at": int(time.time()),
+			"hours": [current_hour + k * HOUR for k in range(horizons)],
+			"stations": {
+				short_name: {
+					"short_name": short_name,
+					"station_id": station_ids[i],
+					"name": records[i].get("name"),
+					"departures": np.round(predictions[i], 2).tolist(),
+				}
+				for i, short_name in enumerate(self._stations)
+			},
+			"by_station_id": {
+				station_id: short_name
+				for station_id, short_name in zip(station_ids, self._stations)
+				if station_id is not None
+			},
+			"live_hours_fraction": self.stats["live_hours_fraction"],
+		}
+
+	def _features(self, targets: List[datetime], departures: np.ndarray, arrivals: np.ndarray) -> np.ndarray:
+		"""Model input, one row per (station, target hour), station-major
+
+		departures/arrivals cover LOOKBACK_HOURS before the first target plus
+		the targets themselves; target k sits at column LOOKBACK_HOURS + k.
+		"""
+		stations, horizons, lookback = len(self._stations), len(targets), LOOKBACK_HOURS
+
+		hour = np.array([moment.hour for moment in targets])
+		day_of_week = np.array([moment.weekday() for moment in targets])
+		month = np.array([moment.month for moment in targets])
+		weekend = (day_of_week >= 5).astype(int)
+		calendar = [self._calendar.features(moment.date()) for moment in targets]
+		per_hour = {
+			"hour_sin": np.sin(2 * np.pi * hour / 24),
+			"hour_cos": np.cos(2 * np.pi * hour / 24),
+			"day_sin": np.sin(2 * np.pi * day_of_week / 7),
+			"day_cos": np.cos(2 * np.pi * day_of_week / 7),
+			"month_sin": np.sin(2 * np.pi * (month - 1) / 12),
+			"month_cos": np.cos(2 * np.pi * (month - 1) / 12),
+			"is_weekend": weekend,
+			"is_rush_hour": ((weekend == 0) & (((hour >= 7) & (hour <= 9)) | ((hour >= 16) & (hour <= 18)))).astype(int),
+			"hour_weekend_interaction": hour * weekend,
+			**{name: np.array([day[name] for day in calendar]) for name in calendar[0]},
+		}
+		per_hour["semester_weekday"] = per_hour["is_semester"] * (1 - weekend)
+
+		# Column i of the window is hour window_start + i; target k is column lookback + k
+		previous = slice(lookback - 1, lookback - 1 + horizons)
+		cumulative = np.concatenate([np.zeros((stations, 1)), np.cumsum(departures, axis=1)], axis=1)
+		through_target = cumulative[:, lookback + 1:lookback + 1 + horizons]
+		system_departures = departures.sum(axis=0)
+		system_total = system_departures + arrivals.sum(axis=0)
+		per_station = {
+			"departures_lag_1h": departures[:, previous],
+			"departures_lag_24h": departures[:, lookback - 24:lookback - 24 + horizons],
+			"departures_lag_168h": departures[:, :horizons],
+			"arrivals_lag_1h": arrivals[:, previous],
+			"total_trips_lag_1h": departures[:, previous] + arrivals[:, previous],
+			"departures_rolling_avg_24h": (through_target - cumulative[:, lookback - 23:lookback - 23 + horizons]) / 24,
+			"departures_rolling_avg_7d": (through_target - cumulative[:, 1:1 + horizons]) / 168,
+			"system_departures_lag_1h": np.broadcast_to(system_departures[previous], (stations, horizons)),
+			"system_total_trips_lag_1h": np.broadcast_to(system_total[previous], (stations, horizons)),
+			"historical_avg_departures": self._profile_departures[:, weekend, hour],
+			"station_id_encoded": np.broadcast_to(np.arange(stations)[:, None], (stations, horizons)),
+		}
+
+		columns = []
+		for name in self.metadata["feature_cols"]:
+			if name in per_hour:
+				columns.append(np.tile(per_hour[name], stations))
+			else:
+				columns.append(np.asarray(per_station[name]).reshape(-1))
+		return np.column_stack(columns).astype(np.float32)
+
+	def status(self) -> Dict:
+		"""Model availability and metadata, for health endpoints"""
+		return {
+			"available": self.available,
+			"loading": self._loading is not None and not self._loading.done(),
+			"error": self.error,
+			"trained_at": self.metadata.get("trained_at") if self.metadata else None,
+			"metrics": self.metadata.get("metrics") if self.metadata else None,
+			**self.stats,
+		}
+
+
+# Global forecaster for the default system's stations
+forecaster = DemandForecaster(gbfs_client, history_store)
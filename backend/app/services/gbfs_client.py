@@ -1,117 +1,697 @@
 """
 Citi Bike GBFS API client
 """
+import asyncio
+import hashlib
+import json
+import time
 import httpx
-from typing import List, Dict, Optional
+from typing import Any, Awaitable, Callable, FrozenSet, Iterable, List, Dict, Mapping, Optional, Tuple
 from app.config import (
-	STATION_INFORMATION_URL,
-	STATION_STATUS_URL,
-	COLUMBIA_STATION_IDS,
-	CACHE_TTL_SECONDS
+	DEFAULT_SYSTEM,
+	GBFS_SYSTEMS,
+	SYSTEM_MAX_CONCURRENT_FETCHES,
+	SNAPSHOT_DELTA_VERSIONS,
+	STATUS_SELECTIVE_PARSE,
+	STATUS_SELECTIVE_MAX_STATIONS,
+	STATUS_TRACKED_IDLE_SECONDS,
+	CACHE_TTL_SECONDS,
+	REFRESH_MIN_INTERVAL_SECONDS,
+	STALE_GRACE_SECONDS,
+	HTTP_TIMEOUT_SECONDS,
+	HTTP_CONNECT_TIMEOUT_SECONDS,
+	HTTP_MAX_CONNECTIONS,
+	HTTP_MAX_KEEPALIVE_CONNECTIONS,
+	HTTP_KEEPALIVE_EXPIRY_SECONDS,
+	HTTP2_ENABLED,
 )
 from app.services.cache import cache
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.gbfs_parser import parse_station_subset
+from app.services.metrics import UPSTREAM_FETCH_SECONDS, UPSTREAM_PAYLOAD_BYTES, JSON_PARSE_SECONDS
+from app.services.singleflight import singleflight
+from app.services.snapshot import FeedIndex, StationSnapshot, combine_tracked_station, diff_stations
+from app.services.spatial import GridIndex
 
+try:
+	import h2  # noqa: F401  (required by httpx for HTTP/2)
+	_HTTP2_AVAILABLE = True
+except ImportError:
+	_HTTP2_AVAILABLE = False
 
-class GBFSClient:
-	"""Client for fetching Citi Bike station data"""
+
+class FetchTimer:
+	"""Collects connect/TLS/transfer timings for one request via the httpx trace hook"""
 
 	def __init__(self):
-		self.timeout = 10.0  # seconds
+		self._started = {}
+		self.timings = {
+			"connect_ms": 0.0,
+			"tls_ms": 0.0,
+			"wait_ms": 0.0,
+			"transfer_ms": 0.0,
+			"total_ms": 0.0,
+			"connection_reused": True,
+		}
+
+	async def trace(self, event_name: str, info: Dict):
+		"""httpx trace callback; event names look like 'connection.connect_tcp.started'"""
+		now = time.perf_counter()
+		step, _, phase = event_name.rpartition(".")
+		if phase == "started":
+			self._started[step] = now
+			return
+		if phase != "complete" or step not in self._started:
+			return
+
+		elapsed_ms = (now - self._started.pop(step)) * 1000
+		if step == "connection.connect_tcp":
+			# DNS lookup happens inside connect_tcp
+			self.timings["connect_ms"] += elapsed_ms
+			self.timings["connection_reused"] = False
+		elif step == "connection.start_tls":
+			self.timings["tls_ms"] += elapsed_ms
+		elif step.endswith("receive_response_headers"):
+			self.timings["wait_ms"] += elapsed_ms
+		elif step.endswith("receive_response_body"):
+			self.timings["transfer_ms"] += elapsed_ms
+
+
+def _parse_status(content: bytes, subset: Optional[FrozenSet[str]]) -> Dict:
+	"""Decode a status feed, only the stations in subset unless it is None"""
+	return json.loads(content) if subset is None else parse_station_subset(content, subset)
+
+
+class GBFSClient:
+	"""Client for fetching one bikeshare system's GBFS station data"""
+
+	def __init__(self, system: str = DEFAULT_SYSTEM):
+		config = GBFS_SYSTEMS[system]
+		self.system = system
+		self.station_information_url = f"{config['base_url']}/station_information.json"
+		self.station_status_url = f"{config['base_url']}/station_status.json"
+		self.station_groups: Dict[str, List[str]] = config.get("station_groups", {})
+		# Short names of the stations the snapshot (and /status) is built for
+		self.default_short_names: List[str] = self.station_groups.get(config.get("default_group"), [])
+		# Caps this system's upstream requests so one slow system cannot hog the others
+		self._fetch_slots = asyncio.Semaphore(config.get("max_concurrent_fetches", SYSTEM_MAX_CONCURRENT_FETCHES))
+		self.timeout = HTTP_TIMEOUT_SECONDS
+		self._client: Optional[httpx.AsyncClient] = None
+		# Most recent timings per feed, e.g. {"station_status": {...}}
+		self.fetch_timings: Dict[str, Dict] = {}
+		# Freshness per feed from its own last_updated/ttl fields
+		self.feed_state: Dict[str, Dict] = {}
+		self._revalidations: Dict[str, asyncio.Task] = {}
+		self._snapshot: Optional[StationSnapshot] = None
+		# version -> combined_by_id of recent snapshots (oldest first), for deltas.
+		# Only the joined records are kept, not the feed indexes they came from.
+		self._recent_versions: Dict[int, Mapping[str, Dict]] = {}
+		# Stale flag the snapshot listeners were last called with
+		self._published_stale: Optional[bool] = None
+		# Called with each newly built snapshot (e.g. to push it to clients)
+		self.snapshot_listeners: List[Callable[[StationSnapshot], None]] = []
+		# Validators (ETag, Last-Modified, content hash) of the last full response per feed
+		self._validators: Dict[str, Dict] = {}
+		# Refreshes skipped because the feed was unchanged, and what that saved
+		self.change_stats: Dict[str, Dict] = {}
+		# Fails fast while this system's upstream is down
+		self.breaker = CircuitBreaker(system)
+		# Most recent successfully loaded index per feed, served when upstream is unavailable
+		self.last_good: Dict[str, FeedIndex] = {}
+		# Station UUIDs the cached status index was parsed for (None = all)
+		self._status_subset: Optional[FrozenSet[str]] = None
+		# Last downloaded status body, so a new subset is re-parsed rather than re-downloaded
+		self._status_body: Optional[bytes] = None
+		# Extra station UUIDs asked for by nearby/group queries -> when last asked for.
+		# They stay in the status subset until unqueried for STATUS_TRACKED_IDLE_SECONDS.
+		self.tracked_station_ids: Dict[str, float] = {}
+		# (info index it was built from, grid) for nearby lookups
+		self._spatial: Optional[Tuple[FeedIndex, GridIndex]] = None
+		# feed name -> (cache key, loader), used by the background refresher.
+		# Keys carry the system after the kind, so cache namespaces stay per kind.
+		self.feeds: Dict[str, tuple] = {
+			"station_information": (self._key("station_info"), self._load_station_information),
+			"station_status": (self._key("station_status_all"), self._load_station_status),
+		}
+
+	def _key(self, name: str) -> str:
+		"""Cache/single-flight key for this system: "nearby:40.8,..." -> "nearby:citibike:40.8,..."
+
+		The kind stays first because the cache counts hits per key prefix.
+		"""
+		kind, _, rest = name.partition(":")
+		return f"{kind}:{self.system}:{rest}" if rest else f"{kind}:{self.system}"
+
+	def _create_client(self) -> httpx.AsyncClient:
+		"""Build the pooled keep-alive client shared by all fetches"""
+		limits = httpx.Limits(
+			max_connections=HTTP_MAX_CONNECTIONS,
+			max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+			keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+		)
+		timeout = httpx.Timeout(self.timeout, connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+		return httpx.AsyncClient(
+			timeout=timeout,
+			limits=limits,
+			http2=HTTP2_ENABLED and _HTTP2_AVAILABLE,
+		)
+
+	async def start(self):
+		"""Open the shared HTTP client (called from the app lifespan)"""
+		if self._client is None or self._client.is_closed:
+			# Loading the CA bundle takes tens of ms; keep it off the event loop
+			self._client = await asyncio.to_thread(self._create_client)
+
+	async def close(self):
+		"""Close the shared HTTP client and its pooled connections"""
+		if self._client is not None:
+			await self._client.aclose()
+			self._client = None
+
+	async def _get_json(self, feed: str, url: str, conditional: bool = False,
+			parse: Callable[[bytes], Any] = json.loads) -> Optional[Dict]:
+		"""GET a GBFS feed over the shared client and record its timings
+
+		With conditional=True the request carries If-None-Match/If-Modified-Since
+		from the previous response, and a body whose content hash matches the
+		previous one is not parsed. Returns None when the feed is unchanged.
+		"""
+		if self._client is None or self._client.is_closed:
+			# Used outside the app lifespan (scripts, notebooks)
+			await self.start()
+
+		previous = self._validators.get(feed, {}) if conditional else {}
+		headers = {}
+		if previous.get("etag"):
+			headers["If-None-Match"] = previous["etag"]
+		if previous.get("last_modified"):
+			headers["If-Modified-Since"] = previous["last_modified"]
+
+		timer = FetchTimer()
+		started = time.perf_counter()
+		# UPSTREAM_FETCH_SECONDS status label: the HTTP status, or how the fetch failed
+		outcome = "error"
+		try:
+			# Raises CircuitOpenError without touching upstream while it is known to be down
+			self.breaker.before_request()
+			try:
+				async with self._fetch_slots:
+					started = time.perf_counter()
+					response = await self._client.get(url, headers=headers, extensions={"trace": timer.trace})
+				outcome = str(response.status_code)
+				if response.status_code != 304:
+					response.raise_for_status()
+			except httpx.HTTPError as e:
+				self.breaker.record_failure(e)
+				raise
+			except BaseException:
+				self.breaker.release()
+				raise
+		except CircuitOpenError:
+			outcome = "circuit_open"
+			raise
+		except httpx.TimeoutException:
+			outcome = "timeout"
+			raise
+		except asyncio.CancelledError:
+			outcome = "cancelled"
+			raise
+		finally:
+			# Failed fetches are timed too, so upstream trouble shows in the histogram
+			elapsed = time.perf_counter() - started
+			UPSTREAM_FETCH_SECONDS.labels(self.system, feed, outcome).observe(elapsed)
+		self.breaker.record_success()
+		content = response.content
+		timer.timings["total_ms"] = elapsed * 1000
+		UPSTREAM_PAYLOAD_BYTES.labels(self.system, feed).observe(len(content))
+		timer.timings["http_version"] = response.http_version
+		timer.timings["bytes"] = len(content)
+		timer.timings["status_code"] = response.status_code
+
+		stats = self.change_stats.setdefault(feed, {
+			"fetches": 0,
+			"not_modified": 0,
+			"unchanged": 0,
+			"bytes_saved": 0,
+			"parse_ms_saved": 0.0,
+		})
+		stats["fetches"] += 1
+
+		data = None
+		if response.status_code == 304:
+			# Upstream confirmed nothing changed: no body transferred or parsed
+			stats["not_modified"] += 1
+			stats["bytes_saved"] += previous.get("bytes", 0)
+			stats["parse_ms_saved"] += previous.get("parse_ms", 0.0)
+		else:
+			digest = hashlib.blake2b(content, digest_size=16).digest()
+			if previous and digest == previous.get("digest"):
+				# Same payload without validator support: skip parsing and rebuilds
+				stats["unchanged"] += 1
+				stats["parse_ms_saved"] += previous.get("parse_ms", 0.0)
+				parse_ms = previous.get("parse_ms", 0.0)
+			else:
+				parse_started = time.perf_counter()
+				data = parse(content)
+				parse_seconds = time.perf_counter() - parse_started
+				JSON_PARSE_SECONDS.labels(self.system, feed).observe(parse_seconds)
+				parse_ms = parse_seconds * 1000
+				timer.timings["parse_ms"] = parse_ms
+			self._validators[feed] = {
+				"etag": response.headers.get("etag"),
+				"last_modified": response.headers.get("last-modified"),
+				"digest": digest,
+				"bytes": len(content),
+				"parse_ms": parse_ms,
+			}
+
+		self.fetch_timings[feed] = {
+			key: round(value, 2) if isinstance(value, float) else value
+			for key, value in timer.timings.items()
+		}
+		return data
+
+	def _cache_feed(self, feed: str, key: str, data: Dict, value) -> None:
+		"""Cache a parsed feed until its own expiry plus the stale grace window
+
+		GBFS feeds say they are valid until last_updated + ttl. That is clamped
+		to [REFRESH_MIN_INTERVAL_SECONDS, CACHE_TTL_SECONDS] from now so a tiny
+		or missing ttl neither hammers upstream nor keeps data forever.
+		"""
+		now = time.time()
+		last_updated = data.get("last_updated")
+		ttl = data.get("ttl")
+		if isinstance(last_updated, (int, float)) and isinstance(ttl, (int, float)):
+			fresh_until = last_updated + ttl
+		else:
+			fresh_until = now + CACHE_TTL_SECONDS
+		fresh_until = min(max(fresh_until, now + REFRESH_MIN_INTERVAL_SECONDS), now + CACHE_TTL_SECONDS)
+
+		self.feed_state[feed] = {
+			"last_updated": last_updated,
+			"ttl": ttl,
+			"fetched_at": now,
+			"fresh_until": fresh_until,
+			"source": "upstream",
+		}
+		self.last_good[feed] = value
+		cache.set(key, value, fresh_until - now + STALE_GRACE_SECONDS)
+
+	@property
+	def has_data(self) -> bool:
+		"""Whether every feed has been loaded (from upstream, disk or another worker)"""
+		return len(self.last_good) == len(self.feeds)
+
+	def is_fresh(self, feed: str, lead_seconds: float = 0) -> bool:
+		"""Whether a feed's cached data is still within its upstream ttl"""
+		state = self.feed_state.get(feed)
+		return state is not None and time.time() + lead_seconds < state["fresh_until"]
+
+	def data_age(self, feed: str) -> Optional[float]:
+		"""Seconds since the feed's data was last fetched, or None if never"""
+		state = self.feed_state.get(feed)
+		return time.time() - state["fetched_at"] if state else None
+
+	def freshness(self) -> Dict:
+		"""Whether the served data is stale, and the status feed time it reflects
+
+		Data is stale once any feed is past its ttl plus STALE_GRACE_SECONDS
+		(upstream down and last-good data being served), or while it is still
+		the copy restored from disk at startup.
+		"""
+		now = time.time()
+		stale = len(self.feed_state) < len(self.feeds) or any(
+			state["source"] == "disk" or now > state["fresh_until"] + STALE_GRACE_SECONDS
+			for state in self.feed_state.values()
+		)
+		return {
+			"stale": stale,
+			"as_of": self.feed_state.get("station_status", {}).get("last_updated"),
+		}
+
+	async def _serve(self, feed: str) -> FeedIndex:
+		"""Return a feed from memory, fetching only on a cold cache
+
+		Stale data (past the feed ttl, within the grace window) is returned
+		immediately while a single background fetch revalidates it. Past the
+		grace window the last-good index is still served if upstream fails.
+		"""
+		key, loader = self.feeds[feed]
+		cached = cache.get(key)
+		if cached is None:
+			try:
+				# Concurrent misses share one upstream fetch
+				return await singleflight.do(key, loader)
+			except httpx.HTTPError:
+				if feed not in self.last_good:
+					raise
+				# Upstream down (or circuit open): freshness() flags this as stale
+				return self.last_good[feed]
+		if not self.is_fresh(feed):
+			self._revalidate(feed, key, loader)
+		return cached
+
+	def _revalidate(self, feed: str, key: str, loader: Callable[[], Awaitable]) -> None:
+		"""Start one background refresh of a stale feed unless one is running"""
+		if feed in self._revalidations:
+			return
+
+		async def run():
+			try:
+				await singleflight.do(key, loader)
+			except Exception:
+				# Keep serving stale data; the next request or refresher retries
+				pass
+			finally:
+				self._revalidations.pop(feed, None)
+
+		self._revalidations[feed] = asyncio.create_task(run())
+
+	async def get_snapshot(self) -> StationSnapshot:
+		"""Current indexed snapshot, rebuilt only when a feed version changes"""
+		# On a cold cache both feeds are fetched concurrently
+		info, status = await asyncio.gather(
+			self._serve("station_information"),
+			self._serve("station_status"),
+		)
+		snapshot = self._snapshot
+		stale = self.freshness()["stale"]
+		if snapshot is None or not snapshot.is_built_from(info, status):
+			snapshot = StationSnapshot.build(info, status, self.default_short_names)
+			self._snapshot = snapshot
+			# Content versions can repeat (A -> B -> A); keep the latest one newest
+			self._recent_versions.pop(snapshot.version, None)
+			self._recent_versions[snapshot.version] = snapshot.combined_by_id
+			if len(self._recent_versions) > SNAPSHOT_DELTA_VERSIONS:
+				del self._recent_versions[next(iter(self._recent_versions))]
+		elif stale == self._published_stale:
+			return snapshot
+		# New data, or the same data going stale/fresh again
+		self._published_stale = stale
+		for listener in self.snapshot_listeners:
+			listener(snapshot)
+		return snapshot
+
+	def changes_since(self, snapshot: StationSnapshot, version: int) -> Optional[Tuple[List[Dict], List[str]]]:
+		"""(changed records, removed UUIDs) from an earlier version to snapshot
+
+		None if that version is unknown or no longer kept; callers then send
+		the full payload.
+		"""
+		previous = self._recent_versions.get(version)
+		if previous is None:
+			return None
+		return diff_stations(previous, snapshot)
+
+	def export_feed_state(self, feed: str) -> Dict:
+		"""A feed's freshness and validators without its stations, as JSON-ready data"""
+		state = self.feed_state[feed]
+		validators = self._validators.get(feed, {})
+		return {
+			"last_updated": state["last_updated"],
+			"ttl": state["ttl"],
+			"fetched_at": state["fetched_at"],
+			"fresh_until": state["fresh_until"],
+			"validators": {
+				**validators,
+				"digest": validators["digest"].hex() if validators.get("digest") else None,
+			},
+		}
+
+	def export_feed(self, feed: str) -> Dict:
+		"""One last-good feed with its state and validators, as JSON-ready data"""
+		index = self.last_good[feed]
+		exported = {**self.export_feed_state(feed), "stations": list(index.by_id.values())}
+		if feed == "station_status":
+			exported["subset"] = sorted(self._status_subset) if self._status_subset is not None else None
+		return exported
+
+	def export_feeds(self) -> Optional[Dict]:
+		"""Every last-good feed, for SnapshotPersister; None until each was loaded once"""
+		if not self.has_data:
+			return None
+		return {
+			"system": self.system,
+			"feeds": {feed: self.export_feed(feed) for feed in self.last_good},
+		}
+
+	def apply_feed(self, feed: str, data: Dict, source: str) -> FeedIndex:
+		"""Serve a feed exported by export_feed() (from disk or another worker)
+
+		source "disk" marks it due, so the refresher fetches right away, and
+		stale (see freshness()) until then. Other sources keep the exporting
+		worker's freshness.
+		"""
+		index = FeedIndex.build(data["stations"], data["last_updated"],
+			index_short_name=feed == "station_information")
+		if feed == "station_status":
+			subset = data.get("subset")
+			self._status_subset = frozenset(subset) if subset is not None else None
+			# This index did not come from that body
+			self._status_body = None
+		self.last_good[feed] = index
+		self._apply_state(feed, data, source)
+		return index
+
+	def apply_feed_state(self, feed: str, data: Dict, source: str) -> bool:
+		"""Take over freshness exported by export_feed_state() for the index already served
+
+		Used when another worker refreshed a feed without its stations changing,
+		so nothing is decoded or re-indexed. Ignored (False) if it is older than
+		the state this worker has.
+		"""
+		state = self.feed_state.get(feed)
+		if feed not in self.last_good or (state is not None and data["fetched_at"] < state["fetched_at"]):
+			return False
+		self._apply_state(feed, data, source)
+		return True
+
+	def _apply_state(self, feed: str, data: Dict, source: str) -> None:
+		"""Set a feed's freshness and validators, and re-cache its last-good index to match"""
+		now = time.time()
+		key, _ = self.feeds[feed]
+		fresh_until = now if source == "disk" else data["fresh_until"]
+		self.feed_state[feed] = {
+			"last_updated": data["last_updated"],
+			"ttl": data["ttl"],
+			"fetched_at": data["fetched_at"],
+			"fresh_until": fresh_until,
+			"source": source,
+		}
+		validators = dict(data.get("validators") or {})
+		if validators.get("digest"):
+			validators["digest"] = bytes.fromhex(validators["digest"])
+			self._validators[feed] = validators
+		cache.set(key, self.last_good[feed], max(fresh_until - now, 0) + STALE_GRACE_SECONDS)
+
+	def restore_feeds(self, saved: Dict) -> None:
+		"""Serve feeds exported by export_feeds() until upstream replaces them"""
+		for feed, data in saved["feeds"].items():
+			if feed in self.feeds:
+				self.apply_feed(feed, data, source="disk")
 
 	async def fetch_station_information(self) -> List[Dict]:
 		"""Fetch station information (static metadata)"""
-		cached = cache.get("station_info")
-		if cached:
-			return cached
+		info = await self._serve("station_information")
+		# Configured (e.g. Columbia) stations by short_name
+		return info.select_short_names(self.default_short_names)
 
-		async with httpx.AsyncClient(timeout=self.timeout) as client:
-			response = await client.get(STATION_INFORMATION_URL)
-			response.raise_for_status()
-			data = response.json()
+	async def _load_station_information(self) -> FeedIndex:
+		"""Download station information and index it by UUID and short_name"""
+		key = self._key("station_info")
+		current = cache.get(key)
+		data = await self._get_json("station_information", self.station_information_url, conditional=current is not None)
+		if data is None:
+			# Unchanged upstream: keep the existing index (and snapshot) as is
+			self._cache_feed("station_information", key, self.feed_state["station_information"], current)
+			return current
 
 		stations = data.get("data", {}).get("stations", [])
+		info = FeedIndex.build(stations, data.get("last_updated"), index_short_name=True)
 
-		# Filter for Columbia stations (by short_name)
-		columbia_stations = [
-			station for station in stations
-			if station.get("short_name") in COLUMBIA_STATION_IDS
-		]
-
-		# Cache for 5 minutes (station info rarely changes)
-		cache.set("station_info", columbia_stations, CACHE_TTL_SECONDS)
-		return columbia_stations
+		self._cache_feed("station_information", key, data, info)
+		return info
 
 	async def fetch_station_status(self, station_ids: List[str] = None) -> List[Dict]:
 		"""Fetch current station status (real-time availability)
 
 		Args:
-			station_ids: List of UUID station IDs to filter for. If None, returns all.
+			station_ids: List of UUID station IDs to filter for. If None, returns
+				every station retained from the feed (only the configured ones
+				when STATUS_SELECTIVE_PARSE is on).
 		"""
-		cached = cache.get("station_status_all")
-		if cached:
-			all_status = cached
-		else:
-			async with httpx.AsyncClient(timeout=self.timeout) as client:
-				response = await client.get(STATION_STATUS_URL)
-				response.raise_for_status()
-				data = response.json()
-
-			all_status = data.get("data", {}).get("stations", [])
-			# Cache all status for 5 minutes
-			cache.set("station_status_all", all_status, CACHE_TTL_SECONDS)
+		status = await self._serve("station_status")
 
-		# Filter for specific station IDs if provided
+		# Look up specific station IDs if provided
 		if station_ids:
-			return [s for s in all_status if s.get("station_id") in station_ids]
-		return all_status
+			return status.select_ids(station_ids)
+		return list(status.by_id.values())
+
+	def _status_station_ids(self) -> Optional[FrozenSet[str]]:
+		"""UUIDs to decode from the status feed, or None to decode all of it"""
+		if not STATUS_SELECTIVE_PARSE:
+			return None
+		info = cache.get(self._key("station_info"))
+		if info is None:
+			return None
+		station_ids = {
+			station["station_id"]
+			for short_names in [self.default_short_names, *self.station_groups.values()]
+			for station in info.select_short_names(short_names)
+		}
+		station_ids |= self.current_tracked()
+		if len(station_ids) > STATUS_SELECTIVE_MAX_STATIONS:
+			return None
+		return frozenset(station_ids)
+
+	def track_stations(self, station_ids: Iterable[str]) -> None:
+		"""Keep station_ids in the status subset (see STATUS_TRACKED_IDLE_SECONDS)"""
+		now = time.time()
+		self.tracked_station_ids.update(dict.fromkeys(station_ids, now))
+
+	def current_tracked(self) -> FrozenSet[str]:
+		"""Tracked station UUIDs, after dropping those unqueried for STATUS_TRACKED_IDLE_SECONDS"""
+		cutoff = time.time() - STATUS_TRACKED_IDLE_SECONDS
+		self.tracked_station_ids = {
+			station_id: queried_at
+			for station_id, queried_at in self.tracked_station_ids.items()
+			if queried_at >= cutoff
+		}
+		return frozenset(self.tracked_station_ids)
+
+	def status_covers(self, station_ids: Iterable[str]) -> bool:
+		"""Whether the current status index was parsed for all of station_ids"""
+		return self._status_subset is None or self._status_subset.issuperset(station_ids)
+
+	async def _status_for(self, station_ids: Iterable[str]) -> FeedIndex:
+		"""Status index that covers station_ids, re-parsing the feed to track new ones"""
+		station_ids = set(station_ids)
+		self.track_stations(station_ids)
+		status = await self._serve("station_status")
+		# A load already in flight may still use the old subset, so allow one retry
+		for _ in range(2):
+			if self.status_covers(station_ids):
+				break
+			key, loader = self.feeds["station_status"]
+			try:
+				status = await singleflight.do(key, loader)
+			except httpx.HTTPError:
+				# Upstream down or circuit open: answer from the index already
+				# served; stations it lacks come back without live fields
+				break
+		return status
+
+	async def _load_station_status(self) -> FeedIndex:
+		"""Download the system-wide status feed and index the wanted stations by UUID"""
+		key = self._key("station_status_all")
+		current = cache.get(key)
+		subset = self._status_station_ids()
+		if subset != self._status_subset and self._status_body is not None and self.is_fresh("station_status"):
+			# Only the wanted stations changed and the feed is not due yet:
+			# re-parse the body downloaded last time instead of fetching it again
+			return self._reparse_status(key, subset)
+		# A change in the wanted stations needs a full re-parse even if the feed is unchanged
+		conditional = current is not None and subset == self._status_subset
+
+		def parse(content: bytes) -> Dict:
+			data = _parse_status(content, subset)
+			self._status_body = content
+			return data
+
+		data = await self._get_json("station_status", self.station_status_url, conditional=conditional, parse=parse)
+		if data is None:
+			# Unchanged upstream: keep the existing index (and snapshot) as is
+			self._cache_feed("station_status", key, self.feed_state["station_status"], current)
+			return current
+
+		stations = data.get("data", {}).get("stations", [])
+		status = FeedIndex.build(stations, data.get("last_updated"))
+		self._status_subset = subset
+		self._cache_feed("station_status", key, data, status)
+		return status
+
+	def _reparse_status(self, key: str, subset: Optional[FrozenSet[str]]) -> FeedIndex:
+		"""Index the last downloaded status body for another subset, keeping its freshness"""
+		started = time.perf_counter()
+		data = _parse_status(self._status_body, subset)
+		JSON_PARSE_SECONDS.labels(self.system, "station_status").observe(time.perf_counter() - started)
+		status = FeedIndex.build(data.get("data", {}).get("stations", []), data.get("last_updated"))
+		self._status_subset = subset
+		self.last_good["station_status"] = status
+		cache.set(key, status, self.feed_state["station_status"]["fresh_until"] - time.time() + STALE_GRACE_SECONDS)
+		return status
 
 	async def get_combined_station_data(self) -> List[Dict]:
 		"""Get combined station info + status for Columbia stations"""
-		# Fetch Columbia station info first (filtered by short_name)
-		info_list = await self.fetch_station_information()
-
-		# Extract UUIDs from info
-		station_uuids = [info["station_id"] for info in info_list]
-
-		# Fetch status for these UUIDs
-		status_list = await self.fetch_station_status(station_uuids)
-
-		# Create lookup dict for status (by UUID)
-		status_dict = {s["station_id"]: s for s in status_list}
-
-		# Combine info + status
-		combined = []
-		for info in info_list:
-			station_uuid = info["station_id"]
-			status = status_dict.get(station_uuid, {})
-
-			# Calculate percent full
-			capacity = info.get("capacity", 0)
-			bikes_available = status.get("num_bikes_available", 0)
-			ebikes_available = status.get("num_ebikes_available", 0)
-			classic_bikes_available = bikes_available - ebikes_available
-			percent_full = round((bikes_available / capacity * 100), 1) if capacity > 0 else 0
-
-			combined_data = {
-				"station_id": info.get("station_id"),
-				"name": info.get("name", "Unknown"),
-				"lat": info.get("lat"),
-				"lon": info.get("lon"),
-				"capacity": capacity,
-				"num_bikes_available": bikes_available,
-				"num_ebikes_available": ebikes_available,
-				"num_classic_bikes_available": classic_bikes_available,
-				"num_docks_available": status.get("num_docks_available", 0),
-				"is_installed": status.get("is_installed", 0),
-				"is_renting": status.get("is_renting", 0),
-				"is_returning": status.get("is_returning", 0),
-				"last_reported": status.get("last_reported", 0),
-				"percent_full": percent_full,
-			}
-			combined.append(combined_data)
+		snapshot = await self.get_snapshot()
+		return list(snapshot.combined)
+
+	async def get_spatial_index(self) -> GridIndex:
+		"""Grid index over every station, rebuilt once per station_information version"""
+		info = await self._serve("station_information")
+		if self._spatial is None or self._spatial[0] is not info:
+			self._spatial = (info, GridIndex(info.by_id.values()))
+		return self._spatial[1]
+
+	async def _cached_query(self, key: str, station_ids: Iterable[str],
+			compute: Callable[[FeedIndex, FeedIndex], Any]) -> Any:
+		"""Result of compute(info, status), cached until either feed index changes
+
+		Not cached while the status index lacks any of station_ids, so the
+		result is recomputed once they arrive.
+		"""
+		info = await self._serve("station_information")
+		status = await self._serve("station_status")
+		# Generations rather than the indexes themselves, so a cached result
+		# does not keep superseded feed indexes alive until it expires
+		generations = (info.generation, status.generation)
+		cached = cache.get(key)
+		if cached is not None and cached[0] == generations:
+			return cached[1]
+
+		result = compute(info, status)
+		if not all(station_id in status.by_id for station_id in station_ids):
+			return result
+		cache.set(key, (generations, result), CACHE_TTL_SECONDS)
+		return result
+
+	async def get_nearby_station_data(self, lat: float, lon: float, radius_meters: float,
+			limit: int) -> List[Dict]:
+		"""Combined info + status for stations within radius_meters, nearest first
+
+		Each record matches get_combined_station_data() plus "distance_m".
+		"""
+		grid = await self.get_spatial_index()
+		matches = grid.nearby(lat, lon, radius_meters, limit)
+		await self._status_for(station_id for _, station_id in matches)
+
+		def compute(info: FeedIndex, status: FeedIndex) -> List[Dict]:
+			return [
+				{
+					**combine_tracked_station(info.by_id[station_id], status),
+					"distance_m": round(distance, 1),
+				}
+				for distance, station_id in matches
+			]
+
+		key = self._key(f"nearby:{lat:.5f},{lon:.5f},{radius_meters:g},{limit}")
+		return await self._cached_query(key, [station_id for _, station_id in matches], compute)
+
+	async def get_group_station_data(self, group: str) -> List[Dict]:
+		"""Combined info + status for one of this system's named station groups"""
+		info = await self._serve("station_information")
+		stations = info.select_short_names(self.station_groups[group])
+		await self._status_for(station["station_id"] for station in stations)
+
+		def compute(info: FeedIndex, status: FeedIndex) -> List[Dict]:
+			return [
+				combine_tracked_station(station, status)
+				for station in info.select_short_names(self.station_groups[group])
+			]
 
-		return combined
+		station_ids = [station["station_id"] for station in stations]
+		return await self._cached_query(self._key(f"group:{group}"), station_ids, compute)
 
 
-# Global client instance
-gbfs_client = GBFSClient()
+# Global client instance for the default system (see app.services.systems for all)
+gbfs_client = GBFSClient(DEFAULT_SYSTEM)
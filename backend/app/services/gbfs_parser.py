@@ -0,0 +1,97 @@
+"""
+Selective parser for large GBFS feeds
+
+The system-wide station_status.json has ~2,000 stations but we only serve a
+handful. Instead of decoding every station into a dict, this locates the
+wanted station objects in the raw bytes with one regex pass and decodes
+just those. Anything unexpected falls back to a full json.loads().
+"""
+import json
+import re
+from typing import Dict, Iterable, Optional, Pattern
+
+_STRING_OR_BRACE = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}]')
+_LAST_UPDATED = re.compile(rb'"last_updated"\s*:\s*(\d+)')
+_TTL = re.compile(rb'"ttl"\s*:\s*(\d+)')
+
+
+def _station_id_pattern(station_ids: Iterable[str]) -> Pattern:
+	"""Regex matching `"station_id": "<one of station_ids>"`"""
+	alternatives = b"|".join(re.escape(station_id.encode()) for station_id in sorted(station_ids))
+	return re.compile(rb'"station_id"\s*:\s*"(' + alternatives + rb')"')
+
+
+def _object_start(content: bytes, pos: int) -> int:
+	"""Offset of the '{' opening the object that encloses pos"""
+	depth = 0
+	while True:
+		open_at = content.rfind(b"{", 0, pos)
+		close_at = content.rfind(b"}", 0, pos)
+		if open_at < 0:
+			raise ValueError("unbalanced feed")
+		if close_at > open_at:
+			# Skip over a nested object (e.g. vehicle_types_available entries)
+			depth += 1
+			pos = close_at
+		elif depth == 0:
+			return open_at
+		else:
+			depth -= 1
+			pos = open_at
+
+
+def _object_end(content: bytes, start: int) -> int:
+	"""Offset just past the '}' closing the object that opens at start"""
+	depth = 0
+	for token in _STRING_OR_BRACE.finditer(content, start):
+		char = token.group()
+		if char == b"{":
+			depth += 1
+		elif char == b"}":
+			depth -= 1
+			if depth == 0:
+				return token.end()
+	raise ValueError("unbalanced feed")
+
+
+def _top_level_int(pattern: Pattern, content: bytes) -> Optional[int]:
+	match = pattern.search(content)
+	return int(match.group(1)) if match else None
+
+
+def parse_station_subset(content: bytes, station_ids: Iterable[str]) -> Dict:
+	"""Decode only the given station UUIDs from a GBFS station feed
+
+	Returns a dict shaped like the feed ({"last_updated", "ttl", "data":
+	{"stations": [...]}}) holding just the matched stations, so callers can
+	treat it exactly like json.loads() output.
+	"""
+	station_ids = set(station_ids)
+	if not station_ids:
+		return json.loads(content)
+
+	try:
+		stations = {}
+		for match in _station_id_pattern(station_ids).finditer(content):
+			station_id = match.group(1).decode()
+			if station_id in stations:
+				continue
+			start = _object_start(content, match.start())
+			station = json.loads(content[start:_object_end(content, start)])
+			if station.get("station_id") != station_id:
+				raise ValueError("matched station_id is not a station object")
+			stations[station_id] = station
+	except ValueError:
+		# Unexpected layout (or a brace inside a string value): decode everything
+		data = json.loads(content)
+		data.setdefault("data", {})["stations"] = [
+			station for station in data.get("data", {}).get("stations", [])
+			if station.get("station_id") in station_ids
+		]
+		return data
+
+	return {
+		"last_updated": _top_level_int(_LAST_UPDATED, content),
+		"ttl": _top_level_int(_TTL, content),
+		"data": {"stations": list(stations.values())},
+	}
@@ -0,0 +1,252 @@
+"""
+Station status history: in-memory ring buffers spilled to SQLite
+
+Every new station snapshot appends one sample per tracked station. Samples
+are kept as columnar numpy arrays in a fixed-size ring per station:
+
+	timestamp (uint32, 4 B) + bikes, e-bikes, docks (int16, 3 x 2 B) = 10 bytes
+
+so memory is bounded at HISTORY_RING_SIZE * 10 bytes per station regardless
+of uptime. With the defaults (8,640 samples, one every ~10 s for 24 h) that is
+~86 KB per station-day: ~0.6 MB for the seven Columbia stations and at most
+~17 MB at the HISTORY_MAX_STATIONS cap of 200 stations. Samples are
+also flushed in batches to an append-only SQLite table, which serves ranges
+older than what the ring still holds.
+"""
+import asyncio
+import logging
+import math
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.config import (
+	HISTORY_RING_SIZE,
+	HISTORY_MAX_STATIONS,
+	HISTORY_DB_PATH,
+	HISTORY_FLUSH_INTERVAL_SECONDS,
+)
+from app.services.snapshot import StationSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Columns stored per sample, in order, and the GBFS status field each comes from
+HISTORY_FIELDS = ("bikes", "ebikes", "docks")
+_STATUS_FIELDS = ("num_bikes_available", "num_ebikes_available", "num_docks_available")
+
+
+class StationRing:
+	"""Fixed-capacity ring of samples for one station, oldest overwritten first"""
+
+	def __init__(self, capacity: int):
+		self.capacity = capacity
+		self.timestamps = np.zeros(capacity, dtype=np.uint32)
+		self.values = np.zeros((len(HISTORY_FIELDS), capacity), dtype=np.int16)
+		self._next = 0
+		self.count = 0
+
+	def append(self, timestamp: int, values: Tuple[int, ...]) -> bool:
+		"""Add a sample; returns False if it is not newer than the latest one"""
+		if self.count and timestamp <= self.latest:
+			# Same feed version seen again; keep timestamps strictly increasing
+			return False
+		self.timestamps[self._next] = timestamp
+		self.values[:, self._next] = values
+		self._next = (self._next + 1) % self.capacity
+		self.count = min(self.count + 1, self.capacity)
+		return True
+
+	@property
+	def oldest(self) -> Optional[int]:
+		if not self.count:
+			return None
+		return int(self.timestamps[(self._next - self.count) % self.capacity])
+
+	@property
+	def latest(self) -> int:
+		return int(self.timestamps[(self._next - 1) % self.capacity])
+
+	def window(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+		"""Samples with start <= timestamp <= end, in time order"""
+		order = (np.arange(self.count) + self._next - self.count) % self.capacity
+		timestamps = self.timestamps[order]
+		lo = np.searchsorted(timestamps, start, side="left")
+		hi = np.searchsorted(timestamps, end, side="right")
+		return timestamps[lo:hi], self.values[:, order[lo:hi]]
+
+
+def downsample(timestamps: np.ndarray, values: np.ndarray, start: int, step: int) -> Dict:
+	"""Aggregate samples into fixed-width buckets with min/max/mean per column
+
+	Empty buckets are omitted, so "t" lists only bucket starts that have data.
+	"""
+	if not len(timestamps):
+		return {"t": [], **{field: {"min": [], "max": [], "mean": []} for field in HISTORY_FIELDS}}
+
+	bucket_of = (timestamps.astype(np.int64) - start) // step
+	# Samples are time-ordered, so each non-empty bucket is one contiguous run
+	boundaries = np.flatnonzero(np.diff(bucket_of, prepend=-1))
+	counts = np.diff(np.append(boundaries, len(bucket_of)))
+	result = {"t": (start + bucket_of[boundaries] * step).tolist()}
+	for i, field in enumerate(HISTORY_FIELDS):
+		column = values[i].astype(np.int32)
+		result[field] = {
+			"min": np.minimum.reduceat(column, boundaries).tolist(),
+			"max": np.maximum.reduceat(column, boundaries).tolist(),
+			"mean": np.round(np.add.reduceat(column, boundaries) / counts, 2).tolist(),
+		}
+	return result
+
+
+class HistoryStore:
+	"""Ring buffers per station plus an append-only SQLite spill file"""
+
+	def __init__(self, ring_size: int = HISTORY_RING_SIZE, db_path: Path = HISTORY_DB_PATH):
+		self.ring_size = ring_size
+		self.db_path = Path(db_path)
+		self._rings: Dict[str, StationRing] = {}
+		self._pending: List[Tuple] = []
+		self._db: Optional[sqlite3.Connection] = None
+		self._db_lock = threading.Lock()
+		self._flusher: Optional[asyncio.Task] = None
+
+	# -- recording ---------------------------------------------------------
+
+	def record(self, timestamp: int, statuses: Iterable[Dict]):
+		"""Append one sample per station status dict"""
+		for status in statuses:
+			station_id = status.get("station_id")
+			if station_id is None:
+				continue
+			ring = self._rings.get(station_id)
+			if ring is None:
+				ring = self._rings[station_id] = StationRing(self.ring_size)
+			values = tuple(int(status.get(field) or 0) for field in _STATUS_FIELDS)
+			if ring.append(timestamp, values) and self._db is not None:
+				self._pending.append((station_id, timestamp, *values))
+
+	def record_snapshot(self, snapshot: StationSnapshot):
+		"""Snapshot listener: sample every station the status index holds"""
+		timestamp = int(snapshot.status.last_updated or snapshot.built_at)
+		statuses = snapshot.status.by_id
+		if len(statuses) > HISTORY_MAX_STATIONS:
+			# Full-feed parse: keep history for the configured stations only
+			statuses = {station_id: statuses[station_id] for station_id in snapshot.station_ids if station_id in statuses}
+		self.record(timestamp, statuses.values())
+
+	# -- SQLite spill ------------------------------------------------------
+
+	def _open_db(self):
+		self.db_path.parent.mkdir(parents=True, exist_ok=True)
+		db = sqlite3.connect(self.db_path, check_same_thread=False)
+		db.execute("PRAGMA journal_mode=WAL")
+		db.execute(
+			"CREATE TABLE IF NOT EXISTS station_status_history ("
+			"station_id TEXT NOT NULL, ts INTEGER NOT NULL, "
+			"bikes INTEGER NOT NULL, ebikes INTEGER NOT NULL, docks INTEGER NOT NULL)"
+		)
+		db.execute(
+			"CREATE INDEX IF NOT EXISTS idx_history_station_ts "
+			"ON station_status_history (station_id, ts)"
+		)
+		db.commit()
+		self._db = db
+
+	def _write(self, rows: List[Tuple]):
+		with self._db_lock:
+			self._db.executemany("INSERT INTO station_status_history VALUES (?, ?, ?, ?, ?)", rows)
+			self._db.commit()
+
+	def _read(self, station_id: str, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+		with self._db_lock:
+			rows = self._db.execute(
+				"SELECT ts, bikes, ebikes, docks FROM station_status_history "
+				"WHERE station_id = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+				(station_id, start, end),
+			).fetchall()
+		if not rows:
+			return np.zeros(0, dtype=np.uint32), np.zeros((len(HISTORY_FIELDS), 0), dtype=np.int16)
+		table = np.array(rows, dtype=np.int64)
+		return table[:, 0].astype(np.uint32), table[:, 1:].T.astype(np.int16)
+
+	async def flush(self):
+		"""Write pending samples to SQLite off the event loop"""
+		if self._db is None or not self._pending:
+			return
+		rows, self._pending = self._pending, []
+		try:
+			await asyncio.to_thread(self._write, rows)
+		except sqlite3.Error as e:
+			# Keep them for the next attempt rather than losing history
+			self._pending = rows + self._pending
+			logger.warning("History flush failed: %s", e)
+
+	async def start(self):
+		"""Open the spill file and start the periodic flush"""
+		if self._db is None:
+			try:
+				await asyncio.to_thread(self._open_db)
+			except (sqlite3.Error, OSError) as e:
+				logger.warning("History spill file unavailable, keeping memory only: %s", e)
+		if self._flusher is None or self._flusher.done():
+			self._flusher = asyncio.create_task(self._flush_forever())
+
+	async def stop(self):
+		if self._flusher is not None:
+			self._flusher.cancel()
+			try:
+				await self._flusher
+			except asyncio.CancelledError:
+				pass
+			self._flusher = None
+		await self.flush()
+		if self._db is not None:
+			self._db.close()
+			self._db = None
+
+	async def _flush_forever(self):
+		while True:
+			await asyncio.sleep(HISTORY_FLUSH_INTERVAL_SECONDS)
+			await self.flush()
+
+	# -- queries -----------------------------------------------------------
+
+	async def samples(self, station_id: str, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+		"""Raw samples in [start, end]; older-than-ring ranges come from SQLite"""
+		ring = self._rings.get(station_id)
+		if ring is not None and ring.count:
+			timestamps, values = ring.window(start, end)
+			ring_oldest = ring.oldest
+		else:
+			timestamps = np.zeros(0, dtype=np.uint32)
+			values = np.zeros((len(HISTORY_FIELDS), 0), dtype=np.int16)
+			ring_oldest = end + 1
+
+		if start < ring_oldest and self._db is not None:
+			# Only the part the ring no longer holds, to avoid double counting
+			disk_t, disk_v = await asyncio.to_thread(self._read, station_id, start, min(end, ring_oldest - 1))
+			timestamps = np.concatenate([disk_t, timestamps])
+			values = np.concatenate([disk_v, values], axis=1)
+		return timestamps, values
+
+	async def query(self, station_ids: Iterable[str], start: int, end: int, points: int) -> Dict:
+		"""Downsampled history per station: at most `points` buckets over [start, end]"""
+		step = max(math.ceil((end - start + 1) / points), 1)
+		stations = {}
+		for station_id in station_ids:
+			timestamps, values = await self.samples(station_id, start, end)
+			stations[station_id] = downsample(timestamps, values, start, step)
+		return {"start": start, "end": end, "step": step, "stations": stations}
+
+	def stats(self) -> Dict:
+		return {
+			"stations": len(self._rings),
+			"samples_in_memory": sum(ring.count for ring in self._rings.values()),
+			"memory_bytes": sum(ring.timestamps.nbytes + ring.values.nbytes for ring in self._rings.values()),
+			"pending_rows": len(self._pending),
+		}
+
+
+# Global history store
+history_store = HistoryStore()
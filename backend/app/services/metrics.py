@@ -0,0 +1,111 @@
+"""
+Prometheus metrics for routes, upstream fetches and the cache
+"""
+import time
+from typing import Callable, Dict, Optional, Tuple
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+	"citibike_http_request_duration_seconds",
+	"Time from request start to response start, per route",
+	["method", "route", "status"],
+	buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+UPSTREAM_FETCH_SECONDS = Histogram(
+	"citibike_gbfs_fetch_duration_seconds",
+	"GBFS upstream fetch latency, per system, feed and outcome (HTTP status, timeout, circuit_open, cancelled or error)",
+	["system", "feed", "status"],
+	buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+UPSTREAM_PAYLOAD_BYTES = Histogram(
+	"citibike_gbfs_payload_bytes",
+	"GBFS upstream response body size, per system and feed",
+	["system", "feed"],
+	buckets=(0, 1e3, 1e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7),
+)
+JSON_PARSE_SECONDS = Histogram(
+	"citibike_gbfs_parse_duration_seconds",
+	"Time spent decoding GBFS JSON in GBFSClient, per system and feed",
+	["system", "feed"],
+	buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+
+class MetricsMiddleware:
+	"""Pure ASGI middleware recording per-route latency
+
+	Latency is measured to the start of the response so streaming endpoints
+	(SSE) are comparable with regular ones. Routes are labelled by their path
+	template, and unmatched paths share one label, to bound cardinality.
+	"""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		started = time.perf_counter()
+		recorded = False
+
+		def record(status: int):
+			route = scope.get("route")
+			REQUEST_LATENCY.labels(
+				scope["method"],
+				getattr(route, "path", "unmatched"),
+				str(status),
+			).observe(time.perf_counter() - started)
+
+		async def send_wrapper(message):
+			nonlocal recorded
+			if message["type"] == "http.response.start" and not recorded:
+				recorded = True
+				record(message["status"])
+			await send(message)
+
+		try:
+			await self.app(scope, receive, send_wrapper)
+		except Exception:
+			if not recorded:
+				record(500)
+			raise
+
+
+class LiveDataCollector:
+	"""Exports cache counters and served-data age at scrape time"""
+
+	def __init__(self, cache_stats: Callable[[], Dict],
+			data_ages: Callable[[], Dict[Tuple[str, str], Optional[float]]]):
+		self._cache_stats = cache_stats
+		self._data_ages = data_ages
+
+	def collect(self):
+		stats = self._cache_stats()
+		hit_ratio = GaugeMetricFamily(
+			"citibike_cache_hit_ratio", "Cache hits / lookups, per namespace", labels=["namespace"]
+		)
+		events = CounterMetricFamily(
+			"citibike_cache_events", "Cache hits, misses, evictions and expirations, per namespace",
+			labels=["namespace", "event"]
+		)
+		for namespace, counters in stats["namespaces"].items():
+			if counters["hit_ratio"] is not None:
+				hit_ratio.add_metric([namespace], counters["hit_ratio"])
+			for event in ("hits", "misses", "evictions", "expirations"):
+				events.add_metric([namespace, event], counters[event])
+		yield hit_ratio
+		yield events
+		yield GaugeMetricFamily("citibike_cache_entries", "Entries held in the cache", value=stats["entries"])
+		yield GaugeMetricFamily("citibike_cache_bytes", "Approximate bytes held in the cache", value=stats["bytes"])
+
+		age = GaugeMetricFamily(
+			"citibike_data_age_seconds", "Seconds since the served feed data was fetched",
+			labels=["system", "feed"]
+		)
+		for (system, feed), seconds in self._data_ages().items():
+			if seconds is not None:
+				age.add_metric([system, feed], seconds)
+		yield age
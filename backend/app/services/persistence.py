@@ -0,0 +1,148 @@
+"""
+Last-good station data persisted to local disk for instant cold starts
+
+One file per system holds both parsed feeds (station lists, ttl/last_updated
+and HTTP validators) as zlib-compressed JSON behind a small binary header:
+
+	magic (8 B) | format version (uint16) | saved_at (float64) | payload length (uint32) | zlib payload
+
+The full Citi Bike station_information feed (~2,300 stations) plus the
+tracked status subset compresses to roughly a tenth of its JSON size and
+decodes in a few milliseconds, so startup can serve it before upstream answers.
+"""
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from app.config import SNAPSHOT_DIR, SNAPSHOT_SAVE_INTERVAL_SECONDS, SNAPSHOT_MAX_AGE_SECONDS
+from app.services.gbfs_client import GBFSClient
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"GBFSSNAP"
+_FORMAT_VERSION = 2
+_HEADER = struct.Struct("<8sHdI")
+
+
+def encode_snapshot(payload: Dict, saved_at: float) -> bytes:
+	"""Serialize exported feeds into the on-disk format"""
+	raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+	return _HEADER.pack(_MAGIC, _FORMAT_VERSION, saved_at, len(raw)) + zlib.compress(raw, 6)
+
+
+def decode_snapshot(blob: bytes) -> Tuple[float, Dict]:
+	"""(saved_at, payload) from encode_snapshot() output; ValueError if unreadable"""
+	if len(blob) < _HEADER.size:
+		raise ValueError("snapshot file is truncated")
+	magic, version, saved_at, length = _HEADER.unpack_from(blob)
+	if magic != _MAGIC or version != _FORMAT_VERSION:
+		raise ValueError(f"unsupported snapshot format ({magic!r}, v{version})")
+	try:
+		raw = zlib.decompress(blob[_HEADER.size:])
+	except zlib.error as e:
+		raise ValueError(f"corrupt snapshot payload: {e}")
+	if len(raw) != length:
+		raise ValueError("snapshot payload length mismatch")
+	return saved_at, json.loads(raw)
+
+
+class SnapshotPersister:
+	"""Restores a client's last-good feeds at startup and writes them back periodically
+
+	A save is skipped unless a feed index changed since the last one, and the
+	encoding and file write run in a worker thread. Files are replaced
+	atomically so a crash mid-write never leaves a half-written snapshot.
+	"""
+
+	def __init__(self, client: GBFSClient, path: Optional[Path] = None):
+		self.client = client
+		self.path = Path(path) if path is not None else SNAPSHOT_DIR / f"{client.system}.snapshot"
+		# Feed indexes contained in the file on disk
+		self._saved: Tuple = ()
+		self._task: Optional[asyncio.Task] = None
+		self.stats: Dict = {
+			"restored_saved_at": None,
+			"saves": 0,
+			"last_save": None,
+			"bytes": None,
+			"last_error": None,
+		}
+
+	def _read(self) -> Optional[Tuple[float, Dict]]:
+		try:
+			blob = self.path.read_bytes()
+		except FileNotFoundError:
+			return None
+		return decode_snapshot(blob)
+
+	def _write(self, payload: Dict) -> int:
+		blob = encode_snapshot(payload, time.time())
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		# Per-process temporary name: several workers may save at once
+		tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+		tmp_path.write_bytes(blob)
+		os.replace(tmp_path, self.path)
+		return len(blob)
+
+	async def restore(self) -> bool:
+		"""Load the snapshot file into the client; False if missing, unreadable or too old"""
+		try:
+			loaded = await asyncio.to_thread(self._read)
+		except (OSError, ValueError) as e:
+			logger.warning("Ignoring snapshot %s: %s", self.path, e)
+			return False
+		if loaded is None:
+			return False
+		saved_at, payload = loaded
+		if time.time() - saved_at > SNAPSHOT_MAX_AGE_SECONDS or payload.get("system") != self.client.system:
+			return False
+		self.client.restore_feeds(payload)
+		self._saved = tuple(self.client.last_good.values())
+		self.stats["restored_saved_at"] = saved_at
+		return True
+
+	async def save(self):
+		"""Write the client's last-good feeds if they changed since the last save"""
+		payload = self.client.export_feeds()
+		current = tuple(self.client.last_good.values())
+		if payload is None or (len(current) == len(self._saved) and all(
+			a is b for a, b in zip(current, self._saved)
+		)):
+			return
+		try:
+			size = await asyncio.to_thread(self._write, payload)
+		except (OSError, TypeError, ValueError) as e:
+			self.stats["last_error"] = str(e)
+			logger.warning("Snapshot save to %s failed: %s", self.path, e)
+			return
+		self._saved = current
+		self.stats["saves"] += 1
+		self.stats["last_save"] = time.time()
+		self.stats["bytes"] = size
+
+	async def start(self):
+		"""Restore from disk, then save periodically"""
+		await self.restore()
+		if self._task is None or self._task.done():
+			self._task = asyncio.create_task(self._save_forever())
+
+	async def stop(self):
+		"""Stop the periodic save and write a final snapshot"""
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+		await self.save()
+
+	async def _save_forever(self):
+		while True:
+			await asyncio.sleep(SNAPSHOT_SAVE_INTERVAL_SECONDS)
+			await self.save()
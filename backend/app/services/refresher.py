@@ -0,0 +1,113 @@
+"""
+Background refresher that keeps live station data warm ahead of expiry
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+from app.config import (
+	REFRESH_MIN_INTERVAL_SECONDS,
+	REFRESH_LEAD_SECONDS,
+	REFRESH_MAX_BACKOFF_SECONDS,
+)
+from app.services.gbfs_client import GBFSClient, gbfs_client
+from app.services.singleflight import singleflight
+
+logger = logging.getLogger(__name__)
+
+
+class StationRefresher:
+	"""Periodically refreshes every GBFS feed just before its upstream ttl runs out
+
+	Requests are then served from memory; they only fetch upstream themselves
+	if the refresher is not running or has never succeeded.
+	"""
+
+	def __init__(self, client: GBFSClient):
+		self.client = client
+		self._task: Optional[asyncio.Task] = None
+		self._failures = 0
+		self.stats: Dict = {
+			"refreshes": 0,
+			"failures": 0,
+			"last_refresh": None,
+			"last_error": None,
+			"next_refresh_in": None,
+		}
+
+	@property
+	def running(self) -> bool:
+		return self._task is not None and not self._task.done()
+
+	def start(self):
+		"""Start the refresh loop on the running event loop"""
+		if not self.running:
+			self._task = asyncio.create_task(self._run())
+
+	async def stop(self):
+		"""Cancel the refresh loop and wait for it to exit"""
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+
+	async def _run(self):
+		while True:
+			delay = await self.refresh_once()
+			self.stats["next_refresh_in"] = round(delay, 1)
+			await asyncio.sleep(delay)
+
+	async def refresh_once(self) -> float:
+		"""Refresh feeds that are due and return seconds until the next one is"""
+		failed = False
+		refreshed = False
+		due = [
+			(feed, key, loader)
+			for feed, (key, loader) in self.client.feeds.items()
+			if not self.client.is_fresh(feed, lead_seconds=REFRESH_LEAD_SECONDS)
+		]
+		# Due feeds are fetched concurrently (bounded by the client's fetch slots)
+		results = await asyncio.gather(
+			*(singleflight.do(key, loader) for _, key, loader in due),
+			return_exceptions=True,
+		)
+		for (feed, _, _), result in zip(due, results):
+			if isinstance(result, BaseException):
+				failed = True
+				self.stats["failures"] += 1
+				self.stats["last_error"] = f"{feed}: {result}"
+				logger.warning("Background refresh of %s/%s failed: %s", self.client.system, feed, result)
+			else:
+				refreshed = True
+				self.stats["refreshes"] += 1
+				self.stats["last_refresh"] = time.time()
+
+		if refreshed or failed:
+			# Rebuild the snapshot (or flag it stale) so snapshot listeners see it without a request
+			try:
+				await self.client.get_snapshot()
+			except Exception as e:
+				if not failed:
+					self.stats["last_error"] = f"snapshot: {e}"
+				failed = True
+
+		if failed:
+			retry_in = self.client.breaker.retry_in
+			if retry_in is not None:
+				# Circuit open: calls fail fast until it lets a probe through
+				return max(retry_in, 1.0)
+			# Exponential backoff while upstream is failing; stale data keeps serving
+			self._failures += 1
+			return min(REFRESH_MIN_INTERVAL_SECONDS * 2 ** (self._failures - 1), REFRESH_MAX_BACKOFF_SECONDS)
+		self._failures = 0
+
+		now = time.time()
+		next_due = min(state["fresh_until"] for state in self.client.feed_state.values())
+		return max(next_due - now - REFRESH_LEAD_SECONDS, 1.0)
+
+
+# Global refresher for the shared GBFS client
+station_refresher = StationRefresher(gbfs_client)
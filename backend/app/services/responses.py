@@ -0,0 +1,263 @@
+"""
+Pre-rendered, pre-compressed API responses with strong ETags
+
+Station endpoints negotiate their body format from the Accept header; JSON
+is the default:
+
+	application/json                          station records as objects
+	application/vnd.citibike.columns+json     "stations" as one array per field
+	application/msgpack                       same document as JSON, in MessagePack
+	application/vnd.citibike.columns+msgpack  columnar, in MessagePack
+
+The columnar layout names each of the 14 station fields once instead of once
+per station. History bodies are already one array per field, so only the
+encoding changes for them. MessagePack needs the optional msgpack package.
+"""
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from app.services.snapshot import StationSnapshot
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+try:
+	import msgpack
+except ImportError:
+	msgpack = None
+
+JSON = "application/json"
+COLUMNS_JSON = "application/vnd.citibike.columns+json"
+MSGPACK = "application/msgpack"
+COLUMNS_MSGPACK = "application/vnd.citibike.columns+msgpack"
+
+# Accept media type -> format served; MessagePack only if it can be encoded
+_FORMATS = {
+	JSON: JSON,
+	COLUMNS_JSON: COLUMNS_JSON,
+	**({
+		MSGPACK: MSGPACK,
+		"application/x-msgpack": MSGPACK,
+		COLUMNS_MSGPACK: COLUMNS_MSGPACK,
+	} if msgpack is not None else {}),
+}
+
+
+def status_payload(stations: Iterable[Dict], freshness: Optional[Dict] = None) -> Dict:
+	"""Build the /api/stations/status body (stations + summary block)
+
+	freshness is GBFSClient.freshness(); "stale" is true while last-good data
+	is served because upstream is unavailable. Stations without live status
+	yet (null fields, see combine_tracked_station) are left out of the
+	totals and counted in "stations_without_status".
+	"""
+	stations = list(stations)
+	reporting = [s for s in stations if s["num_bikes_available"] is not None]
+
+	# Calculate summary stats
+	total_bikes = sum(s["num_bikes_available"] for s in reporting)
+	total_docks = sum(s["num_docks_available"] for s in reporting)
+	total_capacity = sum(s["capacity"] for s in stations)
+	reporting_capacity = sum(s["capacity"] for s in reporting)
+
+	summary = {
+		"total_stations": len(stations),
+		"total_bikes_available": total_bikes,
+		"total_docks_available": total_docks,
+		"total_capacity": total_capacity,
+		"overall_percent_full": round((total_bikes / reporting_capacity * 100), 1) if reporting_capacity > 0 else 0
+	}
+	if len(reporting) < len(stations):
+		summary["stations_without_status"] = len(stations) - len(reporting)
+
+	return {
+		"stations": stations,
+		"summary": summary,
+		"last_updated": max((s["last_reported"] for s in reporting), default=0),
+		**({"freshness": freshness} if freshness is not None else {})
+	}
+
+
+def to_columns(records: List[Dict]) -> Dict[str, List]:
+	"""Struct-of-arrays form of a list of records: field -> one value per record"""
+	fields = {}
+	for record in records:
+		fields.update(dict.fromkeys(record))
+	return {field: [record.get(field) for record in records] for field in fields}
+
+
+def encode_body(content: Dict, media_type: str = JSON) -> bytes:
+	"""Serialize a response body in one of the negotiable formats"""
+	if media_type in (COLUMNS_JSON, COLUMNS_MSGPACK) and isinstance(content.get("stations"), list):
+		content = {**content, "stations": to_columns(content["stations"])}
+	if media_type in (MSGPACK, COLUMNS_MSGPACK):
+		return msgpack.packb(content, use_bin_type=True)
+	# Same serialization settings as FastAPI's JSONResponse
+	return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate_format(request: Request) -> str:
+	"""Body format for the request's Accept header, JSON unless another is preferred"""
+	best, best_quality = JSON, 0.0
+	for token in request.headers.get("accept", "").split(","):
+		media_type, *params = [part.strip() for part in token.split(";")]
+		served = _FORMATS.get(media_type.lower())
+		if served is None:
+			continue
+		quality = 1.0
+		for param in params:
+			name, _, value = param.partition("=")
+			if name.strip() == "q":
+				try:
+					quality = float(value)
+				except ValueError:
+					quality = 0.0
+		# Ties go to the type listed first
+		if quality > best_quality:
+			best, best_quality = served, quality
+	return best
+
+
+def negotiated_response(request: Request, content: Dict) -> Response:
+	"""Response for a body built per request, in the format the client asked for"""
+	media_type = negotiate_format(request)
+	headers = {"Vary": "Accept"}
+	if media_type == JSON:
+		return JSONResponse(content, headers=headers)
+	return Response(content=encode_body(content, media_type), media_type=media_type, headers=headers)
+
+
+def _accepted_encodings(request: Request) -> set:
+	"""Content codings listed in Accept-Encoding (q=0 entries excluded)"""
+	accepted = set()
+	for token in request.headers.get("accept-encoding", "").split(","):
+		coding, *params = [part.strip() for part in token.split(";")]
+		quality = 1.0
+		for param in params:
+			name, _, value = param.partition("=")
+			if name.strip() == "q":
+				try:
+					quality = float(value)
+				except ValueError:
+					quality = 0.0
+		if coding and quality > 0:
+			accepted.add(coding.lower())
+	return accepted
+
+
+@dataclass(frozen=True)
+class RenderedResponse:
+	"""One body serialized once, with gzip/brotli variants and its ETag"""
+	body: bytes
+	gzip_body: bytes
+	br_body: Optional[bytes]
+	digest: str
+	media_type: str = JSON
+
+	@classmethod
+	def render(cls, content, media_type: str = JSON) -> "RenderedResponse":
+		body = encode_body(content, media_type)
+		return cls(
+			body=body,
+			gzip_body=gzip.compress(body, compresslevel=9),
+			br_body=brotli.compress(body, quality=11) if brotli is not None else None,
+			digest=hashlib.blake2b(body, digest_size=16).hexdigest(),
+			media_type=media_type,
+		)
+
+	def _variant(self, request: Request) -> Tuple[bytes, Optional[str]]:
+		"""Smallest variant the client accepts, and its Content-Encoding"""
+		accepted = _accepted_encodings(request)
+		if self.br_body is not None and "br" in accepted:
+			return self.br_body, "br"
+		if "gzip" in accepted:
+			return self.gzip_body, "gzip"
+		return self.body, None
+
+	def _etag(self, encoding: Optional[str]) -> str:
+		# Strong ETags must differ per content coding
+		return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+	def to_response(self, request: Request) -> Response:
+		"""Serve the negotiated variant, or 304 if the client already has it"""
+		body, encoding = self._variant(request)
+		etag = self._etag(encoding)
+		headers = {
+			"ETag": etag,
+			"Vary": "Accept, Accept-Encoding",
+			# Let clients keep the body but revalidate every time
+			"Cache-Control": "no-cache",
+		}
+
+		if_none_match = request.headers.get("if-none-match")
+		if if_none_match:
+			known = {self._etag(None), self._etag("gzip"), self._etag("br")}
+			candidates = {tag.strip() for tag in if_none_match.split(",")}
+			if "*" in candidates or candidates & known:
+				return Response(status_code=304, headers=headers)
+
+		if encoding:
+			headers["Content-Encoding"] = encoding
+		return Response(content=body, media_type=self.media_type, headers=headers)
+
+
+class ResponseCache:
+	"""Keeps the latest rendered response per name and format, keyed by a data version"""
+
+	def __init__(self):
+		self._entries: Dict[Tuple[str, str], Tuple[object, RenderedResponse]] = {}
+		self.stats: Dict[str, int] = {"renders": 0, "hits": 0}
+
+	def get(self, name: str, version, build: Callable[[], Dict], media_type: str = JSON) -> RenderedResponse:
+		"""Rendered response for (name, version), rendering it only on a new version"""
+		entry = self._entries.get((name, media_type))
+		if entry is not None and entry[0] == version:
+			self.stats["hits"] += 1
+			return entry[1]
+
+		rendered = RenderedResponse.render(build(), media_type)
+		self._entries[(name, media_type)] = (version, rendered)
+		self.stats["renders"] += 1
+		return rendered
+
+
+# Global rendered-response cache
+response_cache = ResponseCache()
+
+
+def render_status(name: str, snapshot: StationSnapshot, freshness: Dict, media_type: str = JSON) -> RenderedResponse:
+	"""Rendered status body for a snapshot, re-rendered only when the body would change
+
+	That is on new data, a stale flip or a newer upstream "as_of" (which the
+	body's freshness block carries even when no station changed); the SSE
+	stream only pushes on the first two. Each format is encoded at most
+	once per such state. The body carries the
+	snapshot "version" to pass back as ?since=.
+	"""
+	return response_cache.get(
+		name,
+		(snapshot.version, freshness["stale"], freshness["as_of"]),
+		lambda: {**status_payload(snapshot.combined, freshness), "version": snapshot.version},
+		media_type,
+	)
+
+
+def delta_payload(snapshot: StationSnapshot, since: int, changed: List[Dict], removed: List[str],
+		freshness: Dict) -> Dict:
+	"""Status body with only the stations changed since an earlier version
+
+	The summary and last_updated still cover every station.
+	"""
+	return {
+		**status_payload(snapshot.combined, freshness),
+		"stations": changed,
+		"removed": removed,
+		"since": since,
+		"version": snapshot.version,
+	}
@@ -0,0 +1,289 @@
+"""
+Feeds shared by the worker processes on one host
+
+Every worker would otherwise run its own refresher and fetch the same feeds
+from upstream. Instead one worker per system holds a non-blocking file lock
+and is the leader: it runs the refresher and writes each feed to a JSON file
+under SHARED_STATE_DIR (tmpfs when /dev/shm exists):
+
+	<system>.lock                   held by the leader
+	<system>.<feed>.json            output of GBFSClient.export_feed(), written
+	                                when the leader loads a new index
+	<system>.<feed>.state.json      output of GBFSClient.export_feed_state(),
+	                                written on every refresh (304s included)
+	<system>.tracked.<pid>.json     station UUIDs a follower's queries asked for
+
+The other workers are followers. Their feed loaders read those files instead
+of upstream, and a file is only decoded again when its inode or mtime
+changed. A refresh that left the stations as they were only moves the small
+state file, so followers keep their index, snapshot and rendered responses.
+Snapshot versions are derived from content, so every worker reports
+the same version for the same data and /status?since= works across them.
+A follower takes over within SHARED_POLL_INTERVAL_SECONDS if the leader exits.
+"""
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import httpx
+from app.config import SHARED_STATE_DIR, SHARED_POLL_INTERVAL_SECONDS
+from app.services.gbfs_client import GBFSClient
+from app.services.snapshot import FeedIndex
+from app.services.refresher import StationRefresher
+from app.services.singleflight import singleflight
+
+try:
+	import fcntl
+except ImportError:
+	# No flock (e.g. Windows): every worker is its own leader
+	fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LEADER = "leader"
+FOLLOWER = "follower"
+
+
+def _process_alive(pid: int) -> bool:
+	"""Whether a process with this pid exists (always True where that cannot be checked)"""
+	if os.name != "posix":
+		return True
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		# Exists, but belongs to another user
+		return True
+	return True
+
+
+class SharedFeedUnavailable(httpx.HTTPError):
+	"""The leader has not published a feed yet
+
+	Subclasses httpx.HTTPError so a follower falls back to last-good data or
+	answers 503, as for an upstream failure.
+	"""
+
+
+class SharedFeeds:
+	"""Elects one fetching worker per system and shares its feeds with the others"""
+
+	def __init__(self, client: GBFSClient, refresher: StationRefresher, directory: Optional[Path] = None):
+		self.client = client
+		self.refresher = refresher
+		self.directory = Path(directory) if directory is not None else SHARED_STATE_DIR
+		self.role: Optional[str] = None
+		self._lock_fd: Optional[int] = None
+		# The client's own upstream loaders, swapped out while following
+		self._upstream_loaders = {feed: loader for feed, (_, loader) in client.feeds.items()}
+		# Leader: feed -> index and feed -> state last written
+		self._published: Dict[str, FeedIndex] = {}
+		self._published_state: Dict[str, Dict] = {}
+		# Follower: file name -> (inode, mtime) last read
+		self._seen: Dict[str, Tuple[int, int]] = {}
+		self._tracked_sent: frozenset = frozenset()
+		self._task: Optional[asyncio.Task] = None
+		self.stats: Dict = {
+			"role": None,
+			"published": 0,
+			"states_published": 0,
+			"applied": 0,
+			"states_applied": 0,
+			"last_error": None,
+		}
+
+	def _path(self, name: str) -> Path:
+		return self.directory / f"{self.client.system}.{name}"
+
+	def _try_lock(self) -> bool:
+		"""Take the leader lock without blocking; True if this worker now holds it"""
+		if fcntl is None:
+			return True
+		self.directory.mkdir(parents=True, exist_ok=True)
+		fd = os.open(self._path("lock"), os.O_RDWR | os.O_CREAT, 0o644)
+		try:
+			fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except OSError:
+			os.close(fd)
+			return False
+		self._lock_fd = fd
+		return True
+
+	def _become_leader(self):
+		for feed, (key, _) in self.client.feeds.items():
+			self.client.feeds[feed] = (key, self._upstream_loaders[feed])
+		self.role = self.stats["role"] = LEADER
+		self.refresher.start()
+		logger.info("Worker %d fetches %s feeds for this host", os.getpid(), self.client.system)
+
+	def _become_follower(self):
+		for feed, (key, _) in self.client.feeds.items():
+			self.client.feeds[feed] = (key, self._shared_loader(feed))
+		self.role = self.stats["role"] = FOLLOWER
+
+	def _shared_loader(self, feed: str):
+		async def load():
+			if feed == "station_status":
+				# Let the leader know about newly queried stations right away
+				await self._send_tracked()
+			return await self._read_feed(feed)
+		return load
+
+	async def _read_changed(self, name: str, required: bool = True) -> Optional[Dict]:
+		"""A shared file's contents, or None if it is unchanged since the last read
+
+		A missing file raises SharedFeedUnavailable, or returns None unless required.
+		"""
+		path = self._path(name)
+		try:
+			stat = os.stat(path)
+		except FileNotFoundError:
+			if not required:
+				return None
+			raise SharedFeedUnavailable(f"{self.client.system}/{name} has not been published yet")
+		signature = (stat.st_ino, stat.st_mtime_ns)
+		if self._seen.get(name) == signature:
+			return None
+		try:
+			data = await asyncio.to_thread(lambda: json.loads(path.read_bytes()))
+		except (OSError, ValueError) as e:
+			raise SharedFeedUnavailable(f"{self.client.system}/{name}: {e}")
+		self._seen[name] = signature
+		return data
+
+	async def _read_feed(self, feed: str):
+		"""Apply the leader's copy of a feed: its stations only if they changed, then its state"""
+		if feed not in self.client.last_good:
+			self._seen.pop(f"{feed}.json", None)
+		data = await self._read_changed(f"{feed}.json")
+		if data is not None:
+			self.client.apply_feed(feed, data, source="shared")
+			self.stats["applied"] += 1
+		state = await self._read_changed(f"{feed}.state.json", required=False)
+		if state is not None and self.client.apply_feed_state(feed, state, source="shared"):
+			self.stats["states_applied"] += 1
+		return self.client.last_good[feed]
+
+	def _write_json(self, path: Path, payload) -> None:
+		tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+		tmp_path.write_text(json.dumps(payload, separators=(",", ":")))
+		os.replace(tmp_path, path)
+
+	def _publish(self, exported: Dict[str, Dict]) -> None:
+		self.directory.mkdir(parents=True, exist_ok=True)
+		for name, data in exported.items():
+			self._write_json(self._path(name), data)
+
+	def _read_tracked(self) -> set:
+		"""Station UUIDs the followers' queries need in the status subset
+
+		Files left behind by workers that are gone (killed before stop()) are
+		removed instead of being read.
+		"""
+		station_ids = set()
+		prefix = f"{self.client.system}.tracked."
+		for path in self.directory.glob(f"{prefix}*.json"):
+			pid = path.name[len(prefix):-len(".json")]
+			if pid.isdigit() and not _process_alive(int(pid)):
+				try:
+					os.unlink(path)
+				except OSError:
+					pass
+				continue
+			try:
+				station_ids.update(json.loads(path.read_bytes()))
+			except (OSError, ValueError):
+				continue
+		return station_ids
+
+	async def _lead_once(self):
+		# Stations only when the index changed; freshness after every refresh
+		indexes = {
+			feed: index for feed, index in self.client.last_good.items()
+			if self._published.get(feed) is not index
+		}
+		states = {feed: self.client.export_feed_state(feed) for feed in self.client.last_good}
+		states = {feed: state for feed, state in states.items() if self._published_state.get(feed) != state}
+		if indexes or states:
+			exported = {f"{feed}.json": self.client.export_feed(feed) for feed in indexes}
+			exported.update((f"{feed}.state.json", state) for feed, state in states.items())
+			await asyncio.to_thread(self._publish, exported)
+			self._published.update(indexes)
+			self._published_state.update(states)
+			self.stats["published"] += len(indexes)
+			self.stats["states_published"] += len(states)
+		tracked = await asyncio.to_thread(self._read_tracked)
+		self.client.track_stations(tracked)
+		if not self.client.status_covers(tracked):
+			# A follower asked for stations the published status lacks: re-parse
+			# now so they are in the next publish, not the next refresh
+			key, loader = self.client.feeds["station_status"]
+			await singleflight.do(key, loader)
+
+	async def _send_tracked(self):
+		tracked = self.client.current_tracked()
+		if tracked != self._tracked_sent:
+			await asyncio.to_thread(self._write_json, self._path(f"tracked.{os.getpid()}.json"), sorted(tracked))
+			self._tracked_sent = tracked
+
+	async def _follow_once(self):
+		await self._send_tracked()
+		await asyncio.gather(*(
+			singleflight.do(key, loader) for key, loader in self.client.feeds.values()
+		))
+		# Rebuild the snapshot so this worker's listeners (SSE) see the new data
+		await self.client.get_snapshot()
+
+	async def _run(self):
+		while True:
+			try:
+				if self.role == FOLLOWER and self._try_lock():
+					self._become_leader()
+				if self.role == LEADER:
+					await self._lead_once()
+				else:
+					await self._follow_once()
+			except (OSError, httpx.HTTPError) as e:
+				self.stats["last_error"] = str(e)
+			except Exception as e:
+				# Anything else (a bad payload, a failing snapshot listener) must
+				# not stop this worker from following or publishing for good
+				logger.exception("Sharing %s feeds failed", self.client.system)
+				self.stats["last_error"] = f"{type(e).__name__}: {e}"
+			await asyncio.sleep(SHARED_POLL_INTERVAL_SECONDS)
+
+	async def start(self):
+		"""Elect this worker leader or follower and start sharing"""
+		try:
+			leader = self._try_lock()
+		except OSError as e:
+			# Shared directory unusable: fetch upstream like a single worker
+			logger.warning("Shared state in %s unavailable: %s", self.directory, e)
+			leader = True
+		if leader:
+			self._become_leader()
+		else:
+			self._become_follower()
+		if self._task is None or self._task.done():
+			self._task = asyncio.create_task(self._run())
+
+	async def stop(self):
+		"""Stop sharing, the refresher if leading, and release the lock"""
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+		await self.refresher.stop()
+		if self._lock_fd is not None:
+			os.close(self._lock_fd)
+			self._lock_fd = None
+		try:
+			os.unlink(self._path(f"tracked.{os.getpid()}.json"))
+		except OSError:
+			pass
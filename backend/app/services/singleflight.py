@@ -0,0 +1,58 @@
+"""
+Single-flight request coalescing for upstream fetches
+"""
+import asyncio
+from typing import Any, Callable, Coroutine, Dict
+
+
+class SingleFlight:
+	"""Run at most one in-flight call per key; concurrent callers await its result"""
+
+	def __init__(self):
+		self._inflight: Dict[str, asyncio.Task] = {}
+		self._waiters: Dict[str, int] = {}
+		self.stats: Dict[str, Dict] = {}
+
+	async def do(self, key: str, fn: Callable[[], Coroutine[Any, Any, Any]]) -> Any:
+		"""Call fn() for key, or join the call already running for it
+
+		fn() runs in its own task, so cancelling any caller (the one that
+		started it included) neither cancels it nor the other callers; it
+		finishes and fills the cache even if every caller gave up. Errors
+		raised by fn() are propagated to every caller of that flight.
+		"""
+		task = self._inflight.get(key)
+		if task is None:
+			task = asyncio.create_task(fn())
+			self._inflight[key] = task
+			self._waiters[key] = 0
+			task.add_done_callback(lambda task: self._finish(key, task))
+		self._waiters[key] += 1
+		# shield() so a cancelled caller does not cancel the shared call
+		return await asyncio.shield(task)
+
+	def _finish(self, key: str, task: asyncio.Task):
+		"""Done callback: retire the flight and count the callers it served"""
+		if self._inflight.get(key) is task:
+			del self._inflight[key]
+		self._record(key, self._waiters.pop(key))
+		if not task.cancelled():
+			# Mark retrieved so a failure nobody awaited any more does not log a warning
+			task.exception()
+
+	def _record(self, key: str, waiters: int):
+		"""Update per-key counters once a flight has finished"""
+		stats = self.stats.setdefault(key, {
+			"fetches": 0,
+			"callers_served": 0,
+			"last_waiters": 0,
+			"max_waiters": 0,
+		})
+		stats["fetches"] += 1
+		stats["callers_served"] += waiters
+		stats["last_waiters"] = waiters
+		stats["max_waiters"] = max(stats["max_waiters"], waiters)
+
+
+# Global single-flight group for GBFS feeds
+singleflight = SingleFlight()
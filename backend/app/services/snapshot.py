@@ -0,0 +1,167 @@
+"""
+Immutable, indexed views of the GBFS feeds
+"""
+import hashlib
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+_EMPTY: Mapping = MappingProxyType({})
+_generations = itertools.count(1)
+
+# Record fields compared when deciding whether a station changed between versions
+DELTA_FIELDS = (
+	"num_bikes_available",
+	"num_ebikes_available",
+	"num_docks_available",
+	"capacity",
+	"is_installed",
+	"is_renting",
+	"is_returning",
+)
+
+
+@dataclass(frozen=True)
+class FeedIndex:
+	"""One parsed GBFS feed with its stations indexed by UUID and short_name"""
+	by_id: Mapping[str, Dict]
+	by_short_name: Mapping[str, Dict] = field(default_factory=lambda: _EMPTY)
+	last_updated: Optional[int] = None
+	# Unique per index built, so derived results can be matched to it without holding it
+	generation: int = field(default_factory=lambda: next(_generations), compare=False)
+
+	@classmethod
+	def build(cls, stations: Iterable[Dict], last_updated: Optional[int] = None,
+			index_short_name: bool = False) -> "FeedIndex":
+		"""Index a feed's station list once so later lookups are O(1)"""
+		by_id = {}
+		by_short_name = {}
+		for station in stations:
+			by_id[station.get("station_id")] = station
+			if index_short_name and station.get("short_name") is not None:
+				by_short_name[station["short_name"]] = station
+		return cls(
+			by_id=MappingProxyType(by_id),
+			by_short_name=MappingProxyType(by_short_name) if index_short_name else _EMPTY,
+			last_updated=last_updated,
+		)
+
+	def select_short_names(self, short_names: Iterable[str]) -> List[Dict]:
+		"""Stations for the given short_names, in that order, skipping unknown ones"""
+		return [self.by_short_name[name] for name in short_names if name in self.by_short_name]
+
+	def select_ids(self, station_ids: Iterable[str]) -> List[Dict]:
+		"""Stations for the given UUIDs, in that order, skipping unknown ones"""
+		return [self.by_id[station_id] for station_id in station_ids if station_id in self.by_id]
+
+
+def combine_station(info: Dict, status: Dict) -> Dict:
+	"""Join one station's metadata and live status into the API record"""
+	# Calculate percent full
+	capacity = info.get("capacity", 0)
+	bikes_available = status.get("num_bikes_available", 0)
+	ebikes_available = status.get("num_ebikes_available", 0)
+	classic_bikes_available = bikes_available - ebikes_available
+	percent_full = round((bikes_available / capacity * 100), 1) if capacity > 0 else 0
+
+	return {
+		"station_id": info.get("station_id"),
+		"name": info.get("name", "Unknown"),
+		"lat": info.get("lat"),
+		"lon": info.get("lon"),
+		"capacity": capacity,
+		"num_bikes_available": bikes_available,
+		"num_ebikes_available": ebikes_available,
+		"num_classic_bikes_available": classic_bikes_available,
+		"num_docks_available": status.get("num_docks_available", 0),
+		"is_installed": status.get("is_installed", 0),
+		"is_renting": status.get("is_renting", 0),
+		"is_returning": status.get("is_returning", 0),
+		"last_reported": status.get("last_reported", 0),
+		"percent_full": percent_full,
+	}
+
+
+# Fields of a combined record that come from station_status
+LIVE_FIELDS = (
+	"num_bikes_available", "num_ebikes_available", "num_classic_bikes_available", "num_docks_available",
+	"is_installed", "is_renting", "is_returning", "last_reported", "percent_full",
+)
+
+
+def combine_tracked_station(info: Dict, status: FeedIndex) -> Dict:
+	"""combine_station() for a station that may not be in the status index yet
+
+	A status index parsed for a subset of stations (or a follower's copy of
+	the leader's) can lack a station a query just asked for. Its live fields
+	are then null rather than zeros that would read as an empty station.
+	"""
+	station_status = status.by_id.get(info.get("station_id"))
+	if station_status is not None:
+		return combine_station(info, station_status)
+	return {**combine_station(info, {}), **dict.fromkeys(LIVE_FIELDS)}
+
+
+def content_version(records: Iterable[Dict]) -> int:
+	"""Version number derived from the joined records themselves
+
+	Every worker (and every restart) that joins the same data gets the same
+	version, so ?since= and ETags work whichever process answers. 48 bits
+	keeps it an exact integer in JavaScript.
+	"""
+	encoded = json.dumps(list(records), sort_keys=True, separators=(",", ":")).encode("utf-8")
+	return int.from_bytes(hashlib.blake2b(encoded, digest_size=6).digest(), "big")
+
+
+@dataclass(frozen=True)
+class StationSnapshot:
+	"""Station info + status for one pair of feed versions, joined once
+
+	Built whenever either feed is refreshed; serving a request from it is a
+	dictionary lookup instead of a filter and join over the whole system.
+	"""
+	info: FeedIndex
+	status: FeedIndex
+	station_ids: Tuple[str, ...]
+	station_id_set: FrozenSet[str]
+	combined: Tuple[Dict, ...]
+	combined_by_id: Mapping[str, Dict]
+	version: int
+	built_at: float = field(default_factory=time.time)
+
+	@classmethod
+	def build(cls, info: FeedIndex, status: FeedIndex, short_names: Iterable[str]) -> "StationSnapshot":
+		"""Join the configured stations (by short_name) with their live status"""
+		stations = info.select_short_names(short_names)
+		combined = tuple(
+			combine_station(station, status.by_id.get(station["station_id"], {}))
+			for station in stations
+		)
+		station_ids = tuple(station["station_id"] for station in stations)
+		return cls(
+			info=info,
+			status=status,
+			station_ids=station_ids,
+			station_id_set=frozenset(station_ids),
+			combined=combined,
+			combined_by_id=MappingProxyType({record["station_id"]: record for record in combined}),
+			version=content_version(combined),
+		)
+
+	def is_built_from(self, info: FeedIndex, status: FeedIndex) -> bool:
+		"""Whether this snapshot already reflects these exact feed versions"""
+		return self.info is info and self.status is status
+
+
+def diff_stations(previous: Mapping[str, Dict], current: "StationSnapshot") -> Tuple[List[Dict], List[str]]:
+	"""(records whose counts changed or that are new, UUIDs no longer present)"""
+	changed = []
+	for record in current.combined:
+		old = previous.get(record["station_id"])
+		if old is None or any(old.get(name) != record.get(name) for name in DELTA_FIELDS):
+			changed.append(record)
+	removed = [station_id for station_id in previous if station_id not in current.combined_by_id]
+	return changed, removed
@@ -0,0 +1,82 @@
+"""
+Grid spatial index over station locations
+"""
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+from app.config import SPATIAL_GRID_CELL_DEGREES
+
+EARTH_RADIUS_METERS = 6_371_000
+METERS_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_METERS / 180
+
+
+def distance_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+	"""Haversine distance between two points"""
+	phi1, phi2 = math.radians(lat1), math.radians(lat2)
+	dphi = phi2 - phi1
+	dlambda = math.radians(lon2 - lon1)
+	a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+	return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+class GridIndex:
+	"""Buckets stations into fixed lat/lon cells so a radius query only
+	looks at the few cells overlapping the search circle
+
+	Built once per station_information version; read-only afterwards.
+	"""
+
+	def __init__(self, stations: Iterable[Dict], cell_degrees: float = SPATIAL_GRID_CELL_DEGREES):
+		self.cell_degrees = cell_degrees
+		self._cells: Dict[Tuple[int, int], List[Tuple[float, float, str]]] = defaultdict(list)
+		self.size = 0
+		for station in stations:
+			lat, lon = station.get("lat"), station.get("lon")
+			if lat is None or lon is None:
+				continue
+			self._cells[self._cell(lat, lon)].append((lat, lon, station["station_id"]))
+			self.size += 1
+		self._cells = dict(self._cells)
+		# Populated extent, so a query box never spans more rows/columns than hold stations
+		rows = [row for row, _ in self._cells]
+		cols = [col for _, col in self._cells]
+		self._row_range = (min(rows), max(rows)) if rows else (0, -1)
+		self._col_range = (min(cols), max(cols)) if cols else (0, -1)
+
+	def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+		return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+	def nearby(self, lat: float, lon: float, radius_meters: float, limit: int = None) -> List[Tuple[float, str]]:
+		"""(distance in meters, station UUID) pairs within the radius, nearest first"""
+		dlat = radius_meters / METERS_PER_DEGREE_LAT
+		# Near the poles the longitude span grows without bound; 180 either way covers the globe
+		dlon = min(radius_meters / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6)), 180.0)
+		row_min, col_min = self._cell(lat - dlat, lon - dlon)
+		row_max, col_max = self._cell(lat + dlat, lon + dlon)
+		row_min, row_max = max(row_min, self._row_range[0]), min(row_max, self._row_range[1])
+		col_min, col_max = max(col_min, self._col_range[0]), min(col_max, self._col_range[1])
+		if row_min > row_max or col_min > col_max:
+			return []
+
+		if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self._cells):
+			# Box covers more cells than hold stations: scan the populated ones
+			cells = [
+				stations for (row, col), stations in self._cells.items()
+				if row_min <= row <= row_max and col_min <= col <= col_max
+			]
+		else:
+			cells = [
+				self._cells.get((row, col), ())
+				for row in range(row_min, row_max + 1)
+				for col in range(col_min, col_max + 1)
+			]
+
+		matches = []
+		for stations in cells:
+			for station_lat, station_lon, station_id in stations:
+				distance = distance_meters(lat, lon, station_lat, station_lon)
+				if distance <= radius_meters:
+					matches.append((distance, station_id))
+
+		matches.sort()
+		return matches[:limit] if limit else matches
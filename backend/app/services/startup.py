@@ -0,0 +1,80 @@
+"""
+Startup phases, pre-warming and readiness
+
+The lifespan times each startup phase and, before the server accepts
+connections, builds every system's snapshot, spatial index and rendered
+status body, so the first requests are served from memory like any other.
+A restored disk snapshot (or another worker's shared feeds) makes this
+instant; otherwise it waits for upstream up to STARTUP_WARM_TIMEOUT_SECONDS
+and the refresher keeps trying after that.
+
+/health only says the process is up; /ready says whether it has station
+data to serve. The forecast model loads in the background and does not gate
+readiness.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from app.config import DEFAULT_SYSTEM, STARTUP_WARM_TIMEOUT_SECONDS
+from app.services.gbfs_client import GBFSClient
+from app.services.responses import render_status
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+	"""Timings of the startup phases and the outcome of pre-warming each system"""
+
+	def __init__(self):
+		# Phase name -> seconds, e.g. {"import": 0.41, "systems": 0.02, "warm": 0.01}
+		self.timings: Dict[str, float] = {}
+		# System -> error from pre-warming, None if it warmed
+		self.warm_errors: Dict[str, Optional[str]] = {}
+		self.ready_at: Optional[float] = None
+
+	@contextmanager
+	def phase(self, name: str):
+		"""Record how long the enclosed block takes"""
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.timings[name] = round(time.perf_counter() - started, 4)
+
+	async def _warm_system(self, system: str, client: GBFSClient):
+		snapshot = await client.get_snapshot()
+		await client.get_spatial_index()
+		# Same response cache names as the status endpoints
+		render_status("status" if system == DEFAULT_SYSTEM else f"{system}:status", snapshot, client.freshness())
+
+	async def warm(self, clients: Dict[str, GBFSClient]):
+		"""Pre-warm every system concurrently, giving up after STARTUP_WARM_TIMEOUT_SECONDS"""
+		async def warm_one(system: str, client: GBFSClient):
+			try:
+				await asyncio.wait_for(self._warm_system(system, client), STARTUP_WARM_TIMEOUT_SECONDS)
+				self.warm_errors[system] = None
+			except Exception as e:
+				# Accept traffic anyway: requests answer 503 until the refresher gets data
+				self.warm_errors[system] = str(e) or type(e).__name__
+				logger.warning("Could not pre-warm %s at startup: %s", system, self.warm_errors[system])
+
+		await asyncio.gather(*(warm_one(system, client) for system, client in clients.items()))
+		self.ready_at = time.time()
+
+	def readiness(self, clients: Dict[str, GBFSClient]) -> Dict:
+		"""/ready body; "ready" once startup finished and every system has data"""
+		systems = {
+			system: {"has_data": client.has_data, "warm_error": self.warm_errors.get(system)}
+			for system, client in clients.items()
+		}
+		return {
+			"ready": self.ready_at is not None and all(state["has_data"] for state in systems.values()),
+			"systems": systems,
+			"startup_seconds": self.timings,
+		}
+
+
+# Global startup state
+startup = Startup()
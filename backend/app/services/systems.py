@@ -0,0 +1,68 @@
+"""
+Registry of the bikeshare systems served by this backend
+"""
+import asyncio
+from typing import Dict, Iterator
+from app.config import DEFAULT_SYSTEM, GBFS_SYSTEMS, SHARED_STATE_ENABLED
+from app.services.gbfs_client import GBFSClient, gbfs_client
+from app.services.persistence import SnapshotPersister
+from app.services.refresher import StationRefresher, station_refresher
+from app.services.shared_state import SharedFeeds
+
+
+class SystemRegistry:
+	"""One GBFSClient, StationRefresher and SnapshotPersister per configured system
+
+	Each system has its own HTTP pool, cache namespace, refresh schedule and
+	cap on concurrent upstream requests, so adding a system does not slow
+	down requests for the others (they are all served from memory). With
+	SHARED_STATE_ENABLED only one worker per host runs a system's refresher
+	(see app/services/shared_state.py).
+	"""
+
+	def __init__(self):
+		# The default system reuses the module-level client and refresher
+		self.clients: Dict[str, GBFSClient] = {DEFAULT_SYSTEM: gbfs_client}
+		self.refreshers: Dict[str, StationRefresher] = {DEFAULT_SYSTEM: station_refresher}
+		for system in GBFS_SYSTEMS:
+			if system not in self.clients:
+				client = GBFSClient(system)
+				self.clients[system] = client
+				self.refreshers[system] = StationRefresher(client)
+		self.persisters: Dict[str, SnapshotPersister] = {
+			system: SnapshotPersister(client) for system, client in self.clients.items()
+		}
+		self.shared: Dict[str, SharedFeeds] = {
+			system: SharedFeeds(client, self.refreshers[system]) for system, client in self.clients.items()
+		} if SHARED_STATE_ENABLED else {}
+
+	def __contains__(self, system: str) -> bool:
+		return system in self.clients
+
+	def __iter__(self) -> Iterator[str]:
+		return iter(self.clients)
+
+	def get(self, system: str) -> GBFSClient:
+		return self.clients[system]
+
+	async def start(self):
+		"""Open every system's HTTP client, restore its last-good data and start its refresher"""
+		await asyncio.gather(*(client.start() for client in self.clients.values()))
+		# Restored data is served right away while the refreshers fetch fresh feeds
+		await asyncio.gather(*(persister.start() for persister in self.persisters.values()))
+		if self.shared:
+			# The elected worker starts its refresher; the others read its feeds
+			await asyncio.gather(*(shared.start() for shared in self.shared.values()))
+		else:
+			for refresher in self.refreshers.values():
+				refresher.start()
+
+	async def stop(self):
+		await asyncio.gather(*(shared.stop() for shared in self.shared.values()))
+		await asyncio.gather(*(refresher.stop() for refresher in self.refreshers.values()))
+		await asyncio.gather(*(persister.stop() for persister in self.persisters.values()))
+		await asyncio.gather(*(client.close() for client in self.clients.values()))
+
+
+# Global registry of all configured systems
+systems = SystemRegistry()
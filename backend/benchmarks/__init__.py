@@ -0,0 +1 @@
+# Load and startup benchmarks
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the Citi Bike GBFS feeds, used by the benchmarks
+
+Serves station_information.json and station_status.json for a synthetic
+system made of the Columbia stations plus filler stations, with a
+configurable station count (payload size), added latency and failure rate.
+
+Run standalone with:
+
+	python -m benchmarks.fake_gbfs --port 8765 --stations 2300 --latency-ms 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, List
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from app.config import COLUMBIA_STATION_IDS
+
+STATUS_TTL_SECONDS = 10
+
+
+def build_stations(count: int, seed: int = 0) -> List[Dict]:
+	"""station_information records; the first ones carry the Columbia short_names"""
+	rng = random.Random(seed)
+	stations = []
+	for i in range(count):
+		short_name = COLUMBIA_STATION_IDS[i] if i < len(COLUMBIA_STATION_IDS) else f"{5000 + i // 100}.{i % 100:02d}"
+		stations.append({
+			"station_id": str(uuid.UUID(int=i + 1)),
+			"short_name": short_name,
+			"name": f"Station {i}",
+			"lat": round(40.70 + rng.random() * 0.18, 6),
+			"lon": round(-74.02 + rng.random() * 0.10, 6),
+			"capacity": rng.randint(15, 60),
+			"region_id": "71",
+			"rental_methods": ["KEY", "CREDITCARD"],
+			"eightd_has_key_dispenser": False,
+			"has_kiosk": True,
+		})
+	return stations
+
+
+def create_app(stations: int = 2300, latency_ms: float = 0.0, failure_rate: float = 0.0,
+		seed: int = 0) -> FastAPI:
+	"""FastAPI app serving the two feeds under /gbfs/en, plus request counters at /_stats"""
+	app = FastAPI()
+	rng = random.Random(seed)
+	records = build_stations(stations, seed)
+	info_body = json.dumps({
+		"last_updated": int(time.time()),
+		"ttl": 60,
+		"version": "2.3",
+		"data": {"stations": records},
+	}).encode()
+	info_etag = f'"info-{seed}-{stations}"'
+	# Status body per STATUS_TTL_SECONDS window, rendered once per window
+	status_cache: Dict[int, bytes] = {}
+	stats = {"station_information": 0, "station_status": 0, "not_modified": 0, "failed": 0}
+
+	def status_body(window: int) -> bytes:
+		if window not in status_cache:
+			status_cache.clear()
+			last_updated = window * STATUS_TTL_SECONDS
+			status_cache[window] = json.dumps({
+				"last_updated": last_updated,
+				"ttl": STATUS_TTL_SECONDS,
+				"version": "2.3",
+				"data": {"stations": [
+					{
+						"station_id": record["station_id"],
+						"num_bikes_available": (i * 7 + window) % record["capacity"],
+						"num_ebikes_available": (i + window) % 3,
+						"num_docks_available": record["capacity"] - (i * 7 + window) % record["capacity"],
+						"num_bikes_disabled": 0,
+						"num_docks_disabled": 0,
+						"is_installed": 1,
+						"is_renting": 1,
+						"is_returning": 1,
+						"last_reported": last_updated - i % STATUS_TTL_SECONDS,
+						"vehicle_types_available": [
+							{"vehicle_type_id": "1", "count": (i * 7 + window) % record["capacity"]},
+							{"vehicle_type_id": "2", "count": (i + window) % 3},
+						],
+					}
+					for i, record in enumerate(records)
+				]},
+			}).encode()
+		return status_cache[window]
+
+	async def simulate(feed: str):
+		"""Count the request, wait the configured latency and maybe fail"""
+		stats[feed] += 1
+		if latency_ms:
+			await asyncio.sleep(latency_ms / 1000)
+		if failure_rate and rng.random() < failure_rate:
+			stats["failed"] += 1
+			return Response(status_code=503)
+		return None
+
+	@app.get("/gbfs/en/station_information.json")
+	async def station_information(request: Request):
+		failure = await simulate("station_information")
+		if failure is not None:
+			return failure
+		if request.headers.get("if-none-match") == info_etag:
+			stats["not_modified"] += 1
+			return Response(status_code=304, headers={"ETag": info_etag})
+		return Response(info_body, media_type="application/json", headers={"ETag": info_etag})
+
+	@app.get("/gbfs/en/station_status.json")
+	async def station_status():
+		failure = await simulate("station_status")
+		if failure is not None:
+			return failure
+		return Response(status_body(int(time.time()) // STATUS_TTL_SECONDS), media_type="application/json")
+
+	@app.get("/_stats")
+	async def request_stats():
+		return stats
+
+	return app
+
+
+def run(port: int, host: str = "127.0.0.1", **options):
+	"""Serve the fake feeds until the process is stopped"""
+	uvicorn.run(create_app(**options), host=host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Serve synthetic GBFS feeds locally")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--stations", type=int, default=2300, help="stations per feed (payload size)")
+	parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every response")
+	parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+	parser.add_argument("--seed", type=int, default=0)
+	args = parser.parse_args()
+	print(f"Serving fake GBFS feeds at http://127.0.0.1:{args.port}/gbfs/en")
+	run(args.port, stations=args.stations, latency_ms=args.latency_ms,
+		failure_rate=args.failure_rate, seed=args.seed)
@@ -0,0 +1,243 @@
+"""
+Load test for the backend API against a local fake GBFS server
+
+Starts benchmarks.fake_gbfs and the FastAPI app (pointed at it) in their own
+processes, then drives each endpoint at increasing concurrency and reports
+requests/s and p50/p95/p99 latency. Run from backend/:
+
+	python -m benchmarks.load_test
+	python -m benchmarks.load_test --concurrency 1 10 50 --duration 5 --latency-ms 80
+	python -m benchmarks.load_test --baseline benchmarks/results/<earlier run>.json
+
+Results are written as JSON to benchmarks/results/ (or --output). With
+--baseline, each row is also compared against the same endpoint and
+concurrency in an earlier run. The load generator is a single asyncio
+process, so at high concurrency it can become the bottleneck itself; compare
+runs made on the same machine with the same options.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_ENDPOINTS = ["/api/stations/status", "/api/stations/columbia"]
+DEFAULT_CONCURRENCY = [1, 10, 50, 100]
+
+
+def _free_port() -> int:
+	with socket.socket() as sock:
+		sock.bind(("127.0.0.1", 0))
+		return sock.getsockname()[1]
+
+
+def _serve_fake(port: int, options: Dict):
+	from benchmarks.fake_gbfs import run
+	run(port, **options)
+
+
+def _serve_app(port: int, gbfs_base_url: str, data_dir: str):
+	"""Run the app with every system pointed at the fake server and scratch data files"""
+	import uvicorn
+	from app import config
+	for system in config.GBFS_SYSTEMS.values():
+		system["base_url"] = gbfs_base_url
+	config.SNAPSHOT_DIR = Path(data_dir) / "snapshots"
+	config.HISTORY_DB_PATH = Path(data_dir) / "station_history.sqlite"
+	config.SHARED_STATE_DIR = Path(data_dir) / "shared"
+	from app.main import app
+	uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _wait_ready(url: str, timeout: float = 30.0):
+	deadline = time.monotonic() + timeout
+	async with httpx.AsyncClient() as client:
+		while True:
+			try:
+				if (await client.get(url)).status_code == 200:
+					return
+			except httpx.HTTPError:
+				pass
+			if time.monotonic() > deadline:
+				raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+			await asyncio.sleep(0.1)
+
+
+async def measure(client: httpx.AsyncClient, url: str, concurrency: int, duration: float) -> Dict:
+	"""Hit url from `concurrency` workers for `duration` seconds"""
+	latencies: List[float] = []
+	statuses: Dict[int, int] = {}
+	errors = 0
+	deadline = time.perf_counter() + duration
+
+	async def worker():
+		nonlocal errors
+		while time.perf_counter() < deadline:
+			started = time.perf_counter()
+			try:
+				response = await client.get(url)
+			except httpx.HTTPError:
+				errors += 1
+				continue
+			latencies.append(time.perf_counter() - started)
+			statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+	started = time.perf_counter()
+	await asyncio.gather(*(worker() for _ in range(concurrency)))
+	elapsed = time.perf_counter() - started
+
+	result = {
+		"concurrency": concurrency,
+		"requests": len(latencies),
+		"errors": errors,
+		"statuses": {str(code): count for code, count in sorted(statuses.items())},
+		"duration_s": round(elapsed, 3),
+		"rps": round(len(latencies) / elapsed, 1),
+	}
+	if latencies:
+		p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+		result.update({
+			"p50_ms": round(float(p50), 2),
+			"p95_ms": round(float(p95), 2),
+			"p99_ms": round(float(p99), 2),
+			"max_ms": round(max(latencies) * 1000, 2),
+		})
+	return result
+
+
+async def run_benchmark(args) -> Dict:
+	fake_port, app_port = _free_port(), _free_port()
+	fake_options = {
+		"stations": args.stations,
+		"latency_ms": args.latency_ms,
+		"failure_rate": args.failure_rate,
+		"seed": args.seed,
+	}
+	context = multiprocessing.get_context("spawn")
+	data_dir = tempfile.TemporaryDirectory(prefix="citibike-bench-")
+	fake = context.Process(target=_serve_fake, args=(fake_port, fake_options), daemon=True)
+	server = context.Process(
+		target=_serve_app,
+		args=(app_port, f"http://127.0.0.1:{fake_port}/gbfs/en", data_dir.name),
+		daemon=True,
+	)
+	fake.start()
+	server.start()
+	base_url = f"http://127.0.0.1:{app_port}"
+	results = []
+	try:
+		await _wait_ready(f"http://127.0.0.1:{fake_port}/_stats")
+		await _wait_ready(f"{base_url}/health")
+
+		limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+		async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+			for endpoint in args.endpoints:
+				# Warm-up: first fetch from upstream, then steady-state serving
+				await client.get(endpoint)
+				for concurrency in args.concurrency:
+					result = await measure(client, endpoint, concurrency, args.duration)
+					results.append({"endpoint": endpoint, **result})
+					print(_format_row(results[-1]))
+
+			upstream = (await client.get(f"http://127.0.0.1:{fake_port}/_stats")).json()
+	finally:
+		for process in (server, fake):
+			process.terminate()
+			process.join(5)
+		data_dir.cleanup()
+
+	return {
+		"started_at": datetime.now().isoformat(timespec="seconds"),
+		"options": {
+			**fake_options,
+			"duration_s": args.duration,
+			"concurrency": args.concurrency,
+			"endpoints": args.endpoints,
+		},
+		"environment": _environment(),
+		"upstream_requests": upstream,
+		"results": results,
+	}
+
+
+def _environment() -> Dict:
+	try:
+		commit = subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+			capture_output=True, text=True, check=True,
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		commit = None
+	return {
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"cpu_count": os.cpu_count(),
+		"commit": commit,
+	}
+
+
+def _format_row(row: Dict, baseline: Optional[Dict] = None) -> str:
+	line = (
+		f"{row['endpoint']:<28} c={row['concurrency']:<4} {row['rps']:>9.1f} req/s"
+		f"  p50 {row.get('p50_ms', 0):>8.2f}  p95 {row.get('p95_ms', 0):>8.2f}"
+		f"  p99 {row.get('p99_ms', 0):>8.2f} ms  errors {row['errors']}"
+	)
+	if baseline:
+		def change(key):
+			if not baseline.get(key):
+				return "n/a"
+			return f"{(row.get(key, 0) - baseline[key]) / baseline[key] * 100:+.1f}%"
+		line += f"  | vs baseline: rps {change('rps')}, p99 {change('p99_ms')}"
+	return line
+
+
+def compare(current: Dict, baseline: Dict):
+	"""Print each result next to the matching one from a previous run"""
+	previous = {(row["endpoint"], row["concurrency"]): row for row in baseline["results"]}
+	print(f"\nCompared with {baseline.get('started_at')} (commit {baseline.get('environment', {}).get('commit')}):")
+	for row in current["results"]:
+		print(_format_row(row, previous.get((row["endpoint"], row["concurrency"]))))
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Load-test the backend API against a fake GBFS server")
+	parser.add_argument("--endpoints", nargs="+", default=DEFAULT_ENDPOINTS)
+	parser.add_argument("--concurrency", nargs="+", type=int, default=DEFAULT_CONCURRENCY)
+	parser.add_argument("--duration", type=float, default=10.0, help="seconds per endpoint and concurrency level")
+	parser.add_argument("--stations", type=int, default=2300, help="stations in the fake feeds (payload size)")
+	parser.add_argument("--latency-ms", type=float, default=0.0, help="latency added by the fake GBFS server")
+	parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of upstream requests that fail")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/<timestamp>.json)")
+	parser.add_argument("--baseline", type=Path, help="earlier results file to compare against")
+	args = parser.parse_args()
+
+	report = asyncio.run(run_benchmark(args))
+
+	output = args.output or RESULTS_DIR / f"load_test_{datetime.now():%Y%m%d_%H%M%S}.json"
+	output.parent.mkdir(parents=True, exist_ok=True)
+	output.write_text(json.dumps(report, indent=2))
+	print(f"\nUpstream requests: {report['upstream_requests']}")
+	print(f"Saved results to {output}")
+
+	if args.baseline:
+		compare(report, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+	# Child processes import the app from backend/
+	sys.path.insert(0, str(BACKEND_DIR))
+	main()
@@ -0,0 +1,225 @@
+"""
+Startup-time benchmark for the backend API
+
+Measures how long the app takes to import and how long a fresh process takes
+to answer its first 200 on /health, /ready and /api/stations/status, with the
+upstream served by benchmarks.fake_gbfs. Run from backend/:
+
+	python -m benchmarks.startup
+	python -m benchmarks.startup --runs 10 --latency-ms 300
+	python -m benchmarks.startup --baseline benchmarks/results/<earlier run>.json
+
+Scenarios:
+
+	cold      empty data directory, so the first snapshot comes from upstream
+	restored  the snapshot file the cold run left behind at shutdown
+
+Each scenario starts --runs fresh processes and reports the median. The app's
+own per-phase timings (the "startup_seconds" block of /ready) are recorded
+too. Results are written as JSON to benchmarks/results/ (or --output).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import httpx
+from benchmarks.load_test import (
+	BACKEND_DIR,
+	RESULTS_DIR,
+	_environment,
+	_free_port,
+	_serve_app,
+	_serve_fake,
+	_wait_ready,
+)
+
+PROBES = ["/health", "/ready", "/api/stations/status"]
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def measure_imports(runs: int) -> Dict:
+	"""Median `import app.main` time in a fresh interpreter, and the slowest packages"""
+	totals = []
+	packages: Dict[str, List[float]] = {}
+	for _ in range(runs):
+		started = time.perf_counter()
+		completed = subprocess.run(
+			[sys.executable, "-X", "importtime", "-c", "import app.main"],
+			cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+		)
+		wall = time.perf_counter() - started
+		for line in completed.stderr.splitlines():
+			match = _IMPORTTIME_LINE.match(line)
+			if not match:
+				continue
+			cumulative_us, module = int(match.group(2)), match.group(3)
+			if module == "app.main":
+				totals.append({"import_s": cumulative_us / 1e6, "process_s": wall})
+			elif "." not in module and module != "app":
+				# A package's first import covers everything it pulls in
+				packages.setdefault(module, []).append(cumulative_us / 1e6)
+
+	slowest = sorted(
+		((module, statistics.median(times)) for module, times in packages.items()),
+		key=lambda item: item[1], reverse=True,
+	)[:10]
+	return {
+		"runs": runs,
+		"import_s": round(statistics.median(t["import_s"] for t in totals), 4),
+		"process_s": round(statistics.median(t["process_s"] for t in totals), 4),
+		"slowest_packages": {module: round(seconds, 4) for module, seconds in slowest},
+	}
+
+
+async def _first_200s(base_url: str, started: float, timeout: float = 60.0) -> Dict:
+	"""Seconds from process start to the first 200 from each probe"""
+	first: Dict[str, float] = {}
+	ready_body = None
+	deadline = time.monotonic() + timeout
+	async with httpx.AsyncClient(base_url=base_url, timeout=5.0) as client:
+		while len(first) < len(PROBES):
+			for path in PROBES:
+				if path in first:
+					continue
+				try:
+					response = await client.get(path)
+				except httpx.HTTPError:
+					continue
+				if response.status_code == 200:
+					first[path] = round(time.perf_counter() - started, 4)
+					if path == "/ready":
+						ready_body = response.json()
+			if time.monotonic() > deadline:
+				raise RuntimeError(f"{base_url} did not answer {sorted(set(PROBES) - set(first))} within {timeout:.0f}s")
+			await asyncio.sleep(0.005)
+	return {"first_200_s": first, "app_startup_s": ready_body.get("startup_seconds") if ready_body else None}
+
+
+async def start_once(gbfs_base_url: str, data_dir: str) -> Dict:
+	"""Start one app process, time its first 200s, then stop it (which saves its snapshot)"""
+	context = multiprocessing.get_context("spawn")
+	port = _free_port()
+	server = context.Process(target=_serve_app, args=(port, gbfs_base_url, data_dir), daemon=True)
+	started = time.perf_counter()
+	server.start()
+	try:
+		return await _first_200s(f"http://127.0.0.1:{port}", started)
+	finally:
+		# SIGTERM: uvicorn runs the lifespan shutdown, which writes the snapshot
+		server.terminate()
+		server.join(10)
+
+
+def _summarize(runs: List[Dict]) -> Dict:
+	summary = {
+		path: round(statistics.median(run["first_200_s"][path] for run in runs), 4)
+		for path in PROBES
+	}
+	phases = [run["app_startup_s"] for run in runs if run["app_startup_s"]]
+	return {
+		"first_200_s": summary,
+		"app_startup_s": {
+			phase: round(statistics.median(p[phase] for p in phases if phase in p), 4)
+			for phase in (phases[0] if phases else {})
+		},
+		"runs": runs,
+	}
+
+
+async def run_benchmark(args) -> Dict:
+	fake_port = _free_port()
+	fake_options = {
+		"stations": args.stations,
+		"latency_ms": args.latency_ms,
+		"failure_rate": 0.0,
+		"seed": args.seed,
+	}
+	context = multiprocessing.get_context("spawn")
+	fake = context.Process(target=_serve_fake, args=(fake_port, fake_options), daemon=True)
+	fake.start()
+	gbfs_base_url = f"http://127.0.0.1:{fake_port}/gbfs/en"
+	scenarios = {"cold": [], "restored": []}
+	seeded = tempfile.TemporaryDirectory(prefix="citibike-startup-")
+	try:
+		await _wait_ready(f"http://127.0.0.1:{fake_port}/_stats")
+		for i in range(args.runs):
+			with tempfile.TemporaryDirectory(prefix="citibike-startup-") as data_dir:
+				scenarios["cold"].append(await start_once(gbfs_base_url, data_dir))
+				if i == 0:
+					shutil.copytree(data_dir, seeded.name, dirs_exist_ok=True)
+		for _ in range(args.runs):
+			with tempfile.TemporaryDirectory(prefix="citibike-startup-") as data_dir:
+				# Only the snapshot file, so every run restores the same one
+				shutil.copytree(Path(seeded.name) / "snapshots", Path(data_dir) / "snapshots")
+				scenarios["restored"].append(await start_once(gbfs_base_url, data_dir))
+	finally:
+		fake.terminate()
+		fake.join(5)
+		seeded.cleanup()
+
+	return {
+		"started_at": datetime.now().isoformat(timespec="seconds"),
+		"options": {**fake_options, "runs": args.runs},
+		"environment": _environment(),
+		"imports": measure_imports(args.runs),
+		"scenarios": {name: _summarize(runs) for name, runs in scenarios.items()},
+	}
+
+
+def _format_report(report: Dict, baseline: Optional[Dict] = None) -> str:
+	def change(current: float, previous: Optional[float]) -> str:
+		if not baseline or not previous:
+			return ""
+		return f"  ({(current - previous) / previous * 100:+.1f}%)"
+
+	imports = report["imports"]
+	previous_imports = baseline["imports"] if baseline else {}
+	lines = [
+		f"import app.main      {imports['import_s'] * 1000:8.1f} ms{change(imports['import_s'], previous_imports.get('import_s'))}",
+		f"interpreter + import {imports['process_s'] * 1000:8.1f} ms{change(imports['process_s'], previous_imports.get('process_s'))}",
+		"slowest packages:    " + ", ".join(f"{m} {s * 1000:.0f} ms" for m, s in imports["slowest_packages"].items()),
+	]
+	for name, scenario in report["scenarios"].items():
+		previous = baseline["scenarios"].get(name, {}).get("first_200_s", {}) if baseline else {}
+		for path, seconds in scenario["first_200_s"].items():
+			lines.append(
+				f"{name:<9} first 200 {path:<22} {seconds * 1000:8.1f} ms{change(seconds, previous.get(path))}"
+			)
+		lines.append(f"{name:<9} app phases: {scenario['app_startup_s']}")
+	return "\n".join(lines)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Measure backend import time and time to first 200")
+	parser.add_argument("--runs", type=int, default=5, help="fresh processes per scenario")
+	parser.add_argument("--stations", type=int, default=2300, help="stations in the fake feeds (payload size)")
+	parser.add_argument("--latency-ms", type=float, default=0.0, help="latency added by the fake GBFS server")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/<timestamp>.json)")
+	parser.add_argument("--baseline", type=Path, help="earlier results file to compare against")
+	args = parser.parse_args()
+
+	report = asyncio.run(run_benchmark(args))
+	baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+	print(_format_report(report, baseline))
+
+	output = args.output or RESULTS_DIR / f"startup_{datetime.now():%Y%m%d_%H%M%S}.json"
+	output.parent.mkdir(parents=True, exist_ok=True)
+	output.write_text(json.dumps(report, indent=2))
+	print(f"\nSaved results to {output}")
+
+
+if __name__ == "__main__":
+	# Child processes import the app from backend/
+	sys.path.insert(0, str(BACKEND_DIR))
+	main()
@@ -0,0 +1,11 @@
+import pytest
+
+from app.services.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+	"""Every GBFSClient for a system shares the global cache's keys; start each test without them"""
+	cache.clear()
+	yield
+	cache.clear()
@@ -0,0 +1,47 @@
+"""
+Behaviour tests for the SSE status broadcaster
+
+Run from backend/:
+
+	python -m pytest tests
+"""
+from types import SimpleNamespace
+
+from app.services.broadcast import StatusBroadcaster
+from app.services.snapshot import FeedIndex, StationSnapshot
+
+INFO = FeedIndex.build([{"station_id": "a", "short_name": "1", "capacity": 10}], index_short_name=True)
+
+
+def _snapshot(bikes: int) -> StationSnapshot:
+	status = FeedIndex.build([{"station_id": "a", "num_bikes_available": bikes}])
+	return StationSnapshot.build(INFO, status, ["1"])
+
+
+def _broadcaster():
+	client = SimpleNamespace(freshness_value={"stale": False, "as_of": 100})
+	client.freshness = lambda: dict(client.freshness_value)
+	return StatusBroadcaster(client), client
+
+
+def test_newer_as_of_alone_is_not_pushed():
+	broadcaster, client = _broadcaster()
+	broadcaster.publish_snapshot(_snapshot(3))
+	first = broadcaster._message
+
+	client.freshness_value["as_of"] = 110
+	broadcaster.publish_snapshot(_snapshot(3))
+
+	assert broadcaster.stats["broadcasts"] == 1
+	assert broadcaster._message is first
+
+
+def test_new_station_data_and_stale_flips_are_pushed():
+	broadcaster, client = _broadcaster()
+	broadcaster.publish_snapshot(_snapshot(3))
+	broadcaster.publish_snapshot(_snapshot(4))
+	client.freshness_value["stale"] = True
+	broadcaster.publish_snapshot(_snapshot(4))
+
+	assert broadcaster.stats["broadcasts"] == 3
+	assert b'"stale":true' in broadcaster._message
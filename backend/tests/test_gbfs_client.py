@@ -0,0 +1,193 @@
+"""
+Behaviour tests for GBFSClient fetches (against an in-process httpx transport) and cached queries
+
+Run from backend/:
+
+	python -m pytest tests
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.config import STATUS_TRACKED_IDLE_SECONDS
+from app.services.cache import cache
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.gbfs_client import GBFSClient
+from app.services.snapshot import FeedIndex
+
+
+def _client(handler) -> GBFSClient:
+	client = GBFSClient()
+	client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+	return client
+
+
+def _fetches(client: GBFSClient, feed: str, status: str) -> float:
+	"""UPSTREAM_FETCH_SECONDS observations so far for one label set"""
+	value = REGISTRY.get_sample_value(
+		"citibike_gbfs_fetch_duration_seconds_count",
+		{"system": client.system, "feed": feed, "status": status},
+	)
+	return value or 0.0
+
+
+def _get(client: GBFSClient, feed: str):
+	return asyncio.run(client._get_json(feed, "https://gbfs.test/station_status.json"))
+
+
+def test_successful_fetch_is_labelled_with_its_status_code():
+	client = _client(lambda request: httpx.Response(200, json={"data": {"stations": []}}))
+	before = _fetches(client, "test_ok", "200")
+
+	assert _get(client, "test_ok") == {"data": {"stations": []}}
+	assert _fetches(client, "test_ok", "200") == before + 1
+
+
+def test_error_response_is_timed_with_its_status_code():
+	client = _client(lambda request: httpx.Response(503))
+	before = _fetches(client, "test_5xx", "503")
+
+	with pytest.raises(httpx.HTTPStatusError):
+		_get(client, "test_5xx")
+	assert _fetches(client, "test_5xx", "503") == before + 1
+
+
+def test_timeout_is_timed_as_timeout():
+	def handler(request):
+		raise httpx.ReadTimeout("upstream too slow", request=request)
+
+	client = _client(handler)
+	before = _fetches(client, "test_timeout", "timeout")
+
+	with pytest.raises(httpx.TimeoutException):
+		_get(client, "test_timeout")
+	assert _fetches(client, "test_timeout", "timeout") == before + 1
+
+
+def test_connect_error_is_timed_as_error():
+	def handler(request):
+		raise httpx.ConnectError("connection refused", request=request)
+
+	client = _client(handler)
+	before = _fetches(client, "test_connect", "error")
+
+	with pytest.raises(httpx.ConnectError):
+		_get(client, "test_connect")
+	assert _fetches(client, "test_connect", "error") == before + 1
+
+
+def test_open_circuit_is_timed_as_circuit_open():
+	client = _client(lambda request: httpx.Response(503))
+	for _ in range(client.breaker.failure_threshold):
+		with pytest.raises(httpx.HTTPStatusError):
+			_get(client, "test_circuit")
+	before = _fetches(client, "test_circuit", "circuit_open")
+
+	with pytest.raises(CircuitOpenError):
+		_get(client, "test_circuit")
+	assert _fetches(client, "test_circuit", "circuit_open") == before + 1
+
+
+def _apply(client: GBFSClient, feed: str, stations) -> FeedIndex:
+	now = time.time()
+	return client.apply_feed(feed, {
+		"stations": stations,
+		"last_updated": int(now),
+		"ttl": 10,
+		"fetched_at": now,
+		"fresh_until": now + 10,
+	}, source="upstream")
+
+
+def test_cached_query_is_recomputed_for_new_indexes_without_holding_old_ones():
+	client = GBFSClient()
+	_apply(client, "station_information", [{"station_id": "a", "short_name": "1"}])
+	_apply(client, "station_status", [{"station_id": "a", "num_bikes_available": 1}])
+	calls = []
+
+	def compute(info, status):
+		calls.append(status)
+		return status.by_id["a"]["num_bikes_available"]
+
+	key = client._key("nearby:test")
+	query = lambda: asyncio.run(client._cached_query(key, ["a"], compute))
+
+	assert query() == 1
+	assert query() == 1
+	assert len(calls) == 1
+	assert not any(isinstance(part, FeedIndex) for part in cache.get(key))
+
+	_apply(client, "station_status", [{"station_id": "a", "num_bikes_available": 2}])
+	assert query() == 2
+	assert len(calls) == 2
+
+
+def _status_client():
+	"""A client with station_information loaded and a status feed upstream; (client, status requests)"""
+	requests = []
+
+	def handler(request):
+		requests.append(request)
+		return httpx.Response(200, json={
+			"last_updated": int(time.time()),
+			"ttl": 10,
+			"data": {"stations": [
+				{"station_id": station_id, "num_bikes_available": 1} for station_id in ("a", "b", "c")
+			]},
+		})
+
+	client = _client(handler)
+	client.default_short_names = ["1"]
+	client.station_groups = {}
+	_apply(client, "station_information", [
+		{"station_id": "a", "short_name": "1"},
+		{"station_id": "b", "short_name": "2"},
+		{"station_id": "c", "short_name": "3"},
+	])
+	return client, requests
+
+
+def test_newly_tracked_stations_are_parsed_from_the_body_in_memory():
+	client, requests = _status_client()
+
+	async def run():
+		first = await client._load_station_status()
+		return first, await client._status_for(["b"])
+
+	first, status = asyncio.run(run())
+
+	assert set(first.by_id) == {"a"}
+	assert set(status.by_id) == {"a", "b"}
+	assert len(requests) == 1
+
+
+def test_idle_tracked_stations_leave_the_subset():
+	client, requests = _status_client()
+
+	async def run():
+		await client._status_for(["b"])
+		client.tracked_station_ids["b"] -= STATUS_TRACKED_IDLE_SECONDS + 1
+		return await client._load_station_status()
+
+	status = asyncio.run(run())
+
+	assert set(status.by_id) == {"a"}
+	assert client.tracked_station_ids == {}
+	assert len(requests) == 1
+
+
+def test_due_status_feed_is_downloaded_for_a_new_subset():
+	client, requests = _status_client()
+
+	async def run():
+		await client._load_station_status()
+		client.feed_state["station_status"]["fresh_until"] = time.time() - 1
+		return await client._status_for(["c"])
+
+	status = asyncio.run(run())
+
+	assert set(status.by_id) == {"a", "c"}
+	assert len(requests) == 2
@@ -0,0 +1,79 @@
+"""
+Behaviour tests for the selective GBFS station parser
+
+Run from backend/:
+
+	python -m pytest tests
+"""
+import json
+
+from app.services.gbfs_parser import parse_station_subset
+
+
+def _feed(stations, last_updated=1700000000, ttl=5) -> bytes:
+	return json.dumps({
+		"last_updated": last_updated,
+		"ttl": ttl,
+		"data": {"stations": stations},
+	}).encode()
+
+
+def _ids(parsed):
+	return sorted(station["station_id"] for station in parsed["data"]["stations"])
+
+
+def test_returns_only_the_wanted_stations():
+	stations = [
+		{"station_id": "a", "num_bikes_available": 1},
+		{"station_id": "b", "num_bikes_available": 2},
+		{"station_id": "c", "num_bikes_available": 3},
+	]
+	parsed = parse_station_subset(_feed(stations), ["a", "c"])
+
+	assert parsed["last_updated"] == 1700000000
+	assert parsed["ttl"] == 5
+	assert parsed["data"]["stations"] == [stations[0], stations[2]]
+
+
+def test_no_station_ids_decodes_the_whole_feed():
+	stations = [{"station_id": "a"}, {"station_id": "b"}]
+	assert parse_station_subset(_feed(stations), []) == json.loads(_feed(stations))
+
+
+def test_missing_stations_are_left_out():
+	parsed = parse_station_subset(_feed([{"station_id": "a"}]), ["a", "gone"])
+	assert _ids(parsed) == ["a"]
+
+
+def test_nested_objects_before_and_after_the_station_id():
+	wanted = {
+		"vehicle_types_available": [{"vehicle_type_id": "1", "count": 2}, {"vehicle_type_id": "2", "count": 0}],
+		"station_id": "a",
+		"num_bikes_available": 2,
+		"vehicle_docks_available": [{"vehicle_type_ids": ["1"], "count": 5}],
+	}
+	stations = [{"station_id": "b", "vehicle_types_available": [{"count": 1}]}, wanted]
+	parsed = parse_station_subset(_feed(stations), ["a"])
+
+	assert parsed["data"]["stations"] == [wanted]
+
+
+def test_braces_inside_strings_after_the_station_id():
+	wanted = {"station_id": "a", "name": "Broadway {north} \"}\" side", "num_bikes_available": 4}
+	stations = [wanted, {"station_id": "b", "name": "}{"}]
+	parsed = parse_station_subset(_feed(stations), ["a"])
+
+	assert parsed["data"]["stations"] == [wanted]
+	assert parsed["ttl"] == 5
+
+
+def test_brace_inside_a_string_before_the_station_id_falls_back_to_a_full_decode():
+	# The backward scan for the opening '{' cannot see string boundaries, so
+	# this one lands on the wrong object and the full json.loads() path runs
+	wanted = {"name": "Amsterdam }", "station_id": "a", "num_bikes_available": 1}
+	stations = [{"station_id": "b"}, wanted, {"station_id": "c"}]
+	parsed = parse_station_subset(_feed(stations), ["a", "c"])
+
+	assert parsed["last_updated"] == 1700000000
+	assert parsed["data"]["stations"] == [wanted, {"station_id": "c"}]
+
@@ -0,0 +1,132 @@
+"""
+Behaviour tests for feeds shared between workers through SHARED_STATE_DIR
+
+Both workers run in this process, each with its own GBFSClient. Run from
+backend/:
+
+	python -m pytest tests
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from app.services import shared_state
+from app.services.gbfs_client import GBFSClient
+from app.services.shared_state import LEADER, SharedFeeds
+
+FEEDS = {
+	"station_information": [{"station_id": "a", "short_name": "1000.01", "capacity": 10}],
+	"station_status": [{"station_id": "a", "num_bikes_available": 3}],
+}
+
+
+def _loaded_client() -> GBFSClient:
+	"""A client serving FEEDS as if it had just fetched them"""
+	client = GBFSClient()
+	now = time.time()
+	for feed, stations in FEEDS.items():
+		client.apply_feed(feed, {
+			"stations": stations,
+			"last_updated": int(now),
+			"ttl": 10,
+			"fetched_at": now,
+			"fresh_until": now + 10,
+		}, source="upstream")
+	return client
+
+
+def _refresh_unchanged(client: GBFSClient, feed: str) -> None:
+	"""What a 304 (or an unchanged body) does: same index, new freshness"""
+	key, _ = client.feeds[feed]
+	state = client.feed_state[feed]
+	client._cache_feed(feed, key, {**state, "last_updated": state["last_updated"] + 5}, client.last_good[feed])
+
+
+def test_unchanged_refresh_moves_only_the_state_file(tmp_path):
+	leader = SharedFeeds(_loaded_client(), None, tmp_path)
+	follower = SharedFeeds(GBFSClient(), None, tmp_path)
+
+	async def run():
+		await leader._lead_once()
+		first = {feed: await follower._read_feed(feed) for feed in FEEDS}
+
+		_refresh_unchanged(leader.client, "station_status")
+		await leader._lead_once()
+		second = {feed: await follower._read_feed(feed) for feed in FEEDS}
+		return first, second
+
+	first, second = asyncio.run(run())
+
+	assert leader.stats["published"] == 2
+	assert leader.stats["states_published"] == 3
+	assert follower.stats["applied"] == 2
+	# The follower kept its indexes and only took over the new freshness
+	assert second["station_status"] is first["station_status"]
+	assert second["station_information"] is first["station_information"]
+	assert follower.client.feed_state["station_status"]["last_updated"] == \
+		leader.client.feed_state["station_status"]["last_updated"]
+
+
+def test_new_index_is_published_and_applied(tmp_path):
+	leader = SharedFeeds(_loaded_client(), None, tmp_path)
+	follower = SharedFeeds(GBFSClient(), None, tmp_path)
+
+	async def run():
+		await leader._lead_once()
+		first = await follower._read_feed("station_status")
+		now = time.time()
+		leader.client.apply_feed("station_status", {
+			"stations": [{"station_id": "a", "num_bikes_available": 4}],
+			"last_updated": int(now) + 5,
+			"ttl": 10,
+			"fetched_at": now,
+			"fresh_until": now + 10,
+		}, source="upstream")
+		await leader._lead_once()
+		return first, await follower._read_feed("station_status")
+
+	first, second = asyncio.run(run())
+
+	assert second is not first
+	assert second.by_id["a"]["num_bikes_available"] == 4
+	assert follower.stats["applied"] == 2
+
+
+def test_unexpected_errors_do_not_stop_the_loop(tmp_path, monkeypatch):
+	monkeypatch.setattr(shared_state, "SHARED_POLL_INTERVAL_SECONDS", 0)
+	leader = SharedFeeds(GBFSClient(), None, tmp_path)
+	leader.role = LEADER
+	calls = []
+
+	async def lead_once():
+		calls.append(1)
+		raise KeyError("station_id")
+
+	leader._lead_once = lead_once
+
+	async def run():
+		task = asyncio.create_task(leader._run())
+		await asyncio.sleep(0.05)
+		task.cancel()
+
+	asyncio.run(run())
+
+	assert len(calls) > 1
+	assert leader.stats["last_error"] == "KeyError: 'station_id'"
+
+
+def test_tracked_files_of_exited_workers_are_dropped(tmp_path):
+	exited = subprocess.Popen([sys.executable, "-c", "pass"])
+	exited.wait()
+	leader = SharedFeeds(GBFSClient(), None, tmp_path)
+	live = tmp_path / f"{leader.client.system}.tracked.{os.getpid()}.json"
+	dead = tmp_path / f"{leader.client.system}.tracked.{exited.pid}.json"
+	live.write_text(json.dumps(["a"]))
+	dead.write_text(json.dumps(["b"]))
+
+	assert leader._read_tracked() == {"a"}
+	assert live.exists()
+	assert not dead.exists()
@@ -0,0 +1,93 @@
+"""
+Behaviour tests for single-flight request coalescing
+
+Run from backend/:
+
+	python -m pytest tests
+"""
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+	flight = SingleFlight()
+	calls = []
+
+	async def fetch():
+		calls.append(1)
+		await asyncio.sleep(0.01)
+		return "feed"
+
+	async def run():
+		return await asyncio.gather(*(flight.do("feed", fetch) for _ in range(5)))
+
+	assert asyncio.run(run()) == ["feed"] * 5
+	assert calls == [1]
+	assert flight.stats["feed"]["callers_served"] == 5
+	assert flight.stats["feed"]["max_waiters"] == 5
+
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+	flight = SingleFlight()
+	release = None
+
+	async def fetch():
+		await release.wait()
+		return "feed"
+
+	async def run():
+		nonlocal release
+		release = asyncio.Event()
+		first = asyncio.create_task(flight.do("feed", fetch))
+		await asyncio.sleep(0)
+		waiter = asyncio.create_task(flight.do("feed", fetch))
+		await asyncio.sleep(0)
+		first.cancel()
+		await asyncio.sleep(0)
+		release.set()
+		return first, await waiter
+
+	first, result = asyncio.run(run())
+
+	assert first.cancelled()
+	assert result == "feed"
+	assert flight.stats["feed"]["callers_served"] == 2
+
+
+def test_call_finishes_after_every_caller_timed_out():
+	flight = SingleFlight()
+	finished = []
+
+	async def fetch():
+		await asyncio.sleep(0.02)
+		finished.append(1)
+		return "feed"
+
+	async def run():
+		with pytest.raises(asyncio.TimeoutError):
+			await asyncio.wait_for(flight.do("feed", fetch), 0.001)
+		await asyncio.sleep(0.05)
+
+	asyncio.run(run())
+
+	assert finished == [1]
+	assert flight.stats["feed"]["fetches"] == 1
+
+
+def test_errors_reach_every_caller():
+	flight = SingleFlight()
+
+	async def fetch():
+		await asyncio.sleep(0)
+		raise ValueError("bad feed")
+
+	async def run():
+		return await asyncio.gather(*(flight.do("feed", fetch) for _ in range(3)), return_exceptions=True)
+
+	results = asyncio.run(run())
+
+	assert [type(result) for result in results] == [ValueError] * 3
+	assert "feed" not in flight._inflight
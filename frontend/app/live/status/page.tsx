@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import dynamic from 'next/dynamic';
 
 const StationMap = dynamic(() => import('@/components/StationMap'), {
@@ -35,10 +35,32 @@ interface StatusResponse {
 		overall_percent_full: number;
 	};
 	last_updated: number;
+	version?: number;
+	// Present on delta responses (?since=): only changed stations are listed
+	since?: number;
+	removed?: string[];
+}
+
+// Apply a ?since= delta to the previous full payload
+function mergeStatus(previous: StatusResponse | null, next: StatusResponse): StatusResponse {
+	if (next.since === undefined || !previous) {
+		return next;
+	}
+	const removed = new Set(next.removed ?? []);
+	const changed = new Map(next.stations.map((station): [string, StationData] => [station.station_id, station]));
+	const stations = previous.stations
+		.filter((station) => !removed.has(station.station_id))
+		.map((station) => changed.get(station.station_id) ?? station);
+	const known = new Set(stations.map((station) => station.station_id));
+	next.stations.forEach((station) => {
+		if (!known.has(station.station_id)) stations.push(station);
+	});
+	return { ...next, stations, since: undefined, removed: undefined };
 }
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
-const REFRESH_INTERVAL = 3 * 60 * 1000; // 3 minutes
+const STREAM_URL = `${API_URL}/api/stations/stream`;
+const REFRESH_INTERVAL = 3 * 60 * 1000; // 3 minutes (polling fallback)
 
 export default function LiveStatusPage() {
 	const [data, setData] = useState<StatusResponse | null>(null);
@@ -46,19 +68,24 @@ export default function LiveStatusPage() {
 	const [error, setError] = useState<string | null>(null);
 	const [lastFetch, setLastFetch] = useState<Date | null>(null);
 	const [secondsUntilRefresh, setSecondsUntilRefresh] = useState(180);
+	const [liveMode, setLiveMode] = useState<'push' | 'poll'>('poll');
+	// Snapshot version of the data shown, sent as ?since= to poll for changes only
+	const versionRef = useRef<number | null>(null);
 
 	const fetchData = async () => {
 		try {
 			setLoading(true);
 			setError(null);
-			const response = await fetch(`${API_URL}/api/stations/status`);
+			const since = versionRef.current !== null ? `?since=${versionRef.current}` : '';
+			const response = await fetch(`${API_URL}/api/stations/status${since}`);
 
 			if (!response.ok) {
 				throw new Error(`HTTP ${response.status}: ${response.statusText}`);
 			}
 
-			const json = await response.json();
-			setData(json);
+			const json: StatusResponse = await response.json();
+			versionRef.current = json.version ?? null;
+			setData((previous) => mergeStatus(previous, json));
 			setLastFetch(new Date());
 			setSecondsUntilRefresh(180);
 		} catch (err) {
@@ -69,15 +96,53 @@ export default function LiveStatusPage() {
 		}
 	};
 
-	// Initial fetch and auto-refresh
+	// Live updates: server push (SSE) when available, polling otherwise
 	useEffect(() => {
-		fetchData();
+		let refreshTimer: ReturnType<typeof setInterval> | null = null;
 
-		const refreshTimer = setInterval(() => {
+		const startPolling = () => {
+			if (refreshTimer) return;
+			setLiveMode('poll');
 			fetchData();
-		}, REFRESH_INTERVAL);
+			refreshTimer = setInterval(() => {
+				fetchData();
+			}, REFRESH_INTERVAL);
+		};
+
+		if (typeof EventSource === 'undefined') {
+			startPolling();
+			return () => {
+				if (refreshTimer) clearInterval(refreshTimer);
+			};
+		}
+
+		const source = new EventSource(STREAM_URL);
+		let opened = false;
+
+		source.addEventListener('status', (event) => {
+			opened = true;
+			const json: StatusResponse = JSON.parse((event as MessageEvent).data);
+			versionRef.current = json.version ?? null;
+			setData(json);
+			setLastFetch(new Date());
+			setError(null);
+			setLoading(false);
+			setLiveMode('push');
+		});
+
+		source.onerror = () => {
+			// EventSource reconnects by itself; fall back to polling only if push never
+			// worked or the server refused the reconnect
+			if (!opened || source.readyState === EventSource.CLOSED) {
+				source.close();
+				startPolling();
+			}
+		};
 
-		return () => clearInterval(refreshTimer);
+		return () => {
+			source.close();
+			if (refreshTimer) clearInterval(refreshTimer);
+		};
 	}, []);
 
 	// Countdown timer
@@ -191,7 +256,11 @@ export default function LiveStatusPage() {
 							Last updated: {lastFetch ? lastFetch.toLocaleTimeString() : 'N/A'}
 						</div>
 						<div>
-							Auto-refresh in: {Math.floor(secondsUntilRefresh / 60)}:{String(secondsUntilRefresh % 60).padStart(2, '0')}
+							{liveMode === 'push' ? (
+								'Live updates on'
+							) : (
+								<>Auto-refresh in: {Math.floor(secondsUntilRefresh / 60)}:{String(secondsUntilRefresh % 60).padStart(2, '0')}</>
+							)}
 						</div>
 					</div>
 				</div>
@@ -200,8 +269,10 @@ export default function LiveStatusPage() {
 			{/* Info Banner */}
 			<div className="bg-blue-50 border-l-4 border-primary rounded-r-lg p-4 mb-8">
 				<p className="text-sm text-gray-700">
-					<strong>Data Source:</strong> Citi Bike General Bikeshare Feed Specification (GBFS) API.
-					Data updates automatically every 3 minutes.
+					<strong>Data Source:</strong> Citi Bike General Bikeshare Feed Specification (GBFS) API.{' '}
+					{liveMode === 'push'
+						? 'Data updates automatically as soon as stations change.'
+						: 'Data updates automatically every 3 minutes.'}
 				</p>
 			</div>
 
@@ -7,57 +7,33 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.utils
+import argparse
 import json
+import sys
 from pathlib import Path
+from trip_features import load_trip_features
+from trip_store import changed_months, mark_computed
 
-# Load the filtered data
-data_path = Path(__file__).parent.parent / 'data' / 'columbia_filtered_citibike.csv'
-df = pd.read_csv(data_path, parse_dates=['started_at', 'ended_at'])
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--force', action='store_true', help='export even if no month of trips changed since the last export')
+args = parser.parse_args()
 
-print(f"Loaded {len(df):,} trips")
+# Only re-export when the ingest changed some month since the last export
+revision, months = changed_months('export_analysis')
+if not months and not args.force:
+	print("No trips changed since the last export; nothing to do (--force exports anyway)")
+	sys.exit(0)
+print(f"Months changed since the last export: {', '.join(months) or 'none'}")
+
+# Load the filtered data, with duration and temporal features (see trip_features.py)
+df = load_trip_features()
 
-# Calculate trip duration
-df['trip_duration_minutes'] = (df['ended_at'] - df['started_at']).dt.total_seconds() / 60
+print(f"Loaded {len(df):,} trips")
 
 # Filter out trips with no end station and negative durations
 df = df[~df["end_station_id"].isna()]
 df = df[df['trip_duration_minutes'] > 0]
 
-# Extract temporal features
-df['hour_of_day'] = df['started_at'].dt.hour
-df['day_of_week'] = df['started_at'].dt.dayofweek
-df['day_name'] = df['started_at'].dt.day_name()
-df['month'] = df['started_at'].dt.month
-df['month_name'] = df['started_at'].dt.strftime('%Y-%m')
-df['date'] = df['started_at'].dt.date
-df['is_weekend'] = df['day_of_week'] >= 5
-
-# Season mapping
-def get_season(month):
-	if month in [12, 1, 2]:
-		return 'Winter'
-	elif month in [3, 4, 5]:
-		return 'Spring'
-	elif month in [6, 7, 8]:
-		return 'Summer'
-	else:
-		return 'Fall'
-
-df['season'] = df['month'].apply(get_season)
-
-# Time period categorization
-def get_time_period(hour):
-	if 6 <= hour < 10:
-		return 'Morning Rush'
-	elif 10 <= hour < 16:
-		return 'Midday'
-	elif 16 <= hour < 20:
-		return 'Evening Rush'
-	else:
-		return 'Night'
-
-df['time_period'] = df['hour_of_day'].apply(get_time_period)
-
 print(f"Processing {len(df):,} trips after filtering")
 
 # Create output directory
@@ -90,7 +66,7 @@ print(f"✓ Saved hourly_trips.json")
 
 # 2. Day/Hour heatmap
 print("Generating day/hour heatmap...")
-day_hour_pivot = df.groupby(['day_name', 'hour_of_day']).size().reset_index(name='trip_count')
+day_hour_pivot = df.groupby(['day_name', 'hour_of_day'], observed=True).size().reset_index(name='trip_count')
 
 # Order days properly
 day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -138,8 +114,9 @@ df['distance_km'] = haversine_distance(
 	df['end_lat'].values, df['end_lng'].values
 )
 
-max_duration_minutes = df['trip_duration_minutes'].max()
-max_distance_km = df['distance_km'].max()
+# float(): durations and coordinates are float32, which json.dump does not take
+max_duration_minutes = float(df['trip_duration_minutes'].max())
+max_distance_km = float(df['distance_km'].max())
 
 summary_stats = {
 	'total_trips': int(len(df)),
@@ -160,10 +137,10 @@ summary_stats = {
 		'electric_percentage': round((df['rideable_type'] == 'electric_bike').sum() / len(df) * 100, 1)
 	},
 	'trip_duration': {
-		'median_minutes': round(df['trip_duration_minutes'].median(), 1),
-		'q25_minutes': round(df['trip_duration_minutes'].quantile(0.25), 1),
-		'q75_minutes': round(df['trip_duration_minutes'].quantile(0.75), 1),
-		'mean_minutes': round(df['trip_duration_minutes'].mean(), 1),
+		'median_minutes': round(float(df['trip_duration_minutes'].median()), 1),
+		'q25_minutes': round(float(df['trip_duration_minutes'].quantile(0.25)), 1),
+		'q75_minutes': round(float(df['trip_duration_minutes'].quantile(0.75)), 1),
+		'mean_minutes': round(float(df['trip_duration_minutes'].mean()), 1),
 		'max_minutes': round(max_duration_minutes, 1),
 		'max_hours': round(max_duration_minutes / 60, 1)
 	},
@@ -182,7 +159,7 @@ print(f"✓ Saved summary_stats.json")
 
 # 4. Member vs Casual hourly patterns
 print("Generating member vs casual hourly patterns...")
-hourly_by_type = df.groupby(['hour_of_day', 'member_casual']).size().reset_index(name='trip_count')
+hourly_by_type = df.groupby(['hour_of_day', 'member_casual'], observed=True).size().reset_index(name='trip_count')
 
 fig_member_casual = px.line(
 	hourly_by_type,
@@ -207,7 +184,7 @@ print(f"✓ Saved member_casual_hourly.json")
 
 # 5. Weekday vs Weekend by User Type
 print("Generating weekday vs weekend by user type...")
-day_type_user = df.groupby(['is_weekend', 'member_casual']).size().reset_index(name='trip_count')
+day_type_user = df.groupby(['is_weekend', 'member_casual'], observed=True).size().reset_index(name='trip_count')
 day_type_user['day_type'] = day_type_user['is_weekend'].map({False: 'Weekday', True: 'Weekend'})
 
 fig_day_user = px.bar(
@@ -270,7 +247,7 @@ print(f"✓ Saved time_period.json")
 
 # 8. Monthly Time Series
 print("Generating monthly time series...")
-monthly_trips = df.groupby('month_name').size().reset_index(name='trip_count')
+monthly_trips = df.groupby('month_name', observed=True).size().reset_index(name='trip_count')
 monthly_trips = monthly_trips.sort_values('month_name')
 
 fig_monthly = px.line(
@@ -303,8 +280,8 @@ print("Generating seasonal comparison...")
 from plotly.subplots import make_subplots
 
 season_order = ['Winter', 'Spring', 'Summer', 'Fall']
-seasonal_trips = df.groupby('season').size().reindex(season_order)
-season_months = df.groupby('season')['month_name'].nunique().reindex(season_order)
+seasonal_trips = df.groupby('season', observed=True).size().reindex(season_order)
+season_months = df.groupby('season', observed=True)['month_name'].nunique().reindex(season_order)
 avg_trips_per_month = seasonal_trips / season_months
 
 fig_seasonal = make_subplots(
@@ -333,7 +310,7 @@ print(f"✓ Saved seasonal_comparison.json")
 
 # 10. Seasonal Hourly Patterns
 print("Generating seasonal hourly patterns...")
-season_hour = df.groupby(['season', 'hour_of_day']).size().reset_index(name='trip_count')
+season_hour = df.groupby(['season', 'hour_of_day'], observed=True).size().reset_index(name='trip_count')
 
 fig_season_hour = px.line(
 	season_hour,
@@ -440,3 +417,5 @@ print(f"   - seasonal_hourly.json")
 print(f"   - trip_duration_histogram.json")
 print(f"   - user_type_distribution.json")
 print(f"   - bike_type_distribution.json")
+
+mark_computed('export_analysis', revision)
@@ -9,7 +9,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import plotly.utils
+import argparse
 import json
+import sys
 from pathlib import Path
 from datetime import datetime, timedelta
 from sklearn.linear_model import LinearRegression
@@ -18,12 +20,24 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.preprocessing import LabelEncoder
 import xgboost as xgb
+from trip_features import temporal_features
+from trip_store import changed_months, load_trips, mark_computed
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--force', action='store_true', help='export even if no month of trips changed since the last export, e.g. after editing the academic calendar')
+args = parser.parse_args()
+
+# Only re-export when the ingest changed some month since the last export
+revision, months = changed_months('export_forecasting')
+if not months and not args.force:
+	print("No trips changed since the last export; nothing to do (--force exports anyway)")
+	sys.exit(0)
+print(f"Months changed since the last export: {', '.join(months) or 'none'}")
 
 print("Loading data...")
 
-# Load the filtered data
-data_path = Path(__file__).parent.parent / 'data' / 'columbia_filtered_citibike.csv'
-df = pd.read_csv(data_path, parse_dates=['started_at', 'ended_at'])
+# Load the filtered data (only the columns the hourly aggregation needs)
+df = load_trips(columns=['started_at', 'ended_at', 'start_station_id', 'end_station_id'])
 
 print(f"Loaded {len(df):,} trips")
 
@@ -68,16 +82,18 @@ df['end_hour'] = df['ended_at'].dt.floor('H')
 
 # Calculate departures
 departures = df[df['start_station_id'].isin(columbia_stations)].groupby(
-	['start_station_id', 'start_hour']
+	['start_station_id', 'start_hour'], observed=True
 ).size().reset_index(name='departures')
 departures.columns = ['station_id', 'hour', 'departures']
+departures['station_id'] = departures['station_id'].astype(str)
 
 # Calculate arrivals
 arrivals = df[
 	(df['end_station_id'].isin(columbia_stations)) &
 	(df['end_station_id'].notna())
-].groupby(['end_station_id', 'end_hour']).size().reset_index(name='arrivals')
+].groupby(['end_station_id', 'end_hour'], observed=True).size().reset_index(name='arrivals')
 arrivals.columns = ['station_id', 'hour', 'arrivals']
+arrivals['station_id'] = arrivals['station_id'].astype(str)
 
 # Merge
 station_hours = departures.merge(arrivals, on=['station_id', 'hour'], how='outer')
@@ -104,12 +120,13 @@ print(f"Created station-hour dataset: {len(station_hours):,} rows")
 
 print("Engineering features...")
 
-# Extract date components
-station_hours['date'] = station_hours['hour'].dt.date
-station_hours['hour_of_day'] = station_hours['hour'].dt.hour
-station_hours['day_of_week'] = station_hours['hour'].dt.dayofweek
-station_hours['month'] = station_hours['hour'].dt.month
-station_hours['is_weekend'] = (station_hours['day_of_week'] >= 5).astype(int)
+# Extract date components (int8, shared with the analysis export)
+features = temporal_features(station_hours['hour'])
+station_hours['date'] = features['date']
+station_hours['hour_of_day'] = features['hour_of_day']
+station_hours['day_of_week'] = features['day_of_week']
+station_hours['month'] = features['month']
+station_hours['is_weekend'] = features['is_weekend'].astype(int)
 
 # Cyclical encoding
 station_hours['hour_sin'] = np.sin(2 * np.pi * station_hours['hour_of_day'] / 24)
@@ -129,8 +146,6 @@ station_hours['is_rush_hour'] = (
 ).astype(int)
 
 # Academic calendar features
-station_hours['date'] = pd.to_datetime(station_hours['date'])
-
 def is_in_semester(date):
 	for start, end in semester_periods:
 		if start <= date <= end:
@@ -332,6 +347,53 @@ r2_xgb = r2_score(y_test, y_pred_xgb)
 
 print(f"XGBoost - MAE: {mae_xgb:.3f}, R²: {r2_xgb:.3f}")
 
+# Save the XGBoost model for the backend /api/forecast endpoint
+print("\nSaving forecast model artifact...")
+model_dir = Path(__file__).parent.parent / 'backend' / 'models'
+model_dir.mkdir(parents=True, exist_ok=True)
+xgb_model.get_booster().save_model(str(model_dir / 'departures_xgb.ubj'))
+
+# Mean departures/arrivals per station, weekend flag and hour of day: the
+# backend fills lag features with these where it has no live counts
+hourly_profile = station_hours.groupby(
+	['station_id', 'is_weekend', 'hour_of_day']
+)[['departures', 'arrivals']].mean()
+
+def profile_array(column):
+	return [
+		[
+			[float(hourly_profile[column].get((station, weekend, hour), 0.0)) for hour in range(24)]
+			for weekend in (0, 1)
+		]
+		for station in le.classes_
+	]
+
+def iso_dates(dates):
+	return sorted({pd.Timestamp(d).strftime('%Y-%m-%d') for d in dates})
+
+model_metadata = {
+	'trained_at': datetime.now().isoformat(timespec='seconds'),
+	'train_end': str(train_end),
+	'target': 'departures',
+	'feature_cols': feature_cols,
+	'stations': [str(s) for s in le.classes_],
+	'profile_departures': profile_array('departures'),
+	'profile_arrivals': profile_array('arrivals'),
+	'calendar': {
+		'semester_periods': [[s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')] for s, e in semester_periods],
+		'semester_starts': iso_dates(semester_starts),
+		'holidays': iso_dates(all_holidays),
+		'finals': iso_dates(finals_dates),
+		'study_days': iso_dates(study_days),
+		'breaks': iso_dates(breaks),
+	},
+	'metrics': {'mae': float(mae_xgb), 'rmse': float(rmse_xgb), 'r2': float(r2_xgb)},
+}
+with open(model_dir / 'departures_xgb.meta.json', 'w') as f:
+	json.dump(model_metadata, f, indent=2)
+
+print(f"✓ Saved departures_xgb.ubj and departures_xgb.meta.json to {model_dir}")
+
 # Create output directory
 output_dir = Path(__file__).parent.parent / 'frontend' / 'public' / 'data' / 'forecasting'
 output_dir.mkdir(parents=True, exist_ok=True)
@@ -652,3 +714,5 @@ print(f"   - pipeline_diagram.json")
 print(f"   - data_split.json")
 print(f"   - feature_breakdown.json")
 print(f"   - error_distribution.json")
+
+mark_computed('export_forecasting', revision)
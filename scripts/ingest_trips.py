@@ -0,0 +1,395 @@
+"""
+Filter the monthly Citi Bike trip CSVs down to the Columbia stations.
+
+Scripted, bounded-memory version of notebooks/load_and_filter_citibike_data.ipynb,
+spread over a process pool:
+
+1. Each trip file is one task. A worker streams it in chunks of --chunk-rows
+   rows, reading only the trip columns, and filters every chunk on
+   start_station_id/end_station_id before reading the next. It then sorts
+   the file's kept trips and writes them to a partition file.
+2. The sorted partitions are merged by (started_at, ended_at) with a k-way
+   merge that holds one row per partition, and streamed into the
+   month-partitioned Parquet trip store (see trip_store.py), plus a CSV
+   copy with --csv.
+
+Peak memory per worker depends on the chunk size and on how many trips one
+file keeps, not on the size of the dataset. A report shows rows/s and MB/s
+per file and overall, to see how the ingest scales with --workers.
+
+The ingest is incremental. The store's manifest records each source file's
+size, mtime and blake2b hash. A re-run only processes the source months
+(e.g. 202401-citibike-tripdata_1.csv and _2.csv are source month 2024-01)
+that have a new or changed file, and replaces just their Parquet files. A
+file whose mtime changed but whose content did not is not processed again.
+Raw files deleted after an ingest keep their trips in the store. The whole
+store is rebuilt with --full, with --csv, or when --stations changes.
+
+Usage (from the repository root):
+
+	python scripts/ingest_trips.py
+	python scripts/ingest_trips.py --full
+	python scripts/ingest_trips.py --workers 4 --chunk-rows 100000 --report ingest_report.json
+	python scripts/ingest_trips.py --csv data/columbia_filtered_citibike.csv
+	python scripts/ingest_trips.py --stations 7783.18 7741.04 --store data/two_stations
+"""
+
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from trip_store import (
+	DATA_DIR, MANIFEST_VERSION, TRIP_COLUMNS, TRIP_DTYPES, TRIP_STORE_DIR, TripStoreWriter,
+	read_manifest, updated_manifest, write_manifest,
+)
+
+TRIP_FILE_PATTERN = '*-citibike-tripdata*.csv'
+SOURCE_MONTH = re.compile(r'(\d{4})(\d{2})-citibike-tripdata')
+
+# Columbia station IDs
+COLUMBIA_STATIONS = [
+	'7783.18',  # Broadway & W 122 St
+	'7741.04',  # Morningside Dr & Amsterdam Ave
+	'7745.07',  # W 120 St & Claremont Ave
+	'7727.07',  # Amsterdam Ave & W 119 St
+	'7713.11',  # W 116 St & Broadway
+	'7692.11',  # W 116 St & Amsterdam Ave
+	'7713.01'   # W 113 St & Broadway
+]
+
+DEFAULT_CHUNK_ROWS = 250_000
+
+
+def find_trip_files(data_dir):
+	"""Monthly trip CSVs under data_dir, in file-name (chronological) order"""
+	return sorted(data_dir.glob(f'**/{TRIP_FILE_PATTERN}'), key=lambda path: path.name)
+
+
+def source_of(path):
+	"""Source month of a trip file, e.g. 2024-01 for 202401-citibike-tripdata_1.csv"""
+	match = SOURCE_MONTH.search(path.name)
+	return f'{match[1]}-{match[2]}' if match else path.stem
+
+
+def file_digest(path):
+	"""blake2b of a file's contents, read in 1 MB blocks"""
+	digest = hashlib.blake2b(digest_size=16)
+	with open(path, 'rb') as f:
+		for block in iter(lambda: f.read(1024 ** 2), b''):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+def filter_file(path, partition_path, stations, chunk_rows, digest=None):
+	"""Filter one CSV chunk by chunk into a sorted partition file; returns its stats
+
+	Runs in a worker process. The file is hashed first unless its digest is
+	already known, which also brings it into the page cache for pandas.
+	"""
+	started = time.perf_counter()
+	digest = digest or file_digest(path)
+	rows_read = 0
+	kept = []
+	reader = pd.read_csv(path, usecols=TRIP_COLUMNS, dtype=TRIP_DTYPES, chunksize=chunk_rows)
+	with reader:
+		for chunk in reader:
+			rows_read += len(chunk)
+			mask = chunk['start_station_id'].isin(stations) | chunk['end_station_id'].isin(stations)
+			if mask.any():
+				kept.append(chunk[mask])
+
+	trips = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=TRIP_COLUMNS)
+	del kept
+	# Only kept rows are parsed as dates
+	sort_keys = pd.DataFrame({
+		column: pd.to_datetime(trips[column], format='ISO8601') for column in ('started_at', 'ended_at')
+	})
+	order = sort_keys.sort_values(by=['started_at', 'ended_at'], kind='stable').index
+	# The original timestamp text is written back unchanged
+	trips.loc[order].to_csv(partition_path, index=False)
+
+	seconds = time.perf_counter() - started
+	megabytes = path.stat().st_size / 1024 ** 2
+	return {
+		'file': path.name,
+		'blake2b': digest,
+		'rows_read': rows_read,
+		'rows_kept': len(trips),
+		'mb': round(megabytes, 1),
+		'seconds': round(seconds, 2),
+		'rows_per_s': round(rows_read / seconds),
+		'mb_per_s': round(megabytes / seconds, 1),
+		'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF),
+	}
+
+
+def peak_rss_mb(who):
+	# ru_maxrss is in kilobytes on Linux (bytes on macOS)
+	peak = resource.getrusage(who).ru_maxrss
+	return round(peak / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _partition_rows(path, source):
+	"""(sort key, row + [source]) for each row of a sorted partition, read lazily"""
+	with open(path, newline='') as f:
+		reader = csv.reader(f)
+		next(reader)  # header
+		started_at, ended_at = TRIP_COLUMNS.index('started_at'), TRIP_COLUMNS.index('ended_at')
+		for row in reader:
+			yield (datetime.fromisoformat(row[started_at]), datetime.fromisoformat(row[ended_at])), row + [source]
+
+
+def merge_partitions(partitions, store, csv_path=None, batch_rows=DEFAULT_CHUNK_ROWS):
+	"""k-way merge of sorted (path, source) partitions into store (and csv_path); returns rows written
+
+	Ties keep partition order, then row order, so the result matches a
+	stable sort of all files concatenated in order. Rows go to the store in
+	batches of batch_rows.
+	"""
+	rows = 0
+	batch = []
+	csv_file = open(csv_path, 'w', newline='') if csv_path is not None else None
+	try:
+		if csv_file is not None:
+			writer = csv.writer(csv_file, lineterminator='\n')
+			writer.writerow(TRIP_COLUMNS)
+		merged = heapq.merge(*(_partition_rows(path, source) for path, source in partitions), key=lambda item: item[0])
+		for _, row in merged:
+			batch.append(row)
+			if csv_file is not None:
+				writer.writerow(row[:-1])
+			if len(batch) >= batch_rows:
+				store.write(_batch_frame(batch))
+				rows += len(batch)
+				batch = []
+		if batch:
+			store.write(_batch_frame(batch))
+			rows += len(batch)
+	finally:
+		if csv_file is not None:
+			csv_file.close()
+	return rows
+
+
+def _batch_frame(rows):
+	# Empty CSV fields (e.g. no end station) become missing values
+	return pd.DataFrame(rows, columns=TRIP_COLUMNS + ['source']).replace('', None)
+
+
+def _file_entry(path):
+	stat = path.stat()
+	return {'source': source_of(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def plan_ingest(files, manifest, pool):
+	"""(sources to process, manifest entry of every file) for an incremental ingest
+
+	A file is unchanged if its size and mtime match the manifest, or if its
+	content hash does. Every source with a new or changed file is processed.
+	"""
+	known = {
+		name: entry
+		for source in (manifest or {}).get('sources', {}).values()
+		for name, entry in source['files'].items()
+	}
+	entries = {}
+	to_hash = []
+	for path in files:
+		current = _file_entry(path)
+		entry = known.get(path.name)
+		if entry is not None and (entry['size'], entry['mtime_ns']) == (current['size'], current['mtime_ns']):
+			entries[path.name] = entry
+		elif entry is not None and entry['size'] == current['size']:
+			to_hash.append(path)
+			entries[path.name] = {**entry, **current}
+		else:
+			entries[path.name] = current
+
+	# New files and size changes are hashed while they are filtered
+	changed = {path.name for path in files if 'blake2b' not in entries[path.name]}
+	for path, digest in zip(to_hash, pool.map(file_digest, to_hash)):
+		if digest != known[path.name]['blake2b']:
+			changed.add(path.name)
+			entries[path.name]['blake2b'] = digest
+	return sorted({entries[name]['source'] for name in changed}), entries
+
+
+def ingest(files, store_dir, stations, chunk_rows, workers, csv_path=None, full=False):
+	"""Filter new or changed files in a process pool and merge them into the store; returns the report"""
+	stations = set(stations)
+	started = time.perf_counter()
+	store_dir.parent.mkdir(parents=True, exist_ok=True)
+	previous = read_manifest(store_dir)
+	full = (
+		full
+		# A CSV copy has to hold every month
+		or csv_path is not None
+		or previous is None
+		or previous.get('version') != MANIFEST_VERSION
+		or previous.get('stations') != sorted(stations)
+	)
+	per_file = {}
+
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		if full:
+			entries = {path.name: _file_entry(path) for path in files}
+			sources = sorted({entry['source'] for entry in entries.values()})
+		else:
+			sources, entries = plan_ingest(files, previous, pool)
+			# Re-processing a source month needs all of its files
+			for source in sources:
+				missing = set(previous['sources'].get(source, {}).get('files', {})) - set(entries)
+				if missing:
+					raise FileNotFoundError(
+						f"Source month {source} changed but some of its files are missing: "
+						f"{', '.join(sorted(missing))}. Restore them or rebuild the store with --full"
+					)
+		todo = [path for path in files if entries[path.name]['source'] in sources]
+
+		# Partitions sit next to the store (same disk) and are deleted afterwards
+		with tempfile.TemporaryDirectory(prefix='ingest-', dir=store_dir.parent) as partition_dir:
+			partitions = [Path(partition_dir) / f'{i:04d}.csv' for i in range(len(todo))]
+			futures = {
+				pool.submit(filter_file, path, partition, stations, chunk_rows, entries[path.name].get('blake2b')): path
+				for path, partition in zip(todo, partitions)
+			}
+			for future in as_completed(futures):
+				stats = future.result()
+				per_file[futures[future]] = stats
+				print(f"{len(per_file):>4}/{len(todo)} {format_file_stats(stats)}")
+			filter_seconds = time.perf_counter() - started
+
+			merge_started = time.perf_counter()
+			if sources:
+				# Written next to the outputs and renamed at the end, so a failed run keeps the old ones
+				tmp_csv_path = csv_path.with_name(csv_path.name + '.tmp') if csv_path is not None else None
+				with TripStoreWriter(store_dir, update=not full) as store:
+					for source in sources:
+						store.replace(source)
+					rows_kept = merge_partitions(
+						[(partition, entries[path.name]['source']) for path, partition in zip(todo, partitions)],
+						store, tmp_csv_path, chunk_rows,
+					)
+					for path, stats in per_file.items():
+						entries[path.name].update(
+							{key: stats[key] for key in ('blake2b', 'rows_read', 'rows_kept')}
+						)
+					store.manifest = manifest = updated_manifest(previous, {
+						source: {
+							'files': {name: entry for name, entry in entries.items() if entry['source'] == source},
+							'months': store.sources.get(source, {}),
+						}
+						for source in sources
+					}, sorted(stations), full)
+				if tmp_csv_path is not None:
+					tmp_csv_path.replace(csv_path)
+			else:
+				rows_kept = 0
+				manifest = previous
+				# Files that were only touched: record their new mtimes
+				for source in manifest['sources'].values():
+					for name in source['files']:
+						if name in entries:
+							source['files'][name] = entries[name]
+				write_manifest(manifest, store_dir)
+			merge_seconds = time.perf_counter() - merge_started
+
+	file_stats = [per_file[path] for path in todo]
+	seconds = time.perf_counter() - started
+	rows_read = sum(stats['rows_read'] for stats in file_stats)
+	megabytes = sum(stats['mb'] for stats in file_stats)
+	busy_seconds = sum(stats['seconds'] for stats in file_stats)
+	return {
+		'workers': workers,
+		'chunk_rows': chunk_rows,
+		'full': full,
+		'sources': sources,
+		'files_skipped': len(files) - len(todo),
+		'changed_months': [
+			month for month, state in manifest['months'].items() if state['revision'] == manifest['revision']
+		] if sources else [],
+		'files': file_stats,
+		'rows_read': rows_read,
+		'rows_kept': rows_kept,
+		'store_rows': sum(state['rows'] for state in manifest['months'].values()),
+		'mb': round(megabytes, 1),
+		'seconds': round(seconds, 2),
+		'filter_seconds': round(filter_seconds, 2),
+		'merge_seconds': round(merge_seconds, 2),
+		'rows_per_s': round(rows_read / seconds),
+		'mb_per_s': round(megabytes / seconds, 1),
+		# Sum of per-file times over filter wall time: files filtered at once on average.
+		# Compare rows_per_s across --workers runs for the actual speedup.
+		'parallelism': round(busy_seconds / filter_seconds, 2) if filter_seconds else None,
+		'peak_rss_mb': {
+			'main': peak_rss_mb(resource.RUSAGE_SELF),
+			'largest_worker': peak_rss_mb(resource.RUSAGE_CHILDREN),
+		},
+	}
+
+
+def format_file_stats(stats):
+	return (
+		f"{stats['file']:<36} {stats['rows_read']:>11,} rows {stats['mb']:>8.1f} MB {stats['seconds']:>7.2f}s "
+		f"{stats['rows_per_s']:>11,} rows/s {stats['mb_per_s']:>7.1f} MB/s  kept {stats['rows_kept']:,}"
+	)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Filter the monthly Citi Bike trip CSVs to a set of stations')
+	parser.add_argument('--data-dir', type=Path, default=DATA_DIR, help='directory searched (recursively) for trip CSVs')
+	parser.add_argument('--store', type=Path, default=TRIP_STORE_DIR, help='Parquet trip store to (re)build')
+	parser.add_argument('--csv', type=Path, help='also write the filtered trips to this CSV (implies --full)')
+	parser.add_argument('--full', action='store_true', help='rebuild the whole store instead of only new or changed months')
+	parser.add_argument('--stations', nargs='+', default=COLUMBIA_STATIONS, help='station IDs (short_names) to keep')
+	parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='rows read per chunk (bounds memory)')
+	parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes, each holding one chunk at a time (default: one per core)')
+	parser.add_argument('--report', type=Path, help='also write the timing report as JSON')
+	args = parser.parse_args()
+	if args.workers < 1:
+		parser.error('--workers must be at least 1')
+
+	files = [
+		path for path in find_trip_files(args.data_dir)
+		if args.csv is None or path.resolve() != args.csv.resolve()
+	]
+	if not files:
+		parser.error(f"no {TRIP_FILE_PATTERN} files found under {args.data_dir}")
+	print(f"Found {len(files)} CSV files, filtering with {args.workers} worker(s)")
+
+	try:
+		report = ingest(files, args.store, args.stations, args.chunk_rows, args.workers, args.csv, args.full)
+	except FileNotFoundError as e:
+		parser.error(str(e))
+	if not report['sources']:
+		print(f"No new or changed trip files; {args.store} is up to date")
+		return
+	print(f"Processed source months {', '.join(report['sources'])}" + (" (full rebuild)" if report['full'] else "")
+		+ f", skipped {report['files_skipped']} unchanged file(s)")
+	print(f"\nRead {report['rows_read']:,} rows ({report['mb']:,.1f} MB) in {report['seconds']}s: "
+		f"{report['rows_per_s']:,} rows/s, {report['mb_per_s']} MB/s")
+	print(f"Filter {report['filter_seconds']}s (parallelism {report['parallelism']}), merge {report['merge_seconds']}s")
+	print(f"Saved {report['rows_kept']:,} rows to: {args.store}" + (f" and {args.csv}" if args.csv else "")
+		+ f" ({report['store_rows']:,} in the store)")
+	print(f"Months to recompute downstream: {', '.join(report['changed_months']) or 'none'}")
+	print(f"Peak memory: {report['peak_rss_mb']['main']} MB main, {report['peak_rss_mb']['largest_worker']} MB largest worker")
+	if args.report:
+		args.report.write_text(json.dumps(report, indent=2))
+		print(f"Saved report to: {args.report}")
+
+
+if __name__ == '__main__':
+	main()
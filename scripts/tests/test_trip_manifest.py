@@ -0,0 +1,166 @@
+"""
+Behaviour tests for incremental ingest planning and the trip store manifest
+
+Run from the repository root:
+
+	python -m pytest scripts/tests
+"""
+
+import os
+from types import SimpleNamespace
+
+from ingest_trips import _file_entry, file_digest, plan_ingest
+from trip_store import changed_months, mark_computed, read_manifest, updated_manifest, write_manifest
+
+# plan_ingest() only needs .map() from its pool
+SERIAL_POOL = SimpleNamespace(map=map)
+
+
+def _write(directory, name, content):
+	path = directory / name
+	path.write_text(content)
+	return path
+
+
+def _manifest(files):
+	"""A manifest whose file entries match files as they are on disk now"""
+	sources = {}
+	for path in files:
+		entry = {**_file_entry(path), 'blake2b': file_digest(path)}
+		sources.setdefault(entry['source'], {'files': {}, 'months': {}})['files'][path.name] = entry
+	return updated_manifest(None, sources)
+
+
+def _trip_files(tmp_path):
+	return [
+		_write(tmp_path, '202401-citibike-tripdata_1.csv', 'ride_id\nA1\n'),
+		_write(tmp_path, '202402-citibike-tripdata_1.csv', 'ride_id\nB1\n'),
+		_write(tmp_path, '202402-citibike-tripdata_2.csv', 'ride_id\nB2\n'),
+	]
+
+
+def test_unchanged_files_are_not_processed(tmp_path):
+	files = _trip_files(tmp_path)
+	sources, entries = plan_ingest(files, _manifest(files), SERIAL_POOL)
+
+	assert sources == []
+	assert set(entries) == {path.name for path in files}
+
+
+def test_touched_only_file_is_hashed_but_not_processed(tmp_path):
+	files = _trip_files(tmp_path)
+	manifest = _manifest(files)
+	touched = files[2]
+	stat = touched.stat()
+	os.utime(touched, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+	sources, entries = plan_ingest(files, manifest, SERIAL_POOL)
+
+	assert sources == []
+	# The new mtime is recorded so the next run skips the hash
+	assert entries[touched.name]['mtime_ns'] == touched.stat().st_mtime_ns
+	assert entries[touched.name]['blake2b'] == file_digest(touched)
+
+
+def test_changed_second_part_reprocesses_only_its_source_month(tmp_path):
+	files = _trip_files(tmp_path)
+	manifest = _manifest(files)
+	# Same size, different content: only the hash can tell
+	files[2].write_text('ride_id\nB3\n')
+
+	sources, entries = plan_ingest(files, manifest, SERIAL_POOL)
+
+	assert sources == ['2024-02']
+	assert entries[files[2].name]['blake2b'] == file_digest(files[2])
+	assert entries[files[0].name] == manifest['sources']['2024-01']['files'][files[0].name]
+
+
+def test_resized_and_new_files_are_processed(tmp_path):
+	files = _trip_files(tmp_path)
+	manifest = _manifest(files)
+	files[2].write_text('ride_id\nB2\nB3\n')
+	files.append(_write(tmp_path, '202403-citibike-tripdata_1.csv', 'ride_id\nC1\n'))
+
+	sources, entries = plan_ingest(files, manifest, SERIAL_POOL)
+
+	assert sources == ['2024-02', '2024-03']
+	# Hashed later, while they are filtered
+	assert 'blake2b' not in entries[files[2].name]
+	assert 'blake2b' not in entries[files[3].name]
+
+
+def _source(months):
+	return {'files': {}, 'months': months}
+
+
+def test_first_manifest_gives_every_month_revision_one():
+	manifest = updated_manifest(None, {'2024-01': _source({'2024-01': 10})}, stations=['s1'])
+
+	assert manifest['revision'] == 1
+	assert manifest['stations'] == ['s1']
+	assert manifest['months'] == {'2024-01': {'revision': 1, 'rows': 10}}
+	assert manifest['consumers'] == {}
+
+
+def test_source_month_spilling_into_the_previous_month():
+	# Trips in the 2024-02 files that started on 2024-01-31 belong to month 2024-01
+	previous = updated_manifest(None, {
+		'2024-01': _source({'2024-01': 50}),
+		'2024-02': _source({'2024-02': 90}),
+		'2024-03': _source({'2024-03': 70}),
+	})
+	previous['consumers'] = {'export_analysis': 1}
+
+	manifest = updated_manifest(previous, {'2024-02': _source({'2024-01': 3, '2024-02': 100})})
+
+	assert manifest['revision'] == 2
+	assert manifest['months'] == {
+		'2024-01': {'revision': 2, 'rows': 53},
+		'2024-02': {'revision': 2, 'rows': 100},
+		'2024-03': {'revision': 1, 'rows': 70},
+	}
+	assert set(manifest['sources']) == {'2024-01', '2024-02', '2024-03'}
+	assert manifest['consumers'] == {'export_analysis': 1}
+
+
+def test_months_a_source_no_longer_covers_still_change():
+	previous = updated_manifest(None, {
+		'2024-01': _source({'2024-01': 50}),
+		'2024-02': _source({'2024-01': 3, '2024-02': 90}),
+	})
+
+	manifest = updated_manifest(previous, {'2024-02': _source({'2024-02': 91})})
+
+	# 2024-01 lost the spilled trips, so it is under the new revision too
+	assert manifest['months']['2024-01'] == {'revision': 2, 'rows': 50}
+	assert manifest['months']['2024-02'] == {'revision': 2, 'rows': 91}
+
+
+def test_full_rebuild_keeps_dropped_months_with_no_rows():
+	previous = updated_manifest(None, {
+		'2024-01': _source({'2024-01': 50}),
+		'2024-02': _source({'2024-02': 90}),
+	})
+
+	manifest = updated_manifest(previous, {'2024-02': _source({'2024-02': 90})}, full=True)
+
+	assert set(manifest['sources']) == {'2024-02'}
+	assert manifest['months'] == {
+		'2024-01': {'revision': 2, 'rows': 0},
+		'2024-02': {'revision': 2, 'rows': 90},
+	}
+
+
+def test_consumers_see_only_months_changed_since_they_last_computed(tmp_path):
+	first = updated_manifest(None, {
+		'2024-01': _source({'2024-01': 50}),
+		'2024-02': _source({'2024-02': 90}),
+	})
+	write_manifest(first, tmp_path)
+	assert changed_months('export_analysis', tmp_path) == (1, ['2024-01', '2024-02'])
+	mark_computed('export_analysis', 1, tmp_path)
+	assert changed_months('export_analysis', tmp_path) == (1, [])
+
+	write_manifest(updated_manifest(read_manifest(tmp_path), {'2024-02': _source({'2024-02': 91})}), tmp_path)
+	assert changed_months('export_analysis', tmp_path) == (2, ['2024-02'])
+	assert changed_months('export_forecasting', tmp_path) == (2, ['2024-01', '2024-02'])
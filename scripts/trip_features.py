@@ -0,0 +1,206 @@
+"""
+Trips with temporal features, in compact dtypes.
+
+Shared by the export scripts (and usable from the notebooks) instead of each
+deriving its own hour/day/season columns:
+
+	from trip_features import load_trip_features
+	trips = load_trip_features()
+
+Every feature is computed with vectorized lookups rather than row-wise
+.apply(): small integers are int8, labels (day name, month, season, time
+period) are ordered categoricals built from their codes, and dates are
+datetime64 rather than Python date objects.
+
+A memory report compares this with loading the filtered CSV and deriving the
+features the way export_analysis.py used to:
+
+	python scripts/trip_features.py --memory-report
+	python scripts/trip_features.py --memory-report --json memory_report.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from trip_store import CATEGORY_COLUMNS, COORDINATE_COLUMNS, TRIP_STORE_DIR, load_trips
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SEASONS = ['Winter', 'Spring', 'Summer', 'Fall']
+TIME_PERIODS = ['Morning Rush', 'Midday', 'Evening Rush', 'Night']
+
+# Lookup tables: SEASONS index for each month (index 0 unused), TIME_PERIODS index for each hour
+SEASON_BY_MONTH = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.int8)
+TIME_PERIOD_BY_HOUR = np.array(
+	[3] * 6      # 0-5   Night
+	+ [0] * 4    # 6-9   Morning Rush
+	+ [1] * 6    # 10-15 Midday
+	+ [2] * 4    # 16-19 Evening Rush
+	+ [3] * 4,   # 20-23 Night
+	dtype=np.int8,
+)
+
+TEMPORAL_FEATURES = [
+	'hour_of_day', 'day_of_week', 'day_name', 'month', 'month_name', 'date', 'is_weekend', 'season', 'time_period',
+]
+
+
+def _labels(codes, labels):
+	return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def temporal_features(timestamps):
+	"""Temporal features of a datetime Series, as a DataFrame with the same index"""
+	hour = timestamps.dt.hour.to_numpy(dtype=np.int8)
+	day = timestamps.dt.dayofweek.to_numpy(dtype=np.int8)
+	month = timestamps.dt.month.to_numpy(dtype=np.int8)
+	year_month = timestamps.dt.year.to_numpy(dtype=np.int32) * 100 + month
+	# Categories only for the months present, in chronological order
+	months_present, month_codes = np.unique(year_month, return_inverse=True)
+	return pd.DataFrame({
+		'hour_of_day': hour,
+		'day_of_week': day,
+		'day_name': _labels(day, DAY_NAMES),
+		'month': month,
+		'month_name': _labels(month_codes, [f'{ym // 100}-{ym % 100:02d}' for ym in months_present]),
+		'date': timestamps.dt.normalize(),
+		'is_weekend': day >= 5,
+		'season': _labels(SEASON_BY_MONTH[month], SEASONS),
+		'time_period': _labels(TIME_PERIOD_BY_HOUR[hour], TIME_PERIODS),
+	}, index=timestamps.index)
+
+
+def add_temporal_features(frame, column='started_at'):
+	"""frame with the temporal features of one of its datetime columns added (in place)"""
+	features = temporal_features(frame[column])
+	for name in TEMPORAL_FEATURES:
+		frame[name] = features[name]
+	return frame
+
+
+def load_trip_features(columns=None, start=None, end=None, store_dir=TRIP_STORE_DIR):
+	"""load_trips() plus trip_duration_minutes (float32) and the temporal features of started_at
+
+	Args are as for load_trips(); columns must include started_at and ended_at.
+	"""
+	trips = load_trips(columns, start, end, store_dir)
+	trips['trip_duration_minutes'] = ((trips['ended_at'] - trips['started_at']).dt.total_seconds() / 60).astype(np.float32)
+	return add_temporal_features(trips)
+
+
+def _csv_frame(trips):
+	"""trips in the dtypes pd.read_csv(parse_dates=...) gives: object strings, float64 coordinates"""
+	return trips.astype({
+		**{column: object for column in CATEGORY_COLUMNS + ['ride_id']},
+		**{column: np.float64 for column in COORDINATE_COLUMNS},
+	})
+
+
+def _legacy_features(df):
+	"""The row-wise feature code export_analysis.py used before this module"""
+	def get_season(month):
+		if month in [12, 1, 2]:
+			return 'Winter'
+		elif month in [3, 4, 5]:
+			return 'Spring'
+		elif month in [6, 7, 8]:
+			return 'Summer'
+		else:
+			return 'Fall'
+
+	def get_time_period(hour):
+		if 6 <= hour < 10:
+			return 'Morning Rush'
+		elif 10 <= hour < 16:
+			return 'Midday'
+		elif 16 <= hour < 20:
+			return 'Evening Rush'
+		else:
+			return 'Night'
+
+	df['trip_duration_minutes'] = (df['ended_at'] - df['started_at']).dt.total_seconds() / 60
+	df['hour_of_day'] = df['started_at'].dt.hour
+	df['day_of_week'] = df['started_at'].dt.dayofweek
+	df['day_name'] = df['started_at'].dt.day_name()
+	df['month'] = df['started_at'].dt.month
+	df['month_name'] = df['started_at'].dt.strftime('%Y-%m')
+	df['date'] = df['started_at'].dt.date
+	df['is_weekend'] = df['day_of_week'] >= 5
+	df['season'] = df['month'].apply(get_season)
+	df['time_period'] = df['hour_of_day'].apply(get_time_period)
+	return df
+
+
+def memory_report(store_dir=TRIP_STORE_DIR):
+	"""Per-column memory (deep) and feature time: CSV dtypes + row-wise features vs this module"""
+	before = _csv_frame(load_trips(store_dir=store_dir))
+	started = time.perf_counter()
+	_legacy_features(before)
+	before_seconds = time.perf_counter() - started
+
+	started = time.perf_counter()
+	after = load_trip_features(store_dir=store_dir)
+	after_seconds = time.perf_counter() - started
+
+	before_bytes = before.memory_usage(deep=True, index=False)
+	after_bytes = after.memory_usage(deep=True, index=False)
+	return {
+		'rows': len(after),
+		# Same labels either way
+		'labels_match': all(
+			(after[column].astype(str) == before[column]).all()
+			for column in ('day_name', 'month_name', 'season', 'time_period')
+		),
+		'columns': {
+			column: {
+				'before_dtype': str(before[column].dtype),
+				'after_dtype': str(after[column].dtype),
+				'before_mb': round(before_bytes[column] / 1024 ** 2, 2),
+				'after_mb': round(after_bytes[column] / 1024 ** 2, 2),
+			}
+			for column in before.columns
+		},
+		'before_mb': round(before_bytes.sum() / 1024 ** 2, 1),
+		'after_mb': round(after_bytes.sum() / 1024 ** 2, 1),
+		# Deriving the features only (before) vs loading the store and deriving them (after)
+		'before_feature_seconds': round(before_seconds, 2),
+		'after_load_and_feature_seconds': round(after_seconds, 2),
+	}
+
+
+def format_memory_report(report):
+	lines = [f"{'column':<24} {'before':>18} {'MB':>8}   {'after':>18} {'MB':>8}"]
+	for column, stats in report['columns'].items():
+		lines.append(
+			f"{column:<24} {stats['before_dtype']:>18} {stats['before_mb']:>8.2f}   "
+			f"{stats['after_dtype']:>18} {stats['after_mb']:>8.2f}"
+		)
+	lines.append(
+		f"\n{report['rows']:,} trips: {report['before_mb']} MB before, {report['after_mb']} MB after "
+		f"({report['before_mb'] / report['after_mb']:.1f}x smaller), labels match: {report['labels_match']}"
+	)
+	lines.append(
+		f"Row-wise features {report['before_feature_seconds']}s; "
+		f"store load + vectorized features {report['after_load_and_feature_seconds']}s"
+	)
+	return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Trips with temporal features in compact dtypes')
+	parser.add_argument('--memory-report', action='store_true', help='compare memory with the CSV load and row-wise features')
+	parser.add_argument('--store', type=Path, default=TRIP_STORE_DIR)
+	parser.add_argument('--json', type=Path, help='also write the memory report as JSON')
+	args = parser.parse_args()
+	if not args.memory_report:
+		parser.error('nothing to do; pass --memory-report')
+
+	report = memory_report(args.store)
+	print(format_memory_report(report))
+	if args.json:
+		args.json.write_text(json.dumps(report, indent=2))
+		print(f"Saved report to: {args.json}")
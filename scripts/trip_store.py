@@ -0,0 +1,337 @@
+"""
+Month-partitioned Parquet store of the filtered Citi Bike trips.
+
+The canonical copy of the Columbia trips, written by scripts/ingest_trips.py
+and read by the export scripts through load_trips():
+
+	data/trips/_manifest.json
+	data/trips/month=2024-01/2024-01.parquet
+	data/trips/month=2024-02/2024-01.parquet   (trips from the January files that started in February)
+	data/trips/month=2024-02/2024-02.parquet
+	...
+
+Columns are stored typed, so nothing is re-parsed on load: station IDs and
+names, member_casual and rideable_type are dictionary-encoded (pandas
+categoricals), started_at/ended_at are timestamps and coordinates are
+float32. load_trips() reads only the requested columns, and a start/end
+range skips whole months and the row groups outside it.
+
+Each file is named after the source the trips came from (the month of the
+monthly trip CSVs, or part-0 for a converted CSV), so one source month can
+be replaced without rewriting the others. The manifest records the source
+files behind every source and a revision per month, bumped whenever the
+month's trips change; changed_months() and mark_computed() let the export
+scripts recompute only when months changed since their last run.
+
+An existing columbia_filtered_citibike.csv can be converted with:
+
+	python scripts/trip_store.py --from-csv data/columbia_filtered_citibike.csv
+"""
+
+import argparse
+import json
+import os
+import shutil
+from functools import reduce
+from operator import and_
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+TRIP_STORE_DIR = DATA_DIR / 'trips'
+CSV_PATH = DATA_DIR / 'columbia_filtered_citibike.csv'
+MANIFEST_NAME = '_manifest.json'  # the leading underscore keeps pyarrow from reading it as data
+MANIFEST_VERSION = 1
+DEFAULT_SOURCE = 'part-0'
+
+# Columns of the current Citi Bike trip schema, in file order
+TRIP_COLUMNS = [
+	'ride_id', 'rideable_type', 'started_at', 'ended_at',
+	'start_station_name', 'start_station_id', 'end_station_name', 'end_station_id',
+	'start_lat', 'start_lng', 'end_lat', 'end_lng', 'member_casual',
+]
+
+# Types for reading trip CSVs. Station IDs look numeric ("7783.18") but must
+# stay strings to match.
+TRIP_DTYPES = {
+	'ride_id': str,
+	'rideable_type': str,
+	'start_station_name': str,
+	'start_station_id': str,
+	'end_station_name': str,
+	'end_station_id': str,
+	'member_casual': str,
+}
+
+CATEGORY_COLUMNS = [
+	'rideable_type', 'start_station_name', 'start_station_id',
+	'end_station_name', 'end_station_id', 'member_casual',
+]
+TIMESTAMP_COLUMNS = ['started_at', 'ended_at']
+COORDINATE_COLUMNS = ['start_lat', 'start_lng', 'end_lat', 'end_lng']
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+STORE_SCHEMA = pa.schema([
+	(column,
+		_CATEGORY if column in CATEGORY_COLUMNS
+		# Trip times have millisecond precision
+		else pa.timestamp('ms') if column in TIMESTAMP_COLUMNS
+		else pa.float32() if column in COORDINATE_COLUMNS
+		else pa.string())
+	for column in TRIP_COLUMNS
+])
+_PARTITIONING = ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+
+
+def to_store_types(trips):
+	"""Trips (as read from CSV, any dtypes) converted to the store's column types"""
+	trips = trips.copy()
+	for column in CATEGORY_COLUMNS:
+		trips[column] = trips[column].astype('category')
+	for column in TIMESTAMP_COLUMNS:
+		if not pd.api.types.is_datetime64_any_dtype(trips[column]):
+			trips[column] = pd.to_datetime(trips[column], format='ISO8601')
+	for column in COORDINATE_COLUMNS:
+		trips[column] = pd.to_numeric(trips[column]).astype(np.float32)
+	return trips
+
+
+class TripStoreWriter:
+	"""Writes trips into a month-partitioned store
+
+	By default the store is rebuilt: close() swaps the new one in place of the
+	old. With update=True only the sources written (or passed to replace())
+	are swapped, and the other sources' files stay as they are.
+
+	Each write() becomes one row group per (source, month) it touches. A
+	"source" column, if present, names the file each row goes to (default
+	part-0). Trips should come in started_at order so each file is sorted.
+	Set manifest before close() to record more than the months written.
+	"""
+
+	def __init__(self, store_dir=TRIP_STORE_DIR, update=False):
+		self.store_dir = Path(store_dir)
+		self.update = update
+		self._tmp_dir = self.store_dir.with_name(self.store_dir.name + '.tmp')
+		shutil.rmtree(self._tmp_dir, ignore_errors=True)
+		self._tmp_dir.mkdir(parents=True)
+		self._writers = {}
+		# source -> {month: rows written}
+		self.sources = {}
+		self.manifest = None
+		self.rows = 0
+
+	def replace(self, source):
+		"""Drop the source's current files on close(), even if nothing is written for it"""
+		self.sources.setdefault(source, {})
+
+	def write(self, trips):
+		trips = to_store_types(trips)
+		sources = trips.pop('source') if 'source' in trips else pd.Series(DEFAULT_SOURCE, index=trips.index)
+		months = trips['started_at'].dt.strftime('%Y-%m')
+		for (source, month), part in trips.groupby([sources, months], sort=False):
+			if (source, month) not in self._writers:
+				path = self._tmp_dir / f'month={month}' / f'{source}.parquet'
+				path.parent.mkdir(exist_ok=True)
+				self._writers[source, month] = pq.ParquetWriter(path, STORE_SCHEMA, compression='zstd')
+			# safe=False: ns timestamps are truncated to ms, float64 narrowed to float32
+			table = pa.Table.from_pandas(part[TRIP_COLUMNS], schema=STORE_SCHEMA, preserve_index=False, safe=False)
+			self._writers[source, month].write_table(table)
+			written = self.sources.setdefault(source, {})
+			written[month] = written.get(month, 0) + len(part)
+			self.rows += len(part)
+
+	def _close_writers(self):
+		for writer in self._writers.values():
+			writer.close()
+		self._writers = {}
+
+	def close(self):
+		"""Finish every file, swap the new files in and write the manifest"""
+		self._close_writers()
+		previous = read_manifest(self.store_dir)
+		manifest = self.manifest
+		if manifest is None:
+			sources = {source: {'files': {}, 'months': months} for source, months in self.sources.items()}
+			manifest = updated_manifest(previous, sources, full=not self.update)
+
+		if self.update and self.store_dir.exists():
+			for source in self.sources:
+				for path in self.store_dir.glob(f'month=*/{source}.parquet'):
+					path.unlink()
+			for path in self._tmp_dir.glob('month=*/*.parquet'):
+				target = self.store_dir / path.parent.name / path.name
+				target.parent.mkdir(exist_ok=True)
+				path.replace(target)
+			for month_dir in self.store_dir.glob('month=*'):
+				if not any(month_dir.iterdir()):
+					month_dir.rmdir()
+			# Written last: after a crash, the sources it does not list yet are processed again
+			write_manifest(manifest, self.store_dir)
+			shutil.rmtree(self._tmp_dir, ignore_errors=True)
+			return
+
+		write_manifest(manifest, self._tmp_dir)
+		old_dir = self.store_dir.with_name(self.store_dir.name + '.old')
+		if self.store_dir.exists():
+			self.store_dir.rename(old_dir)
+		self._tmp_dir.rename(self.store_dir)
+		shutil.rmtree(old_dir, ignore_errors=True)
+
+	def abort(self):
+		"""Drop what was written, keeping the old store"""
+		self._close_writers()
+		shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		if exc_type is None:
+			self.close()
+		else:
+			self.abort()
+
+
+def read_manifest(store_dir=TRIP_STORE_DIR):
+	"""The store's manifest, or None if there is no store (or it has none)"""
+	try:
+		return json.loads((Path(store_dir) / MANIFEST_NAME).read_text())
+	except FileNotFoundError:
+		return None
+
+
+def write_manifest(manifest, store_dir=TRIP_STORE_DIR):
+	path = Path(store_dir) / MANIFEST_NAME
+	tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+	tmp_path.write_text(json.dumps(manifest, indent=1))
+	os.replace(tmp_path, path)
+
+
+def updated_manifest(previous, sources, stations=None, full=False):
+	"""The manifest after (re)writing sources, under the next revision
+
+	Args:
+		previous: the manifest before, or None
+		sources: {source: {'files': {name: entry}, 'months': {month: rows}}}
+			for every source written; with full=True these replace all others
+		stations: station IDs the trips were filtered on (None if unknown)
+
+	Every month a written source covers now or covered before gets the new
+	revision. Months left without trips stay listed with 0 rows, so
+	consumers still see that they changed.
+	"""
+	previous = previous or {}
+	revision = previous.get('revision', 0) + 1
+	old_sources = previous.get('sources', {})
+	old_months = previous.get('months', {})
+	all_sources = dict(sources) if full else {**old_sources, **sources}
+
+	if full:
+		changed = set(old_months)
+	else:
+		changed = {month for source in sources for month in old_sources.get(source, {}).get('months', {})}
+	changed.update(month for entry in sources.values() for month in entry['months'])
+
+	months = {}
+	for month in sorted(changed | set(old_months)):
+		months[month] = {
+			'revision': revision if month in changed else old_months[month]['revision'],
+			'rows': sum(entry['months'].get(month, 0) for entry in all_sources.values()),
+		}
+	return {
+		'version': MANIFEST_VERSION,
+		'revision': revision,
+		'stations': stations,
+		'sources': dict(sorted(all_sources.items())),
+		'months': months,
+		'consumers': previous.get('consumers', {}),
+	}
+
+
+def changed_months(consumer, store_dir=TRIP_STORE_DIR):
+	"""(revision, months whose trips changed since consumer last called mark_computed())"""
+	manifest = read_manifest(store_dir)
+	if manifest is None:
+		raise FileNotFoundError(f"No trip store manifest in {store_dir}; rebuild the store with scripts/ingest_trips.py")
+	computed = manifest['consumers'].get(consumer, 0)
+	months = [month for month, state in manifest['months'].items() if state['revision'] > computed]
+	return manifest['revision'], months
+
+
+def mark_computed(consumer, revision, store_dir=TRIP_STORE_DIR):
+	"""Record that consumer's outputs reflect the store as of revision (from changed_months())"""
+	manifest = read_manifest(store_dir)
+	consumers = manifest['consumers']
+	consumers[consumer] = max(consumers.get(consumer, 0), revision)
+	write_manifest(manifest, store_dir)
+
+
+def load_trips(columns=None, start=None, end=None, store_dir=TRIP_STORE_DIR):
+	"""Trips from the store as a DataFrame, in started_at order
+
+	Args:
+		columns: columns to read (default: all of TRIP_COLUMNS)
+		start, end: keep trips with start <= started_at < end (anything
+			pd.Timestamp accepts); months outside the range are not read
+	"""
+	store_dir = Path(store_dir)
+	if not store_dir.exists():
+		raise FileNotFoundError(
+			f"No trip store at {store_dir}. Build it with scripts/ingest_trips.py, or convert "
+			f"the filtered CSV with: python scripts/trip_store.py --from-csv {CSV_PATH}"
+		)
+	dataset = ds.dataset(store_dir, format='parquet', partitioning=_PARTITIONING)
+
+	conditions = []
+	if start is not None:
+		start = pd.Timestamp(start)
+		conditions += [
+			ds.field('month') >= start.strftime('%Y-%m'),
+			ds.field('started_at') >= pa.scalar(start.to_pydatetime(), pa.timestamp('ms')),
+		]
+	if end is not None:
+		end = pd.Timestamp(end)
+		conditions += [
+			ds.field('month') <= end.strftime('%Y-%m'),
+			ds.field('started_at') < pa.scalar(end.to_pydatetime(), pa.timestamp('ms')),
+		]
+
+	table = dataset.to_table(
+		columns=list(columns) if columns is not None else TRIP_COLUMNS,
+		filter=reduce(and_, conditions) if conditions else None,
+	)
+	# Nanosecond timestamps, as pd.read_csv(parse_dates=...) gave
+	trips = table.to_pandas(coerce_temporal_nanoseconds=True)
+	# Files are read in path order, so a month's trips from another source
+	# month can come after later trips
+	if 'started_at' in trips and not trips['started_at'].is_monotonic_increasing:
+		keys = [column for column in TIMESTAMP_COLUMNS if column in trips]
+		trips = trips.sort_values(keys, kind='stable', ignore_index=True)
+	return trips
+
+
+def convert_csv(csv_path, store_dir=TRIP_STORE_DIR, chunk_rows=250_000):
+	"""Build the store from a filtered trip CSV, chunk by chunk; returns rows written"""
+	with TripStoreWriter(store_dir) as writer:
+		reader = pd.read_csv(csv_path, usecols=TRIP_COLUMNS, dtype=TRIP_DTYPES, chunksize=chunk_rows)
+		with reader:
+			for chunk in reader:
+				writer.write(chunk)
+	return writer.rows
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Build the Parquet trip store from a filtered trip CSV')
+	parser.add_argument('--from-csv', type=Path, default=CSV_PATH)
+	parser.add_argument('--store', type=Path, default=TRIP_STORE_DIR)
+	args = parser.parse_args()
+
+	rows = convert_csv(args.from_csv, args.store)
+	size = sum(path.stat().st_size for path in args.store.rglob('*.parquet'))
+	print(f"Saved {rows:,} trips to: {args.store} ({size / 1024 ** 2:.1f} MB)")